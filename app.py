@@ -5,6 +5,10 @@ import fastapi
 from starlette.middleware.cors import CORSMiddleware
 
 import appconfig
+from src.catalog import (
+    start_cinfo_catalog,
+    stop_cinfo_catalog,
+)
 from src.db import (
     connect_async_engines,
     disconnect_async_engines,
@@ -15,20 +19,28 @@ from src.heartbeat import router as heartbeat_router
 from src.info import router as info_outer
 from src.ivol_atm import router as atm_router
 from src.ivol_calendar_spread import router as calendar_router
+from src.ivol_cone import router as ivol_cone_router
+from src.ivol_correlation import router as ivol_correlation_router
 from src.ivol_inter_spread import router as ivol_inter_spread_router
+from src.ivol_interpolation import router as ivol_interpolation_router
 from src.ivol_risk_reversal import router as risk_reversal_router
+from src.ivol_screener import router as ivol_screener_router
 from src.ivol_smile import router as smile_router
+from src.ivol_spread import router as ivol_spread_router
 from src.ivol_summary_statistics import router as ivol_summary_statistics_router
 from src.ivol_surface_by_delta import router as surface_router
+from src.pagination import NEXT_CURSOR_HEADER
 from src.prices_continuous import router as conti_router
 from src.prices_intraday import router as intraday_prices_router
 from src.prices_regular_futures import router as eod_futures_router
 from src.pvp import router as pvp_router
 from src.rawdata_all_options import router as all_options_single_day_router
 from src.rawoption_data import router as rawdata_router
+from src.realized_vol import router as realized_vol_router
 from src.topoi_data import router as topoi_router
 from src.users import (
     auth_router,
+    shutdown_password_hashing_executor,
     users_router,
 )
 
@@ -45,10 +57,13 @@ app = fastapi.FastAPI(
     docs_url='/',
     on_startup=[
         connect_async_engines,
+        start_cinfo_catalog,
     ],
     on_shutdown=[
+        stop_cinfo_catalog,
         disconnect_async_engines,
         dispose_engines,
+        shutdown_password_hashing_executor,
     ],
     servers=appconfig.OPENAPI_SERVERS,
 )
@@ -66,6 +81,8 @@ app.include_router(smile_router, tags=['ImpliedVolatility'])
 app.include_router(surface_router, tags=['ImpliedVolatility'])
 app.include_router(calendar_router, tags=['ImpliedVolatility'])
 app.include_router(ivol_inter_spread_router, tags=['ImpliedVolatility'])
+app.include_router(ivol_spread_router, tags=['ImpliedVolatility'])
+app.include_router(ivol_interpolation_router, tags=['ImpliedVolatility'])
 
 # price data
 app.include_router(intraday_prices_router, tags=['PriceData'])
@@ -83,6 +100,10 @@ app.include_router(topoi_router, tags=['Composite'])
 app.include_router(delta_router, tags=['Composite'])
 app.include_router(risk_reversal_router, tags=['Composite'])
 app.include_router(ivol_summary_statistics_router, tags=['Composite'])
+app.include_router(ivol_screener_router, tags=['Composite'])
+app.include_router(ivol_correlation_router, tags=['Composite'])
+app.include_router(ivol_cone_router, tags=['Composite'])
+app.include_router(realized_vol_router, tags=['Composite'])
 
 
 app.add_middleware(
@@ -91,6 +112,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
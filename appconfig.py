@@ -150,6 +150,13 @@ data_pgc = DataPostgresConfig(
     port=PG_PORT,
 )
 
+# connection pool bounds of the async database engines. applies per worker and database
+ASYNC_DB_POOL_MIN_SIZE = int(os.getenv('IVOLAPI_DB_POOL_MIN_SIZE') or 2)
+ASYNC_DB_POOL_MAX_SIZE = int(os.getenv('IVOLAPI_DB_POOL_MAX_SIZE') or 10)
+# connections a single request may use concurrently to fan out queries (e.g. one per symbol).
+# keep it below the pool size to leave connections for other requests
+FAN_OUT_CONCURRENCY = int(os.getenv('IVOLAPI_FAN_OUT_CONCURRENCY') or 4)
+
 DATABASE_URL_VOLATILITY_DB = data_pgc.get_uri(data_pgc.volatility_db_name)
 DATABASE_URL_PRICES_INTRADAY_DB = data_pgc.get_uri(data_pgc.prices_intraday_db_name)
 DATABASE_URL_OPTIONS_DB = data_pgc.get_uri(data_pgc.options_db_name)
@@ -164,6 +171,122 @@ PASSWORD_HASHING_ALGORITHM = "bcrypt" if not IVOLAPI_TESTING else "plaintext"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 ACCESS_TOKEN_EXPIRES_TIMEDELTA = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
+# stateless tokens additionally carry the signed `uid`, `is_active` and `roles` claims
+# requests are then authorized without any database lookup. The shorter validity
+# bounds how long e.g. a deactivated user keeps access.
+IVOLAPI_STATELESS_TOKENS = (
+    evaL_bool_env(os.getenv('IVOLAPI_STATELESS_TOKENS'))
+    if os.getenv('IVOLAPI_STATELESS_TOKENS')
+    else False
+)
+STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('IVOLAPI_STATELESS_TOKEN_EXPIRE_MINUTES') or 5)
+STATELESS_ACCESS_TOKEN_EXPIRES_TIMEDELTA = timedelta(minutes=STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES)
+
+# per worker cache of authenticated users. the time to live bounds how long e.g.
+# a deleted user stays valid in workers which did not process the deletion
+USER_CACHE_MAXSIZE = 1024
+USER_CACHE_TTL_SECONDS = 60
+
+# bcrypt hashing and verification is CPU bound and runs in a bounded thread pool
+# to keep the event loop responsive. logins beyond the cap wait for a free slot
+PASSWORD_HASHING_WORKERS = int(os.getenv('IVOLAPI_PASSWORD_HASHING_WORKERS') or 2)
+MAX_CONCURRENT_LOGINS = int(os.getenv('IVOLAPI_MAX_CONCURRENT_LOGINS') or 4)
+
+# the `cinfo` catalog is held in memory per worker. it is loaded at startup and
+# reloaded in the background with this interval. `0` disables the reloading
+CINFO_CATALOG_REFRESH_SECONDS = int(os.getenv('IVOLAPI_CINFO_CATALOG_REFRESH_SECONDS') or 3600)
+
+# rolling statistics of ivol series served by `/ivol/summary/*`. new observations
+# are looked up at most once per refresh interval and series
+IVOL_STATISTICS_MAXSIZE = 4096
+IVOL_STATISTICS_REFRESH_SECONDS = 15 * 60
+
+# upper bound of series per request to `POST /ivol/batch`
+IVOL_BATCH_MAX_SERIES = 100
+
+# per worker cache of the leg series of the spread engine (`src/ivol_spread.py`).
+# ranges including today change once a day, hence the short time to live
+SPREAD_LEG_CACHE_MAXSIZE = 1024
+SPREAD_LEG_CACHE_TTL_SECONDS = 5 * 60
+# upper bound of legs per request to `POST /ivol/spread`
+SPREAD_MAX_LEGS = 16
+
+# published EOD surfaces do not change. the time to live only frees rarely requested surfaces.
+# the last available date and date ranges ending after it expire after the shorter time to live
+SURFACE_CACHE_MAXSIZE = 512
+SURFACE_CACHE_TTL_SECONDS = 6 * 60 * 60
+SURFACE_LAST_DATE_TTL_SECONDS = 5 * 60
+SURFACE_RANGE_MAX_DAYS = 366
+# the ivol screener holds a matrix of the last `SCREENER_WINDOW_DAYS` calendar days
+# of all symbols per worker. it is rebuilt on the next day or after the refresh interval
+SCREENER_WINDOW_DAYS = 366
+SCREENER_REFRESH_SECONDS = int(os.getenv('IVOLAPI_SCREENER_REFRESH_SECONDS') or 3 * 60 * 60)
+
+# correlation matrices of published windows do not change. windows ending
+# after the last published date of any symbol expire after the shorter time to live
+CORRELATION_CACHE_MAXSIZE = 256
+CORRELATION_CACHE_TTL_SECONDS = 6 * 60 * 60
+CORRELATION_CACHE_TODAY_TTL_SECONDS = 5 * 60
+CORRELATION_MAX_SYMBOLS = 100
+CORRELATION_MAX_WINDOW_DAYS = 5 * 366
+
+# volatility cones are recomputed once the next date is published.
+# the time to live only frees rarely requested cones
+CONE_CACHE_MAXSIZE = 256
+CONE_CACHE_TTL_SECONDS = 24 * 60 * 60
+CONE_MAX_LOOKBACK_DAYS = 5 * 366
+
+# upper bound of windows per request to `POST /ivol/realized`
+REALIZED_VOL_MAX_WINDOWS = 8
+
+# upper bound of points per request to `POST /ivol/interpolate`.
+# the date range is bounded by `SURFACE_RANGE_MAX_DAYS`
+INTERPOLATION_MAX_POINTS = 100
+
+# keyset pagination of price time series (see `src/pagination.py`)
+PAGE_SIZE_DEFAULT = 365 * 2
+PAGE_SIZE_MAX = 10_000
+
+# `/prices/intraday` resamples the bars of the requested range in process.
+# the bars are cached per query. the number of bars per query is bounded.
+# only queries of at most `PRICES_BARS_CACHE_MAX_ROWS` bars (about 0.5 MB each) are cached
+PRICES_BARS_CACHE_MAXSIZE = 64
+PRICES_BARS_CACHE_TTL_SECONDS = 5 * 60
+PRICES_BARS_CACHE_MAX_ROWS = 10_000
+PRICES_RESAMPLE_MAX_ROWS = 500_000
+# rows per chunk of streamed responses (`format=ndjson|csv`). bounds the memory per stream
+STREAM_CHUNK_ROWS = 10_000
+# ring buffers of the recent 1 minute bars per worker (see `src/prices_recent.py`).
+# a buffer holds up to `RECENT_BARS_CAPACITY` bars of the last `RECENT_BARS_SESSIONS` sessions.
+# `IVOLAPI_RECENT_BARS_MAX_TABLES=0` disables the buffers
+RECENT_BARS_MAX_TABLES = int(os.getenv('IVOLAPI_RECENT_BARS_MAX_TABLES') or 32)
+RECENT_BARS_CAPACITY = 10 * 24 * 60
+RECENT_BARS_SESSIONS = 10
+RECENT_BARS_REFRESH_SECONDS = 60
+# fine grained price volume profiles per day and intraday table (see `src/pvp.py`).
+# profiles of past days do not change. the time to live only frees rarely requested days
+PVP_DAY_CACHE_MAXSIZE = 4096
+PVP_DAY_CACHE_TTL_SECONDS = 24 * 60 * 60
+PVP_DAY_CACHE_TODAY_TTL_SECONDS = 60
+PVP_MAX_BUCKETS = 1000
+PVP_MAX_RANGE_DAYS = 2 * 366
+
+# read smiles, surfaces and spread legs from the consolidated
+# per symbol ivol views (see `src/ivol_wide.py`, `refresh_wide_ivol_tables.py`)
+IVOLAPI_WIDE_IVOL_TABLES = (
+    evaL_bool_env(os.getenv('IVOLAPI_WIDE_IVOL_TABLES'))
+    if os.getenv('IVOLAPI_WIDE_IVOL_TABLES')
+    else False
+)
+
+# read `/prices/intraday` bars from the pre-aggregated rollups of the intraday tables
+# (see `src/prices_rollup.py`, `refresh_prices_rollups.py`)
+IVOLAPI_PRICES_ROLLUPS = (
+    evaL_bool_env(os.getenv('IVOLAPI_PRICES_ROLLUPS'))
+    if os.getenv('IVOLAPI_PRICES_ROLLUPS')
+    else False
+)
+
 DEPLOYMENT_TYPE_DEVELOPMENT = 'dev'
 DEPLOYMENT_TYPE_PRODUCTION = 'prod'
 
@@ -0,0 +1,68 @@
+"""
+compare the authorization paths of ``get_current_user``
+
+ $ python benchmark_tokens.py
+
+- ``lookup``: token with ``sub`` only. The user is selected from the users database.
+  The per worker user cache is cleared before each call.
+- ``cached``: token with ``sub`` only. The user is served from the per worker user cache.
+- ``stateless``: token carries ``uid``, ``is_active`` and ``roles``. No I/O at all.
+
+Requires a running users database holding the default super user (see ``migrate.py``).
+"""
+import asyncio
+import time
+
+import appconfig
+from src.db import async_engines
+from src.users import (
+    UserCrud,
+    compose_token_claims,
+    create_access_token,
+    get_current_user,
+    load_superuser,
+    user_cache,
+)
+
+ROUNDS = 1000
+
+
+async def measure(label: str, token: str, clear_cache: bool):
+    durations = []
+    for _ in range(ROUNDS):
+        if clear_cache:
+            user_cache.clear()
+        start = time.perf_counter()
+        await get_current_user(token)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    mean = sum(durations) / len(durations)
+    p99 = durations[int(len(durations) * 0.99) - 1]
+    print(f'{label:>10}: mean {mean * 1e6:10.1f} µs   p99 {p99 * 1e6:10.1f} µs')
+
+
+async def main():
+    await async_engines.users.connect()
+    try:
+        async with async_engines.users.connection() as con:
+            user = await UserCrud.async_select_user_by_username(load_superuser()['username'], con)
+        if user is None:
+            raise ValueError('default super user not found. run `python migrate.py` first')
+
+        appconfig.IVOLAPI_STATELESS_TOKENS = False
+        lookup_token = create_access_token(data=compose_token_claims(user))
+        await measure('lookup', lookup_token, clear_cache=True)
+        await measure('cached', lookup_token, clear_cache=False)
+
+        appconfig.IVOLAPI_STATELESS_TOKENS = True
+        stateless_token = create_access_token(
+            data=compose_token_claims(user),
+            expires_delta=appconfig.STATELESS_ACCESS_TOKEN_EXPIRES_TIMEDELTA,
+        )
+        await measure('stateless', stateless_token, clear_cache=True)
+    finally:
+        await async_engines.users.disconnect()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""
+create and refresh the OHLCV rollups of the intraday price tables
+
+ $ python refresh_prices_rollups.py
+
+Supposed to be run after each import of intraday data. Creates missing rollups
+and refreshes existing ones concurrently, i.e. without blocking readers.
+Rollups are refreshed from fine to coarse since each one is aggregated from the
+next finer one. Retired rollups are dropped. See ``src/prices_rollup.py``.
+"""
+import logging
+
+import sqlalchemy as sa
+
+from src.db import engines
+from src.prices_rollup import (
+    RETIRED_ROLLUPS,
+    ROLLUPS,
+    create_rollup_view_sql,
+    drop_rollup_view_sql,
+    refresh_rollup_view_sql,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def select_intraday_tables(con):
+    sql = sa.text(r'''
+        SELECT      table_schema, table_name
+        FROM        information_schema.tables
+        WHERE       table_type = 'BASE TABLE'
+            AND     table_name LIKE '%\_prices\_intraday'
+        ORDER BY    table_schema, table_name;
+    ''')
+    return con.execute(sql).fetchall()
+
+
+def refresh_prices_rollups():
+    with engines.prices_intraday.connect() as con:
+        for schema, table in select_intraday_tables(con):
+            for rollup in ROLLUPS:
+                con.execute(sa.text(create_rollup_view_sql(schema, table, rollup)).execution_options(autocommit=True))
+                con.execute(sa.text(refresh_rollup_view_sql(schema, table, rollup)).execution_options(autocommit=True))
+            for rollup in RETIRED_ROLLUPS:
+                con.execute(sa.text(drop_rollup_view_sql(schema, table, rollup)).execution_options(autocommit=True))
+            logger.info(f'refreshed the rollups of {schema}.{table}')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    refresh_prices_rollups()
@@ -0,0 +1,46 @@
+"""
+create and refresh the consolidated ("wide") implied volatility views
+
+ $ python refresh_wide_ivol_tables.py
+
+Supposed to be run after each import of end of day data. Creates missing views
+and refreshes existing ones concurrently, i.e. without blocking readers.
+Symbols without per delta tables are skipped. See ``src/ivol_wide.py``.
+"""
+import logging
+
+import sqlalchemy as sa
+
+from src.db import engines
+from src.ivol_wide import (
+    compose_ivol_table_name_base,
+    compose_wide_table_name,
+    create_wide_view_sql,
+    refresh_wide_view_sql,
+)
+from src.schema import symbol_registry
+
+logger = logging.getLogger(__name__)
+
+
+def relation_exists(con, schema: str, table: str) -> bool:
+    sql = sa.text('SELECT to_regclass(:relation) IS NOT NULL;')
+    return con.execute(sql, relation=f'{schema}.{table}').scalar()
+
+
+def refresh_wide_ivol_tables():
+    with engines.pgivbase.connect() as con:
+        for config in sorted(symbol_registry.configs):
+            schema, table_name_base = compose_ivol_table_name_base(config.ust, config.exchange, config.symbol)
+            table = compose_wide_table_name(table_name_base)
+            if not relation_exists(con, schema, f'{table_name_base}d050'):
+                logger.info(f'skipping {schema}.{table}. no per delta tables')
+                continue
+            con.execute(sa.text(create_wide_view_sql(schema, table_name_base)).execution_options(autocommit=True))
+            con.execute(sa.text(refresh_wide_view_sql(schema, table_name_base)).execution_options(autocommit=True))
+            logger.info(f'refreshed {schema}.{table}')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    refresh_wide_ivol_tables()
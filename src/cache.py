@@ -0,0 +1,82 @@
+"""
+small in-process caches.
+
+Every (gunicorn/uvicorn) worker holds its own instances. Hence, invalidating
+an entry only affects the current worker. The time to live bounds the staleness
+of entries in the other workers.
+"""
+from collections import OrderedDict
+import time
+import typing as t
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    bounded mapping with least recently used eviction and a time to live per entry
+
+    >>> cache = TTLCache(maxsize=2, ttl=60)
+    >>> cache.set('spy', 1)
+    >>> cache.get('spy')
+    1
+    """
+    def __init__(
+            self,
+            maxsize: int,
+            ttl: float,
+            *,
+            timer: t.Callable[[], float] = time.monotonic,
+    ):
+        if maxsize < 1:
+            raise ValueError('`maxsize` needs to be a positive integer')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[t.Hashable, t.Tuple[float, t.Any]]' = OrderedDict()
+
+    def get(self, key: t.Hashable, default: t.Any = None) -> t.Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= self.timer():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: t.Hashable, value: t.Any, ttl: float = None):
+        """store ``value``. ``ttl`` overrides the default time to live of the cache"""
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (self.timer() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: t.Hashable) -> bool:
+        """drop a single entry. returns whether the entry existed"""
+        return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def __contains__(self, key: t.Hashable) -> bool:
+        item = self._data.get(key, _MISSING)
+        return item is not _MISSING and item[0] > self.timer()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,257 @@
+"""
+in-memory copy of the ``cinfo`` catalog
+
+``cinfo`` lists every option chain (``ust``, ``exchange``, ``symbol``, ``ltd``, ...)
+together with the relation (``schema_name``, ``table_name``) holding its data.
+It changes at most once a day. Each worker loads it at startup, reloads it in the
+background (``appconfig.CINFO_CATALOG_REFRESH_SECONDS``) and on demand via
+``POST /info/catalog/refresh``. Until the first load succeeded, the ``/info`` routes
+fall back to querying the database.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+import logging
+import typing as t
+
+from databases.core import Connection
+
+import appconfig
+from src.db import async_engines
+from src.utils import CinfoQueries
+
+logger = logging.getLogger(__name__)
+
+
+class CinfoRecord(t.NamedTuple):
+    ust: str
+    exchange: str
+    symbol: str
+    ltd: str
+    option_month: t.Optional[str]
+    underlying_month: t.Optional[str]
+    schema_name: str
+    table_name: str
+
+
+RelationKey = t.Tuple[str, str, str, str, t.Optional[str], t.Optional[str]]
+
+
+def _optional_str(value: t.Any) -> t.Optional[str]:
+    return None if value is None else str(value)
+
+
+def relation_key(
+        ust: str,
+        exchange: str,
+        symbol: str,
+        ltd: t.Any,
+        option_month: t.Any = None,
+        underlying_month: t.Any = None,
+) -> RelationKey:
+    """
+    key of an option chain. like ``resolve_schema_and_table_name_sql``, the months
+    only identify option chains on futures and are ignored otherwise
+    """
+    if ust != 'fut':
+        option_month = underlying_month = None
+    return ust, exchange, symbol, str(ltd), _optional_str(option_month), _optional_str(underlying_month)
+
+
+def _freeze(index: t.Dict[t.Hashable, t.Set]) -> t.Dict[t.Hashable, t.Tuple]:
+    return {key: tuple(sorted(values)) for key, values in index.items()}
+
+
+class CinfoIndex:
+    """immutable lookups over a snapshot of ``cinfo``. all values are sorted tuples"""
+    def __init__(self, records: t.Iterable[CinfoRecord]):
+        usts = set()
+        exchanges = set()
+        symbols = set()
+        exchanges_by_ust = defaultdict(set)
+        symbols_by_ust = defaultdict(set)
+        symbols_by_exchange = defaultdict(set)
+        symbols_by_ust_exchange = defaultdict(set)
+        ltds_by_symbol = defaultdict(set)
+        months_by_ltd = defaultdict(set)
+        relations = {}
+        size = 0
+        for record in records:
+            size += 1
+            usts.add(record.ust)
+            exchanges.add(record.exchange)
+            symbols.add(record.symbol)
+            exchanges_by_ust[record.ust].add(record.exchange)
+            symbols_by_ust[record.ust].add(record.symbol)
+            symbols_by_exchange[record.exchange].add(record.symbol)
+            symbols_by_ust_exchange[(record.ust, record.exchange)].add(record.symbol)
+            ltds_by_symbol[(record.ust, record.exchange, record.symbol)].add(record.ltd)
+            if record.option_month is not None and record.underlying_month is not None:
+                key = (record.ust, record.exchange, record.symbol, record.ltd)
+                months_by_ltd[key].add((record.option_month, record.underlying_month))
+            relations.setdefault(
+                relation_key(*record[:6]),
+                (record.schema_name, record.table_name),
+            )
+        self.size = size
+        self.usts = tuple(sorted(usts))
+        self.exchanges = tuple(sorted(exchanges))
+        self.symbols = tuple(sorted(symbols))
+        self.exchanges_by_ust = _freeze(exchanges_by_ust)
+        self.symbols_by_ust = _freeze(symbols_by_ust)
+        self.symbols_by_exchange = _freeze(symbols_by_exchange)
+        self.symbols_by_ust_exchange = _freeze(symbols_by_ust_exchange)
+        self.ltds_by_symbol = _freeze(ltds_by_symbol)
+        self.months_by_ltd = _freeze(months_by_ltd)
+        self.relations: t.Dict[RelationKey, t.Tuple[str, str]] = relations
+
+    def get_exchanges(self, ust: t.Optional[str] = None) -> t.Tuple[str, ...]:
+        if ust:
+            return self.exchanges_by_ust.get(ust, ())
+        return self.exchanges
+
+    def get_symbols(self, ust: t.Optional[str] = None, exchange: t.Optional[str] = None) -> t.Tuple[str, ...]:
+        if ust and exchange:
+            return self.symbols_by_ust_exchange.get((ust, exchange), ())
+        elif ust:
+            return self.symbols_by_ust.get(ust, ())
+        elif exchange:
+            return self.symbols_by_exchange.get(exchange, ())
+        return self.symbols
+
+    def get_ltds(self, ust: str, exchange: str, symbol: str) -> t.Tuple[str, ...]:
+        return self.ltds_by_symbol.get((ust, exchange, symbol), ())
+
+    def get_option_and_underlying_months(
+            self,
+            ust: str,
+            exchange: str,
+            symbol: str,
+            ltd: str,
+    ) -> t.Tuple[t.Tuple[str, str], ...]:
+        return self.months_by_ltd.get((ust, exchange, symbol, ltd), ())
+
+
+class CinfoCatalog:
+    """
+    holds the current ``CinfoIndex`` of a worker
+
+    a reload builds a new index and swaps it in as a whole.
+    requests never see a partially built index.
+
+    relations which are missing in the index (e.g. chains listed after the last reload)
+    are resolved by the database once and added with ``add_relation``.
+    """
+    def __init__(self):
+        self._index: t.Optional[CinfoIndex] = None
+        self._added_relations: t.Dict[RelationKey, t.Tuple[str, str]] = {}
+        self.loaded_at: t.Optional[datetime] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._index is not None
+
+    @property
+    def index(self) -> CinfoIndex:
+        if self._index is None:
+            raise RuntimeError('the cinfo catalog has not been loaded yet')
+        return self._index
+
+    def load(self, rows: t.Iterable[t.Mapping[str, t.Any]]) -> CinfoIndex:
+        records = (
+            CinfoRecord(
+                ust=row['ust'],
+                exchange=row['exchange'],
+                symbol=row['symbol'],
+                ltd=str(row['ltd']),
+                option_month=_optional_str(row['option_month']),
+                underlying_month=_optional_str(row['underlying_month']),
+                schema_name=row['schema_name'],
+                table_name=row['table_name'],
+            )
+            for row in rows
+        )
+        self._index = CinfoIndex(records)
+        self._added_relations = {}
+        self.loaded_at = datetime.utcnow()
+        return self._index
+
+    async def refresh(self, con: Connection) -> CinfoIndex:
+        rows = await con.fetch_all(CinfoQueries.catalog_f())
+        index = self.load(rows)
+        logger.info(f'loaded {index.size} records into the cinfo catalog')
+        return index
+
+    def get_relation(self, args: t.Dict[str, t.Any]) -> t.Optional[t.Tuple[str, str]]:
+        """``(schema, table)`` of the option chain described by ``args`` or ``None``"""
+        key = _relation_key_from_args(args)
+        relation = self._added_relations.get(key)
+        if relation is None and self._index is not None:
+            relation = self._index.relations.get(key)
+        return relation
+
+    def add_relation(self, args: t.Dict[str, t.Any], schema: str, table: str):
+        self._added_relations[_relation_key_from_args(args)] = (schema, table)
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            'is_loaded': self.is_loaded,
+            'loaded_at': self.loaded_at,
+            'size': self._index.size if self._index is not None else 0,
+        }
+
+
+def _relation_key_from_args(args: t.Dict[str, t.Any]) -> RelationKey:
+    return relation_key(
+        args['ust'],
+        args['exchange'],
+        args['symbol'],
+        args['ltd'],
+        args.get('option_month'),
+        args.get('underlying_month'),
+    )
+
+
+cinfo_catalog = CinfoCatalog()
+_refresh_task: t.Optional[asyncio.Task] = None
+
+
+async def refresh_cinfo_catalog() -> CinfoIndex:
+    async with async_engines.options_rawdata.connection() as con:
+        return await cinfo_catalog.refresh(con)
+
+
+async def _try_refresh_cinfo_catalog():
+    try:
+        await refresh_cinfo_catalog()
+    except Exception:
+        # keep serving the previous snapshot (or the database fallback)
+        logger.exception('failed to load the cinfo catalog')
+
+
+async def _refresh_cinfo_catalog_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        await _try_refresh_cinfo_catalog()
+
+
+async def start_cinfo_catalog():
+    """startup hook. requires the async engines to be connected"""
+    global _refresh_task
+    await _try_refresh_cinfo_catalog()
+    if appconfig.CINFO_CATALOG_REFRESH_SECONDS > 0:
+        _refresh_task = asyncio.ensure_future(
+            _refresh_cinfo_catalog_periodically(appconfig.CINFO_CATALOG_REFRESH_SECONDS)
+        )
+
+
+async def stop_cinfo_catalog():
+    """shutdown hook"""
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
@@ -37,6 +37,7 @@ STR_INTERVAL_WEEK = 'week'
 STR_INTERVAL_HOUR = 'hour'
 STR_INTERVAL_DAY = 'day'
 STR_INTERVAL_MINUTES = 'minutes'
+STR_INTERVAL_SESSION = 'session'
 
 
 class IntervalUnitChoices(str, Enum):
@@ -45,6 +46,7 @@ class IntervalUnitChoices(str, Enum):
     _hour = STR_INTERVAL_HOUR
     _day = STR_INTERVAL_DAY
     _minutes = STR_INTERVAL_MINUTES
+    _session = STR_INTERVAL_SESSION
 
 
 STR_INTERVAL_VALUES_1 = '1'
@@ -752,6 +754,17 @@ class OrderChoices(str, Enum):
     _desc = STR_ORDERING_DESC
 
 
+STR_FORMAT_JSON = 'json'
+STR_FORMAT_NDJSON = 'ndjson'
+STR_FORMAT_CSV = 'csv'
+
+
+class ResponseFormatChoices(str, Enum):
+    _json = STR_FORMAT_JSON
+    _ndjson = STR_FORMAT_NDJSON
+    _csv = STR_FORMAT_CSV
+
+
 STR_PUT = 'put'
 STR_CALL = 'call'
 
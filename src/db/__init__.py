@@ -1,7 +1,12 @@
+import asyncio
+import json
 import logging
 import typing as t
 
+import asyncpg
 from databases import Database
+from databases.core import Connection
+import orjson
 import sqlalchemy
 from sqlalchemy.engine import ResultProxy
 from sqlalchemy.orm import sessionmaker
@@ -67,31 +72,58 @@ def engine_factory() -> Engines:
     return engines_instance
 
 
+async def init_async_connection(con: asyncpg.Connection):
+    """
+    asyncpg returns ``json`` and ``jsonb`` columns as plain strings.
+    Decode them like psycopg2 does, since resolvers return ``json_agg`` results as they are.
+    """
+    for type_name in ['json', 'jsonb']:
+        await con.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=orjson.loads,
+            schema='pg_catalog',
+        )
+
+
+def async_pool_options() -> t.Dict[str, t.Any]:
+    """keyword arguments passed on to ``asyncpg.create_pool`` (per worker and database)"""
+    return {
+        'min_size': appconfig.ASYNC_DB_POOL_MIN_SIZE,
+        'max_size': appconfig.ASYNC_DB_POOL_MAX_SIZE,
+        'init': init_async_connection,
+    }
+
+
 def async_engine_factory() -> AsyncEngines:
     """
-    Calls ``create_engine`` for all databases needed for the app.
+    Creates a ``databases.Database`` (i.e. a connection pool) for all databases needed for the app.
     Returns a dot-accessible wrapper class.
     """
     engines_instance = AsyncEngines()
     engines_instance.prices_intraday = Database(
         appconfig.data_pgc.get_uri(
             appconfig.data_pgc.prices_intraday_db_name
-        )
+        ),
+        **async_pool_options(),
     )
     engines_instance.pgivbase = Database(
         appconfig.data_pgc.get_uri(
             appconfig.data_pgc.volatility_db_name
-        )
+        ),
+        **async_pool_options(),
     )
     engines_instance.options_rawdata = Database(
         appconfig.data_pgc.get_uri(
             appconfig.data_pgc.options_db_name
-        )
+        ),
+        **async_pool_options(),
     )
     engines_instance.users = Database(
         appconfig.app_pgc.get_uri(
             appconfig.app_pgc.application_db_name
-        )
+        ),
+        **async_pool_options(),
     )
     return engines_instance
 
@@ -112,24 +144,24 @@ async_engines = async_engine_factory()
 
 async def connect_async_engines():
     """
-    release the database Sessions
+    open the connection pools of the async database engines
     """
     logging.debug('connecting database engines.')
-#    await async_engines.prices_intraday.connect()
-#    await async_engines.pgivbase.connect()
-#    await async_engines.options_rawdata.connect()
+    await async_engines.prices_intraday.connect()
+    await async_engines.pgivbase.connect()
+    await async_engines.options_rawdata.connect()
     await async_engines.users.connect()
     logging.debug('connected database engines.')
 
 
 async def disconnect_async_engines():
     """
-    release the database Sessions
+    close the connection pools of the async database engines
     """
     logging.debug('disconnecting async database engines.')
-#    await async_engines.prices_intraday.disconnect()
-#    await async_engines.pgivbase.disconnect()
-#    await async_engines.options_rawdata.disconnect()
+    await async_engines.prices_intraday.disconnect()
+    await async_engines.pgivbase.disconnect()
+    await async_engines.options_rawdata.disconnect()
     await async_engines.users.disconnect()
     logging.debug('disconnected async database engines.')
 
@@ -146,6 +178,41 @@ def dispose_engines():
     logging.info('disposed database engines.')
 
 
+def fresh_connection(database: Database) -> Connection:
+    """
+    a connection which is not shared with other tasks.
+
+    ``Database.connection()`` returns the connection bound to the current context.
+    Tasks spawned by ``asyncio.gather`` inherit that context and hence would
+    serialize their queries on a single connection.
+    """
+    return Connection(database._backend)
+
+
+async def fetch_all_concurrently(
+        database: Database,
+        queries: t.Sequence[str],
+        *,
+        limit: int = None,
+) -> t.List[t.Union[t.List[t.Mapping], BaseException]]:
+    """
+    run ``queries`` concurrently, each on a connection of its own, at most ``limit`` at a time.
+    results are returned in the order of ``queries``. a failing query returns its exception
+    in place of its rows and does not cancel the others.
+    """
+    semaphore = asyncio.Semaphore(limit or appconfig.FAN_OUT_CONCURRENCY)
+
+    async def fetch_all(sql: str):
+        async with semaphore:
+            async with fresh_connection(database) as con:
+                return await con.fetch_all(sql)
+
+    return await asyncio.gather(
+        *(fetch_all(sql) for sql in queries),
+        return_exceptions=True,
+    )
+
+
 async def get_async_prices_intraday_db():
     async with async_engines.prices_intraday.connection() as con:
         yield con
@@ -2,6 +2,7 @@ from datetime import datetime as dt
 import re
 import typing as t
 
+from databases.core import Connection
 import fastapi
 from fastapi import (
     Body,
@@ -9,18 +10,17 @@ from fastapi import (
 )
 import pydantic
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 
 from src.const import (
     exchange_choices,
-    iv_all_sym_choices,
     ust_choices,
 )
 from src.db import (
-    get_options_rawdata_db,
+    get_async_options_rawdata_db,
     results_proxy_to_list_of_dict,
 )
 from src.rawoption_data import get_schema_and_table_name
+from src.schema import symbol_registry
 from src.users import (
     User,
     get_current_active_user,
@@ -40,7 +40,7 @@ class DeltaQuery(BaseModel):
 
     @pydantic.validator('symbol')
     def symbol_validator(cls, v):
-        if v not in iv_all_sym_choices:
+        if not symbol_registry.is_ivol_symbol(v):
             raise ValueError('not a valid value for `symbol`')
         return v
 
@@ -104,7 +104,7 @@ async def post_delta_data(
                 "ltd": "20191115"
             }
         ),
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -160,7 +160,7 @@ async def post_delta_data(
     return data
 
 
-async def resolve_delta_query(args: {}, con: Session):
+async def resolve_delta_query(args: {}, con: Connection):
     args = eod_ini_logic_new(args)
     relation = await get_schema_and_table_name(args, con)
     if len(relation) != 2:
@@ -168,8 +168,8 @@ async def resolve_delta_query(args: {}, con: Session):
     args['schema'] = relation['schema']
     args['table'] = relation['table']
     sql = delta_query_sql(**args)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     if len(data) != 0:
         return data[0].get('jsonb_object_agg')
     else:
@@ -1,7 +1,9 @@
 from datetime import date as Date
+from datetime import datetime
 import typing as t
 from typing import Union
 
+from databases.core import Connection
 import fastapi
 from fastapi import (
     Body,
@@ -10,21 +12,23 @@ from fastapi import (
 from fastapi.responses import ORJSONResponse
 import pydantic
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 from starlette import status
 from starlette.exceptions import HTTPException
 
+from src.catalog import cinfo_catalog
 from src.const import (
     PutCallChoices,
     pc_choices,
 )
 from src.db import (
-    get_options_rawdata_db,
+    async_engines,
+    get_async_options_rawdata_db,
     results_proxy_to_list_of_dict,
 )
 from src.rawoption_data import get_schema_and_table_name
 from src.users import (
     User,
+    get_current_active_superuser,
     get_current_active_user,
 )
 from src.utils import CinfoQueries
@@ -60,6 +64,15 @@ class GetStrikesModel(BaseModel):
 router = fastapi.APIRouter()
 
 
+async def fetch_all_rawdata(sql: str) -> t.List[t.Mapping]:
+    """
+    rows of ``sql``. the routes answered by the ``cinfo`` catalog only
+    acquire a connection if the catalog is not loaded
+    """
+    async with async_engines.options_rawdata.connection() as con:
+        return await con.fetch_all(sql)
+
+
 class Ust(BaseModel):
     ust: str
 
@@ -71,12 +84,13 @@ class Ust(BaseModel):
     response_class=ORJSONResponse,
 )
 async def get_api_info_usts(
-    con: Session = Depends(get_options_rawdata_db),
     user: User = Depends(get_current_active_user),
 ):
     """return available ``ust``s"""
+    if cinfo_catalog.is_loaded:
+        return [{'ust': ust} for ust in cinfo_catalog.index.usts]
     sql = CinfoQueries.ust_f()
-    res = con.execute(sql).fetchall()
+    res = await fetch_all_rawdata(sql)
     return res
 
 
@@ -92,10 +106,11 @@ class Exchange(BaseModel):
 )
 async def get_api_info_exchanges(
         ust: str,
-        con: Session = Depends(get_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """return available ``exchange`` for a given ``ust``"""
+    if cinfo_catalog.is_loaded:
+        return [{'exchange': exchange} for exchange in cinfo_catalog.index.get_exchanges(ust)]
     args = {
         'ust': ust,
     }
@@ -103,7 +118,7 @@ async def get_api_info_exchanges(
         sql = CinfoQueries.exchange_where_ust_f(args)
     else:
         sql = CinfoQueries.exchange_f(args)
-    res = con.execute(sql).fetchall()
+    res = await fetch_all_rawdata(sql)
     return res
 
 
@@ -120,13 +135,14 @@ class Symbol(BaseModel):
 async def get_api_info_symbols(
         ust: str,
         exchange: str,
-        con: Session = Depends(get_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
     TODO: validate ``ust`` and ``exchange``
     return symbols for ``ust`` and/or ``exchange``
     """
+    if cinfo_catalog.is_loaded:
+        return [{'symbol': symbol} for symbol in cinfo_catalog.index.get_symbols(ust, exchange)]
     args = {
         'ust': ust,
         'exchange': exchange,
@@ -148,7 +164,7 @@ async def get_api_info_symbols(
         sql = CinfoQueries.symbol_where_exchange_f(args)
     else:
         sql = CinfoQueries.symbol_f(args)
-    res = con.execute(sql).fetchall()
+    res = await fetch_all_rawdata(sql)
     return res
 
 
@@ -166,7 +182,6 @@ async def get_api_info_ltd(
         ust: str,
         exchange: str,
         symbol: str,
-        con: Session = Depends(get_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -176,14 +191,16 @@ async def get_api_info_ltd(
     [{'ltd': '20241115'}, {'ltd': '20251117'}, ...]
 
     """
+    if cinfo_catalog.is_loaded:
+        return [{'ltd': ltd} for ltd in cinfo_catalog.index.get_ltds(ust, exchange, symbol)]
     args = {
         'ust': ust,
         'exchange': exchange,
         'symbol': symbol,
     }
     sql = CinfoQueries.ltd_where_ust_exchange_and_symbol_f(args)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await fetch_all_rawdata(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
 
 
@@ -203,7 +220,6 @@ async def get_api_info_option_month_and_underlying_month(
         exchange: str,
         symbol: str,
         ltd: str,
-        con: Session = Depends(get_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -221,12 +237,41 @@ async def get_api_info_option_month_and_underlying_month(
             status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Only relevant for futures(ust='fut')"
         )
+    if cinfo_catalog.is_loaded:
+        months = cinfo_catalog.index.get_option_and_underlying_months(ust, exchange, symbol, ltd)
+        return [
+            {'option_month': option_month, 'underlying_month': underlying_month}
+            for option_month, underlying_month in months
+        ]
     sql = CinfoQueries.option_month_underlying_month_f(query)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await fetch_all_rawdata(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
 
 
+class CatalogStats(BaseModel):
+    is_loaded: bool
+    loaded_at: t.Optional[datetime]
+    size: int
+
+
+@router.post(
+    '/catalog/refresh',
+    operation_id='post_api_info_catalog_refresh',
+    response_model=CatalogStats,
+    response_class=ORJSONResponse,
+)
+async def post_api_info_catalog_refresh(
+        con: Connection = Depends(get_async_options_rawdata_db),
+        user: User = Depends(get_current_active_superuser),
+):
+    """
+    reload the in-memory ``cinfo`` catalog of the worker processing the request
+    """
+    await cinfo_catalog.refresh(con)
+    return cinfo_catalog.stats()
+
+
 class FirstLast(BaseModel):
     first: Date
     last: Date
@@ -245,7 +290,7 @@ async def get_api_info_first_and_last(
         ltd: str,
         option_month: str = None,
         underlying_month: str = None,
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -289,8 +334,8 @@ async def get_api_info_first_and_last(
     args['schema'] = meta['schema']
     args['table'] = meta['table']
     sql = CinfoQueries.first_and_last_f(args)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
 
 
@@ -312,7 +357,7 @@ async def get_api_info_strikes(
         ltd: str,
         underlying_month: str = None,
         option_month: str = None,
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -349,7 +394,7 @@ async def post_api_info_strikes(
                 "ltd": "20200117"
             }
         ),
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -363,7 +408,7 @@ async def post_api_info_strikes(
     return result
 
 
-async def resolve_strikes(args: t.Dict, con: Session):
+async def resolve_strikes(args: t.Dict, con: Connection):
     relation = await get_schema_and_table_name(args, con)
     if len(relation) != 2:
         return []
@@ -375,6 +420,6 @@ async def resolve_strikes(args: t.Dict, con: Session):
     args2['schema'] = relation['schema']
     args2['table'] = relation['table']
     sql = CinfoQueries.strikes_where_table_and_pc_f(args2)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
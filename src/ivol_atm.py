@@ -1,23 +1,36 @@
 from datetime import date as Date
 import typing as t
 
+from databases.core import Connection
 from falib.contract import Contract
 import fastapi
-from fastapi import Depends
+from fastapi import (
+    Body,
+    Depends,
+)
 from fastapi.responses import ORJSONResponse
+import pydantic
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
 
+import appconfig
 from src.const import (
     OrderChoices,
     deltaChoicesPractical,
+    time_to_var,
     time_to_var_func,
     tteChoices,
 )
 from src.db import (
-    get_pgivbase_db,
+    get_async_pgivbase_db,
     results_proxy_to_list_of_dict,
 )
+from src.ivol_series import (
+    align_series,
+    load_series,
+    resolve_series_key,
+)
 from src.users import (
     User,
     get_current_active_user,
@@ -52,7 +65,7 @@ async def get_ivol(
         tte: tteChoices = tteChoices._1m,
         delta: deltaChoicesPractical = deltaChoicesPractical._d050,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_pgivbase_db),
+        con: Connection = Depends(get_async_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -101,7 +114,7 @@ async def get_atm_ivol(
         enddate: Date = None,
         dminus: int = 30,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_pgivbase_db),
+        con: Connection = Depends(get_async_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -131,6 +144,190 @@ async def get_atm_ivol(
     return content
 
 
+class TermStructure(BaseModel):
+    """
+    term structures of consecutive dates as one array indexed by ``[date][tte]``
+    """
+    dates: t.List[Date]
+    ttes: t.List[str]
+    values: t.List[t.List[t.Optional[float]]]
+
+
+@router.get(
+    '/ivol/term-structure',
+    summary='Get implied volatility data for a single delta and all ttes',
+    operation_id='get_ivol_term_structure',
+    response_model=TermStructure,
+    response_class=ORJSONResponse,
+)
+async def get_ivol_term_structure(
+        symbol: str,
+        ust: str = None,
+        exchange: str = None,
+        startdate: Date = None,
+        enddate: Date = None,
+        dminus: int = 30,
+        delta: deltaChoicesPractical = deltaChoicesPractical._d050,
+        order: OrderChoices = OrderChoices._asc,
+        con: Connection = Depends(get_async_pgivbase_db),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    implied volatility term structure time series.
+    Every time to expiry from 10d up to 24m is returned in one read.
+
+    - **symbol**: example: 'SPY' or 'spy' (case insensitive)
+    - **ust**: underlying security type: ['fut', 'eqt', 'ind', 'fx']
+    - **exchange**: one of: ['usetf', 'cme', 'ice', 'eurex']
+    - **startdate**: format: yyyy-mm-dd
+    - **enddate**: format: yyyy-mm-dd
+    - **dminus**: indicate the number of days back from `enddate`
+    - **delta**: e.g. d050 (default)
+    - **order**:  sorting order with respect to date
+
+    `values[i][j]` is the value at `dates[i]` of the time to expiry `ttes[j]`.
+    """
+    args = {
+        'symbol': symbol,
+        'ust': ust,
+        'exchange': exchange,
+        'startdate': startdate,
+        'enddate': enddate,
+        'dminus': dminus,
+        'delta': delta.value,
+        'order': order.value
+    }
+    content = await resolve_ivol_term_structure(args, con)
+    return content
+
+
+async def select_ivol_term_structure(args):
+    args = eod_ini_logic_new(args)
+    args = guess_exchange_and_ust(args)
+    c = Contract()
+    c.symbol = args['symbol']
+    c.exchange = args['exchange']
+    c.security_type = args['ust']
+    c.target_table_name_base = await c.compose_ivol_table_name_base()
+    schema = await c.compose_2_part_schema_name()
+    table = await c.compose_ivol_final_table_name(args['delta'])
+    sql = f'''
+        SELECT dt, {', '.join(time_to_var.values())}
+        FROM {schema}.{table}
+        WHERE dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
+        ORDER BY dt  {args['order']};
+    '''
+    return sql
+
+
+def compose_term_structure(rows: t.Iterable[t.Mapping[str, t.Any]]) -> t.Dict[str, t.Any]:
+    """pack rows of ``select_ivol_term_structure`` into the ``TermStructure`` layout"""
+    dates = []
+    values = []
+    for row in rows:
+        dates.append(row['dt'])
+        values.append([row[var] for var in time_to_var.values()])
+    return {
+        'dates': dates,
+        'ttes': list(time_to_var),
+        'values': values,
+    }
+
+
+async def resolve_ivol_term_structure(args, con: Connection):
+    sql = await select_ivol_term_structure(args)
+    rows = await con.fetch_all(sql)
+    return compose_term_structure(rows)
+
+
+class IvolSeriesSpec(BaseModel):
+    symbol: str
+    ust: t.Optional[str] = None
+    exchange: t.Optional[str] = None
+    tte: tteChoices = tteChoices._1m
+    delta: deltaChoicesPractical = deltaChoicesPractical._d050
+
+
+class IvolBatchQuery(BaseModel):
+    series: t.List[IvolSeriesSpec]
+    startdate: t.Optional[Date] = None
+    enddate: t.Optional[Date] = None
+    dminus: int = 30
+
+    @pydantic.validator('series')
+    def series_validator(cls, v):
+        if not 0 < len(v) <= appconfig.IVOL_BATCH_MAX_SERIES:
+            raise ValueError(f'between 1 and {appconfig.IVOL_BATCH_MAX_SERIES} series are allowed per request')
+        return v
+
+
+class IvolBatch(BaseModel):
+    dates: t.List[Date]
+    series: t.List[IvolSeriesSpec]
+    values: t.List[t.List[t.Optional[float]]]
+
+
+@router.post(
+    '/ivol/batch',
+    summary='Get implied volatility data for many symbols, deltas and ttes at once',
+    operation_id='post_ivol_batch',
+    response_model=IvolBatch,
+    response_class=ORJSONResponse,
+)
+async def post_ivol_batch(
+        query: IvolBatchQuery = Body(
+            ...,
+            example={
+                'series': [
+                    {'symbol': 'spy', 'tte': '1m', 'delta': 'd050'},
+                    {'symbol': 'spy', 'tte': '3m', 'delta': 'd050'},
+                    {'symbol': 'cl', 'tte': '1m', 'delta': 'd025'},
+                ],
+                'dminus': 30,
+            },
+        ),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    implied volatility time series of many (`symbol`, `tte`, `delta`) combos in one request.
+    Series of the same symbol and delta are read from their table at once.
+
+    `values[i][j]` is the value of `series[i]` at `dates[j]`. `dates` is the union
+    of the dates of all series. Missing values are `null`.
+    `series` echoes the requested series with the resolved `ust` and `exchange`.
+    """
+    args = query.dict()
+    content = await resolve_ivol_batch(args)
+    return content
+
+
+async def resolve_ivol_batch(args):
+    args = eod_ini_logic_new(args)
+    keys = []
+    for spec in args['series']:
+        try:
+            key = resolve_series_key(
+                symbol=spec['symbol'],
+                delta=spec['delta'].value,
+                tte=spec['tte'].value,
+                ust=spec['ust'],
+                exchange=spec['exchange'],
+            )
+        except HTTPException as e:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f'series {spec["symbol"]}: {e.detail}',
+            )
+        keys.append(key)
+    series = await load_series(keys, args['startdate'], args['enddate'])
+    dates, values = align_series([series[key] for key in keys])
+    return {
+        'dates': dates,
+        'series': [key._asdict() for key in keys],
+        'values': values,
+    }
+
+
 async def select_ivol(args):
     """ """
     args = eod_ini_logic_new(args)
@@ -154,8 +351,8 @@ async def select_ivol(args):
     return sql
 
 
-async def resolve_ivol(args, con: Session):
+async def resolve_ivol(args, con: Connection):
     sql = await select_ivol(args)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
@@ -1,35 +1,33 @@
 from datetime import date as Date
 import typing as t
 
-from falib.contract import ContractSync
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 
 from src.const import (
     OrderChoices,
     deltaChoicesPractical,
-    time_to_var_func,
     tteChoices,
 )
-from src.db import get_pgivbase_db
+from src.ivol_series import resolve_series_key
+from src.ivol_spread import (
+    SpreadLeg,
+    evaluate_spread,
+)
 from src.users import (
     User,
     get_current_active_user,
 )
-from src.utils import (
-    eod_ini_logic_new,
-    guess_exchange_and_ust,
-)
+from src.utils import eod_ini_logic_new
 
 router = fastapi.APIRouter()
 
 
 class ivol_calendar(BaseModel):
     dt: Date
-    value: float
+    value: t.Optional[float]
 
 
 @router.get(
@@ -51,7 +49,6 @@ async def get_ivol_calendar(
         delta1: deltaChoicesPractical = deltaChoicesPractical._d050,
         delta2: deltaChoicesPractical = deltaChoicesPractical._d050,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -91,46 +88,18 @@ async def get_ivol_calendar(
         'delta2': delta2,
         'order': order.value
     }
-    content = await resolve_ivol_calendar_spread(args, con)
+    content = await resolve_ivol_calendar_spread(args)
     return content
 
 
-async def select_calendar_spread(args):
+async def resolve_ivol_calendar_spread(args):
+    """``(tte1, delta1) - (tte2, delta2)`` evaluated by the spread engine (see ``src.ivol_spread``)"""
     args = eod_ini_logic_new(args)
-    args = guess_exchange_and_ust(args)
-    args['tte1'] = time_to_var_func(args['tte1'])
-    args['tte2'] = time_to_var_func(args['tte2'])
-
-    c = ContractSync()
-    c.symbol = args['symbol']
-    c.exchange = args['exchange']
-    c.security_type = args['ust']
-    c.target_table_name_base = c.compose_ivol_table_name_base()
-
-    schema = c.compose_2_part_schema_name()
-    table_first = c.compose_ivol_final_table_name(args['delta1'])
-    table_second = c.compose_ivol_final_table_name(args['delta2'])
-
-    sql = f'''
-    WITH data AS (
-        SELECT
-            first.dt as dt,
-            first.{args['tte1']} - second.{args['tte2']} AS value
-        FROM {schema}.{table_first} first
-        FULL OUTER JOIN  {schema}.{table_second} second
-            ON first.dt = second.dt
-        WHERE first.dt  BETWEEN '{args['startdate']}' AND '{args['enddate']}'
-        ORDER BY dt {args['order'].upper()}
-    )
-    SELECT json_agg(data) as json_agg FROM data;
-    '''
-    return sql
-
-
-async def resolve_ivol_calendar_spread(args, con: Session):
-    sql = await select_calendar_spread(args)
-    data = con.execute(sql).fetchall()
-    if len(data) > 0 and len(data[0]) > 0:
-        return data[0][0]
-    else:
-        return []
+    legs = [
+        SpreadLeg(resolve_series_key(args['symbol'], delta, tte, args['ust'], args['exchange']), weight)
+        for delta, tte, weight in (
+            (args['delta1'], args['tte1'], 1.0),
+            (args['delta2'], args['tte2'], -1.0),
+        )
+    ]
+    return await evaluate_spread(legs, args['startdate'], args['enddate'], order=args['order'])
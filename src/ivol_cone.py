@@ -0,0 +1,179 @@
+"""
+volatility cones
+
+A cone describes the distribution of the implied volatility of each time to expiry
+(``10d`` ... ``24m``) over a lookback: minimum, percentiles, maximum and the latest value.
+All times to expiry are read from the per delta table of the symbol in one scan.
+Cones are cached per worker until the next date is published.
+"""
+from datetime import date as Date
+from datetime import timedelta
+import math
+import typing as t
+import warnings
+
+from databases.core import Connection
+import fastapi
+from fastapi import Depends
+from fastapi.responses import ORJSONResponse
+import numpy as np
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+from starlette.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
+
+import appconfig
+from src.cache import TTLCache
+from src.const import (
+    deltaChoicesPractical,
+    time_to_var,
+)
+from src.db import get_async_pgivbase_db
+from src.ivol_series import (
+    SeriesKey,
+    align_series,
+    load_series,
+)
+from src.ivol_surface_by_delta import select_last_date_cached
+from src.users import (
+    User,
+    get_current_active_user,
+)
+from src.utils import guess_exchange_and_ust
+
+router = fastapi.APIRouter()
+
+cone_cache = TTLCache(maxsize=appconfig.CONE_CACHE_MAXSIZE, ttl=appconfig.CONE_CACHE_TTL_SECONDS)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+TTES = tuple(time_to_var)
+
+
+def compute_cone(values: np.ndarray) -> t.Dict[str, np.ndarray]:
+    """``values`` indexed by ``[date][tte]``. ``nan`` for ttes without observations"""
+    with warnings.catch_warnings():
+        # all-nan ttes
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        bands = np.nanpercentile(values, PERCENTILES, axis=0)
+        minimum = np.nanmin(values, axis=0)
+        maximum = np.nanmax(values, axis=0)
+    observed = ~np.isnan(values)
+    last_index = values.shape[0] - 1 - np.argmax(observed[::-1], axis=0)
+    last = np.where(observed.any(axis=0), values[last_index, np.arange(values.shape[1])], np.nan)
+    return {
+        'min': minimum,
+        'bands': bands,
+        'max': maximum,
+        'last': last,
+        'observations': observed.sum(axis=0),
+    }
+
+
+def _to_list(values: np.ndarray) -> t.List[t.Optional[float]]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+class Cone(BaseModel):
+    """
+    ``bands[i][j]`` is the ``percentiles[i]`` percentile of ``ttes[j]``.
+    ``min``, ``max``, ``last`` and ``observations`` are indexed by tte
+    """
+    symbol: str
+    delta: str
+    startdate: Date
+    enddate: Date
+    ttes: t.List[str]
+    percentiles: t.List[int]
+    min: t.List[t.Optional[float]]
+    bands: t.List[t.List[t.Optional[float]]]
+    max: t.List[t.Optional[float]]
+    last: t.List[t.Optional[float]]
+    observations: t.List[int]
+
+
+@router.get(
+    '/ivol/cone',
+    summary='Get the volatility cone of implied volatility across all ttes',
+    operation_id='get_ivol_cone',
+    response_model=Cone,
+    response_class=ORJSONResponse,
+)
+async def get_ivol_cone(
+        symbol: str,
+        ust: str = None,
+        exchange: str = None,
+        delta: deltaChoicesPractical = deltaChoicesPractical._d050,
+        lookback: int = 365,
+        con: Connection = Depends(get_async_pgivbase_db),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    minimum, 10th, 25th, 50th, 75th and 90th percentile, maximum and the latest value
+    of the implied volatility of each tte from 10d to 24m
+    over the `lookback` calendar days up to the last published date.
+
+    - **symbol**: example: 'SPY' or 'spy' (case insensitive)
+    - **ust**: underlying security type: ['fut', 'eqt', 'ind', 'fx']
+    - **exchange**: one of: ['usetf', 'cme', 'ice', 'eurex']
+    - **delta**: e.g. d050 (default)
+    - **lookback**: number of calendar days back from the last published date
+    """
+    args = {
+        'symbol': symbol,
+        'ust': ust,
+        'exchange': exchange,
+        'delta': delta.value,
+        'lookback': lookback,
+    }
+    content = await resolve_cone(args, con)
+    return content
+
+
+async def resolve_cone(args: t.Dict[str, t.Any], con: Connection):
+    if not 1 < args['lookback'] <= appconfig.CONE_MAX_LOOKBACK_DAYS:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f'`lookback` needs to be between 2 and {appconfig.CONE_MAX_LOOKBACK_DAYS} days',
+        )
+    args = guess_exchange_and_ust(args)
+    symbol = args['symbol'].lower()
+    enddate = await select_last_date_cached(args, con)
+    if enddate is None:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f'no implied volatility data found for {symbol}',
+        )
+    # the last date is part of the key. the cone is recomputed as soon as the next date is published
+    cache_key = (args['ust'], args['exchange'], symbol, args['delta'], args['lookback'], enddate)
+    content = cone_cache.get(cache_key)
+    if content is not None:
+        return content
+
+    startdate = enddate - timedelta(days=args['lookback'])
+    keys = [SeriesKey(args['ust'], args['exchange'], symbol, args['delta'], tte) for tte in TTES]
+    series = await load_series(keys, startdate.strftime('%Y-%m-%d'), enddate.strftime('%Y-%m-%d'))
+    dates, columns = align_series([series[key] for key in keys])
+    if not dates:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f'no implied volatility data found for {symbol} between {startdate} and {enddate}',
+        )
+    values = np.array(columns, dtype=np.float64).T
+    cone = compute_cone(values)
+    content = {
+        'symbol': symbol,
+        'delta': args['delta'],
+        'startdate': startdate,
+        'enddate': enddate,
+        'ttes': list(TTES),
+        'percentiles': list(PERCENTILES),
+        'min': _to_list(cone['min']),
+        'bands': [_to_list(band) for band in cone['bands']],
+        'max': _to_list(cone['max']),
+        'last': _to_list(cone['last']),
+        'observations': cone['observations'].tolist(),
+    }
+    cone_cache.set(cache_key, content)
+    return content
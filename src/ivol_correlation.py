@@ -0,0 +1,263 @@
+"""
+correlation and covariance matrices of implied volatility series
+
+The panel (dates x symbols) is read from the per delta tables of all symbols
+with one query per table (see ``src.ivol_series.load_series``). The matrix is
+computed with NumPy over pairwise complete observations. Hence, symbols
+trading on different calendars (e.g. Eurex and CME) do not drop each others dates.
+Results are cached per worker.
+"""
+from datetime import date as Date
+from datetime import datetime as dt
+from datetime import timedelta
+from enum import Enum
+import math
+import typing as t
+
+import fastapi
+from fastapi import (
+    Body,
+    Depends,
+)
+from fastapi.responses import ORJSONResponse
+import numpy as np
+import pydantic
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+import appconfig
+from src.cache import TTLCache
+from src.const import (
+    deltaChoicesPractical,
+    iv_cme_choices,
+    iv_etf_choices,
+    iv_eurex_choices,
+    iv_ice_choices,
+    tteChoices,
+)
+from src.db import async_engines
+from src.ivol_series import (
+    Observations,
+    SeriesKey,
+    align_series,
+    load_series,
+    resolve_series_key,
+)
+from src.ivol_surface_by_delta import select_last_date_cached
+from src.schema import symbol_registry
+from src.users import (
+    User,
+    get_current_active_user,
+)
+
+router = fastapi.APIRouter()
+
+correlation_cache = TTLCache(maxsize=appconfig.CORRELATION_CACHE_MAXSIZE, ttl=appconfig.CORRELATION_CACHE_TTL_SECONDS)
+
+
+class UniverseChoices(str, Enum):
+    _usetf = 'usetf'
+    _cme = 'cme'
+    _eurex = 'eurex'
+    _ice = 'ice'
+
+
+UNIVERSES = {
+    UniverseChoices._usetf.value: iv_etf_choices,
+    UniverseChoices._cme.value: iv_cme_choices,
+    UniverseChoices._eurex.value: iv_eurex_choices,
+    UniverseChoices._ice.value: iv_ice_choices,
+}
+
+
+class MeasureChoices(str, Enum):
+    _correlation = 'correlation'
+    _covariance = 'covariance'
+
+
+class SeriesTransformChoices(str, Enum):
+    _changes = 'changes'
+    _levels = 'levels'
+
+
+def compose_panel(
+        series: t.Sequence[t.Optional[Observations]],
+) -> t.Tuple[t.List[Date], np.ndarray]:
+    """dates and the panel indexed by ``[date][series]``. ``nan`` where no observation is available"""
+    dates, columns = align_series(series)
+    panel = np.array(columns, dtype=np.float64).reshape(len(series), len(dates)).T
+    return dates, panel
+
+
+def daily_changes(observations: t.Optional[Observations]) -> t.Optional[Observations]:
+    """
+    changes between consecutive observations of a single series, dated by the later one.
+    taken on the dates of the series before aligning it. hence, dates missing
+    in the series (e.g. holidays of its exchange) do not drop any changes
+    """
+    if observations is None:
+        return None
+    observed = [(date, value) for date, value in observations if value is not None]
+    return [
+        (date, value - previous)
+        for (_previous_date, previous), (date, value) in zip(observed, observed[1:])
+    ]
+
+
+def pairwise_moments(panel: np.ndarray) -> t.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    sample covariance of each pair of columns over the rows where both are observed,
+    the sample variances of both columns over the same rows and the number of rows
+    """
+    observed = (~np.isnan(panel)).astype(np.float64)
+    values = np.where(observed > 0, panel, 0.0)
+    count = observed.T @ observed
+    sums = values.T @ observed
+    sums_of_squares = (values ** 2).T @ observed
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = (values.T @ values - sums * sums.T / count) / (count - 1)
+        variance = (sums_of_squares - sums ** 2 / count) / (count - 1)
+    return covariance, variance, variance.T, count
+
+
+def compute_matrix(panel: np.ndarray, measure: str) -> np.ndarray:
+    """``nan`` for pairs with less than two common observations"""
+    covariance, variance, variance_other, count = pairwise_moments(panel)
+    if measure == MeasureChoices._covariance.value:
+        result = covariance
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.clip(covariance / np.sqrt(variance * variance_other), -1.0, 1.0)
+    return np.where(count > 1, result, np.nan)
+
+
+class CorrelationQuery(BaseModel):
+    universe: t.Optional[UniverseChoices] = None
+    symbols: t.Optional[t.List[str]] = None
+    tte: tteChoices = tteChoices._1m
+    delta: deltaChoicesPractical = deltaChoicesPractical._d050
+    window: int = 90
+    enddate: t.Optional[Date] = None
+    measure: MeasureChoices = MeasureChoices._correlation
+    transform: SeriesTransformChoices = SeriesTransformChoices._changes
+
+    @pydantic.validator('symbols')
+    def symbols_validator(cls, v):
+        if v is not None and not 1 < len(v) <= appconfig.CORRELATION_MAX_SYMBOLS:
+            raise ValueError(f'between 2 and {appconfig.CORRELATION_MAX_SYMBOLS} symbols are allowed per request')
+        return v
+
+    @pydantic.validator('window')
+    def window_validator(cls, v):
+        if not 1 < v <= appconfig.CORRELATION_MAX_WINDOW_DAYS:
+            raise ValueError(f'`window` needs to be between 2 and {appconfig.CORRELATION_MAX_WINDOW_DAYS} days')
+        return v
+
+
+class CorrelationMatrix(BaseModel):
+    symbols: t.List[str]
+    startdate: Date
+    enddate: Date
+    observations: t.List[int]
+    values: t.List[t.List[t.Optional[float]]]
+
+
+@router.post(
+    '/ivol/correlation',
+    summary='Correlation or covariance matrix of the implied volatility of many symbols',
+    operation_id='post_ivol_correlation',
+    response_model=CorrelationMatrix,
+    response_class=ORJSONResponse,
+)
+async def post_ivol_correlation(
+        query: CorrelationQuery = Body(
+            ...,
+            example={
+                'universe': 'usetf',
+                'tte': '1m',
+                'window': 90,
+            },
+        ),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    Correlation (or covariance) matrix of the implied volatility of a `universe`
+    (all covered symbols of: ['usetf', 'cme', 'eurex', 'ice']) or a list of `symbols`.
+
+    - **tte**: time until expiry. 1m 3m 12m ...
+    - **delta**: e.g. d050 (default, ATM)
+    - **window**: number of calendar days back from `enddate`
+    - **enddate**: format: yyyy-mm-dd, default: today
+    - **measure**: one of: ['correlation', 'covariance']
+    - **transform**: correlate the daily `changes` (default) or the `levels`
+
+    Each pair is evaluated over the dates both symbols have observations for.
+    `observations[i]` is the number of observations of `symbols[i]`.
+    Values are `null` for pairs with less than two common observations.
+    """
+    args = query.dict()
+    content = await resolve_correlation(args)
+    return content
+
+
+def resolve_universe(args: t.Dict[str, t.Any]) -> t.List[SeriesKey]:
+    tte = args['tte'].value
+    delta = args['delta'].value
+    if args['symbols']:
+        return [resolve_series_key(symbol, delta, tte) for symbol in dict.fromkeys(args['symbols'])]
+    if args['universe'] is None:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail='either `universe` or `symbols` is required',
+        )
+    symbols = set(UNIVERSES[args['universe'].value])
+    return [
+        SeriesKey(config.ust, config.exchange, config.symbol, delta, tte)
+        for config in symbol_registry.ivol_configs
+        if config.symbol in symbols
+    ]
+
+
+async def select_last_published_date(keys: t.Sequence[SeriesKey]) -> t.Optional[Date]:
+    """the earliest last published date of the symbols of ``keys``. ``None`` if none is published"""
+    last_dates = []
+    async with async_engines.pgivbase.connection() as con:
+        for ust, exchange, symbol in dict.fromkeys(key.symbol_key for key in keys):
+            last_date = await select_last_date_cached({'ust': ust, 'exchange': exchange, 'symbol': symbol}, con)
+            if last_date is not None:
+                last_dates.append(last_date)
+    return min(last_dates, default=None)
+
+
+async def resolve_correlation(args: t.Dict[str, t.Any]):
+    keys = resolve_universe(args)
+    today = dt.now().date()
+    enddate = args['enddate'] or today
+    startdate = enddate - timedelta(days=args['window'])
+    cache_key = (tuple(keys), args['window'], enddate, args['measure'].value, args['transform'].value)
+    content = correlation_cache.get(cache_key)
+    if content is not None:
+        return content
+
+    series = await load_series(keys, startdate.strftime('%Y-%m-%d'), enddate.strftime('%Y-%m-%d'))
+    columns = [series[key] for key in keys]
+    if args['transform'] == SeriesTransformChoices._changes:
+        columns = [daily_changes(observations) for observations in columns]
+    _dates, panel = compose_panel(columns)
+    matrix = compute_matrix(panel, args['measure'].value)
+    content = {
+        'symbols': [key.symbol for key in keys],
+        'startdate': startdate,
+        'enddate': enddate,
+        'observations': (~np.isnan(panel)).sum(axis=0).tolist(),
+        'values': [
+            [None if math.isnan(value) else value for value in row]
+            for row in matrix.tolist()
+        ],
+    }
+    # data after the last published date may still be published
+    final = enddate < today and enddate <= (await select_last_published_date(keys) or Date.min)
+    ttl = None if final else appconfig.CORRELATION_CACHE_TODAY_TTL_SECONDS
+    correlation_cache.set(cache_key, content, ttl=ttl)
+    return content
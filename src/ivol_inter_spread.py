@@ -1,28 +1,26 @@
 from datetime import date as Date
 import typing as t
 
-from falib.contract import ContractSync
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 
 from src.const import (
     OrderChoices,
     deltaChoicesPractical,
-    time_to_var_func,
     tteChoices,
 )
-from src.db import get_pgivbase_db
+from src.ivol_series import resolve_series_key
+from src.ivol_spread import (
+    SpreadLeg,
+    evaluate_spread,
+)
 from src.users import (
     User,
     get_current_active_user,
 )
-from src.utils import (
-    eod_ini_logic_new,
-    guess_exchange_and_ust,
-)
+from src.utils import eod_ini_logic_new
 
 router = fastapi.APIRouter()
 
@@ -52,7 +50,6 @@ async def get_ivol_inter_spread(
         enddate: Date = None,
         dminus: int = 30,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -89,62 +86,18 @@ async def get_ivol_inter_spread(
         'dminus': dminus,
         'order': order.value,
     }
-    content = await resolve_inter_spread(args, con)
+    content = await resolve_inter_spread(args)
     return content
 
 
-async def select_inter_ivol(args):
+async def resolve_inter_spread(args):
+    """``symbol1 - symbol2`` evaluated by the spread engine (see ``src.ivol_spread``)"""
     args = eod_ini_logic_new(args)
-    args['tte'] = time_to_var_func(args['tte'])
-    c_one_args = {
-        'symbol': args['symbol1'],
-        'exchange': args['exchange1'],
-        'ust': args['ust1']
-    }
-    c_two_args = {
-        'symbol': args['symbol2'],
-        'exchange': args['exchange2'],
-        'ust': args['ust2']
-    }
-
-    c_one_args = guess_exchange_and_ust(c_one_args)
-    c_two_args = guess_exchange_and_ust(c_two_args)
-    c_one = ContractSync()
-    c_one.symbol = c_one_args['symbol']
-    c_one.exchange = c_one_args['exchange']
-    c_one.security_type = c_one_args['ust']
-    c_one.target_table_name_base = c_one.compose_ivol_table_name_base()
-
-    c_two = ContractSync()
-    c_two.symbol = c_two_args['symbol']
-    c_two.exchange = c_two_args['exchange']
-    c_two.security_type = c_two_args['ust']
-    c_two.target_table_name_base = c_two.compose_ivol_table_name_base()
-
-    schema_one = c_one.compose_2_part_schema_name()
-    table_one = c_one.compose_ivol_final_table_name(args['delta'])
-    schema_two = c_two.compose_2_part_schema_name()
-    table_two = c_two.compose_ivol_final_table_name(args['delta'])
-
-    sql_code = f'''
-    WITH data AS (
-        SELECT first.dt,
-               first.{args['tte']} - second.{args['tte']} AS value
-        FROM   {schema_one}.{table_one} first
-        FULL OUTER JOIN  {schema_two}.{table_two}  second
-            ON first.dt = second.dt
-        WHERE first.dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
-        ORDER BY first.dt  {args['order'].upper()}
-    )
-    SELECT json_agg(data) FROM data;
-    '''
-    return sql_code
-
-
-async def resolve_inter_spread(args, con: Session):
-    sql = await select_inter_ivol(args)
-    data = con.execute(sql).fetchall()
-    if len(data) != 0 and len(data[0]) != 0:
-        return data[0][0]
-    else:
-        return []
+    legs = [
+        SpreadLeg(
+            resolve_series_key(args[f'symbol{k}'], args['delta'], args['tte'], args[f'ust{k}'], args[f'exchange{k}']),
+            weight,
+        )
+        for k, weight in ((1, 1.0), (2, -1.0))
+    ]
+    return await evaluate_spread(legs, args['startdate'], args['enddate'], order=args['order'])
@@ -0,0 +1,219 @@
+"""
+implied volatility at arbitrary deltas and times to expiry
+
+The fitted implied volatility is stored on a fixed grid of deltas (``d010`` ... ``d090``)
+and times to expiry (``10d`` ... ``24m``). A requested point (e.g. 0.33 delta, 45 days)
+is interpolated from the four surrounding grid points:
+
+- linear in the implied volatility along the delta axis
+- linear in the total variance ``σ² · t`` along the time axis
+
+Only the surrounding grid points are read (see ``src.ivol_series.load_series``).
+The interpolation is vectorized over all dates and points.
+"""
+from datetime import date as Date
+from datetime import datetime as dt
+import math
+import typing as t
+
+import fastapi
+from fastapi import (
+    Body,
+    Depends,
+)
+from fastapi.responses import ORJSONResponse
+import numpy as np
+import pydantic
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+import appconfig
+from src.const import time_to_var
+from src.ivol_series import (
+    align_series,
+    load_series,
+    resolve_series_key,
+)
+from src.ivol_wide import DELTA_COLUMNS
+from src.users import (
+    User,
+    get_current_active_user,
+)
+from src.utils import eod_ini_logic_new
+
+router = fastapi.APIRouter()
+
+DAYS_PER_MONTH = 365 / 12
+
+
+def tte_to_days(tte: str) -> float:
+    """``10d`` -> ``10``, ``3m`` -> ``91.25``"""
+    if tte.endswith('d'):
+        return float(tte[:-1])
+    if tte.endswith('m'):
+        return float(tte[:-1]) * DAYS_PER_MONTH
+    raise ValueError(f'unknown time to expiry: {tte}')
+
+
+def delta_to_float(delta: str) -> float:
+    """``d025`` -> ``0.25``"""
+    return int(delta[1:]) / 100
+
+
+TTES = tuple(time_to_var)
+DELTA_GRID = np.array([delta_to_float(delta) for delta in DELTA_COLUMNS])
+TTE_GRID = np.array([tte_to_days(tte) for tte in TTES])
+
+
+def bracket(grid: np.ndarray, x: np.ndarray) -> t.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    indices of the grid points below and above each ``x`` and the weight of the upper one.
+    ``x`` needs to lie within the grid
+    """
+    lower = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+    upper = lower + 1
+    weight = (x - grid[lower]) / (grid[upper] - grid[lower])
+    return lower, upper, weight
+
+
+def blend(lower: np.ndarray, upper: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """
+    ``lower * (1 - weight) + upper * weight``. terms of zero weight are left out.
+    hence, a missing neighbour does not matter on a grid point
+    """
+    with np.errstate(invalid='ignore'):
+        mixed = lower * (1 - weight) + upper * weight
+    return np.where(weight == 0, lower, np.where(weight == 1, upper, mixed))
+
+
+def interpolate(values: np.ndarray, deltas: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    ``values`` indexed by ``[date][delta][tte]`` along ``DELTA_GRID`` and ``TTE_GRID``.
+    returns the implied volatility indexed by ``[date][point]``. ``nan`` where grid points are missing
+    """
+    d_lower, d_upper, d_weight = bracket(DELTA_GRID, deltas)
+    t_lower, t_upper, t_weight = bracket(TTE_GRID, days)
+    at_t_lower = blend(values[:, d_lower, t_lower], values[:, d_upper, t_lower], d_weight)
+    at_t_upper = blend(values[:, d_lower, t_upper], values[:, d_upper, t_upper], d_weight)
+    variance = blend(at_t_lower ** 2 * TTE_GRID[t_lower], at_t_upper ** 2 * TTE_GRID[t_upper], t_weight)
+    return np.sqrt(variance / days)
+
+
+def required_grid_points(deltas: np.ndarray, days: np.ndarray) -> t.List[t.Tuple[int, int]]:
+    """``(delta index, tte index)`` of every grid point needed to interpolate the points"""
+    d_lower, d_upper, _d_weight = bracket(DELTA_GRID, deltas)
+    t_lower, t_upper, _t_weight = bracket(TTE_GRID, days)
+    points = set()
+    for d_indices, t_indices in zip(zip(d_lower, d_upper), zip(t_lower, t_upper)):
+        points.update((int(d), int(k)) for d in d_indices for k in t_indices)
+    return sorted(points)
+
+
+class InterpolationPoint(BaseModel):
+    delta: float
+    days: float
+
+    @pydantic.validator('delta')
+    def delta_validator(cls, v):
+        if not DELTA_GRID[0] <= v <= DELTA_GRID[-1]:
+            raise ValueError(f'`delta` needs to be between {DELTA_GRID[0]} and {DELTA_GRID[-1]}')
+        return v
+
+    @pydantic.validator('days')
+    def days_validator(cls, v):
+        if not TTE_GRID[0] <= v <= TTE_GRID[-1]:
+            raise ValueError(f'`days` needs to be between {TTE_GRID[0]} and {TTE_GRID[-1]}')
+        return v
+
+
+class InterpolationQuery(BaseModel):
+    symbol: str
+    ust: t.Optional[str] = None
+    exchange: t.Optional[str] = None
+    points: t.List[InterpolationPoint]
+    startdate: t.Optional[Date] = None
+    enddate: t.Optional[Date] = None
+    dminus: int = 30
+
+    @pydantic.validator('points')
+    def points_validator(cls, v):
+        if not 0 < len(v) <= appconfig.INTERPOLATION_MAX_POINTS:
+            raise ValueError(f'between 1 and {appconfig.INTERPOLATION_MAX_POINTS} points are allowed per request')
+        return v
+
+
+class Interpolation(BaseModel):
+    """implied volatility indexed by ``[date][point]``"""
+    dates: t.List[Date]
+    points: t.List[InterpolationPoint]
+    values: t.List[t.List[t.Optional[float]]]
+
+
+@router.post(
+    '/ivol/interpolate',
+    summary='Get implied volatility data at arbitrary deltas and times to expiry',
+    operation_id='post_ivol_interpolate',
+    response_model=Interpolation,
+    response_class=ORJSONResponse,
+)
+async def post_ivol_interpolate(
+        query: InterpolationQuery = Body(
+            ...,
+            example={
+                'symbol': 'spy',
+                'points': [
+                    {'delta': 0.33, 'days': 45},
+                    {'delta': 0.5, 'days': 365},
+                ],
+                'dminus': 30,
+            },
+        ),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    implied volatility at arbitrary (`delta`, `days`) points between the published grid points.
+
+    - **delta**: between 0.1 and 0.9 e.g. 0.33 (the grid spans d010 to d090)
+    - **days**: calendar days to expiry between 10 and 730 e.g. 45 (the grid spans 10d to 24m)
+
+    The implied volatility is interpolated linearly along the delta axis
+    and linearly in total variance along the time axis.
+    `values[i][j]` is the implied volatility at `dates[i]` of `points[j]`.
+    """
+    args = query.dict()
+    content = await resolve_interpolation(args)
+    return content
+
+
+async def resolve_interpolation(args):
+    args = eod_ini_logic_new(args)
+    startdate = dt.strptime(args['startdate'], '%Y-%m-%d').date()
+    enddate = dt.strptime(args['enddate'], '%Y-%m-%d').date()
+    if (enddate - startdate).days > appconfig.SURFACE_RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f'the date range may not span more than {appconfig.SURFACE_RANGE_MAX_DAYS} days',
+        )
+    deltas = np.array([point['delta'] for point in args['points']])
+    days = np.array([point['days'] for point in args['points']])
+    grid_points = required_grid_points(deltas, days)
+    keys = [
+        resolve_series_key(args['symbol'], DELTA_COLUMNS[d], TTES[k], args['ust'], args['exchange'])
+        for d, k in grid_points
+    ]
+    series = await load_series(keys, args['startdate'], args['enddate'])
+    dates, columns = align_series([series[key] for key in keys])
+
+    values = np.full((len(dates), len(DELTA_GRID), len(TTE_GRID)), np.nan)
+    for (d, k), column in zip(grid_points, columns):
+        values[:, d, k] = np.array(column, dtype=np.float64)
+    interpolated = interpolate(values, deltas, days)
+    return {
+        'dates': dates,
+        'points': args['points'],
+        'values': [
+            [None if math.isnan(value) else value for value in row]
+            for row in interpolated.tolist()
+        ],
+    }
@@ -1,35 +1,33 @@
 from datetime import date as Date
 import typing as t
 
-from falib.contract import ContractSync
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 
 from src.const import (
     OrderChoices,
     deltaChoicesPractical,
-    time_to_var_func,
     tteChoices,
 )
-from src.db import get_pgivbase_db
+from src.ivol_series import resolve_series_key
+from src.ivol_spread import (
+    SpreadLeg,
+    evaluate_spread,
+)
 from src.users import (
     User,
     get_current_active_user,
 )
-from src.utils import (
-    eod_ini_logic_new,
-    guess_exchange_and_ust,
-)
+from src.utils import eod_ini_logic_new
 
 router = fastapi.APIRouter()
 
 
 class RiskReversal(BaseModel):
     dt: Date
-    value: float
+    value: t.Optional[float]
 
 
 @router.get(
@@ -50,7 +48,6 @@ async def get_risk_reversal(
         delta1: deltaChoicesPractical = deltaChoicesPractical._d060,
         delta2: deltaChoicesPractical = deltaChoicesPractical._d040,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -104,59 +101,15 @@ async def get_risk_reversal(
         'delta2': delta2,
         'order': order.value
     }
-    content = await resolve_risk_reversal(args, con)
+    content = await resolve_risk_reversal(args)
     return content
 
 
-async def select_risk_reversal(args):
-    """
-    to create a quick testing SQL snippet try:
-    args = {
-    'offset': 50
-    }
-    Args:
-        args: parsed arguments from API call
-
-    """
+async def resolve_risk_reversal(args):
+    """``delta1 - delta2`` evaluated by the spread engine (see ``src.ivol_spread``)"""
     args = eod_ini_logic_new(args)
-    args = guess_exchange_and_ust(args)
-    args['tte'] = time_to_var_func(args['tte'])
-
-    c = ContractSync()
-    c.symbol = args['symbol']
-    c.security_type = args['ust']
-    c.exchange = args['exchange']
-
-    c.target_table_name_base = c.compose_ivol_table_name_base()
-    delta1 = args['delta1']
-    delta2 = args['delta2']
-
-    schema = c.compose_2_part_schema_name()
-    table_first = c.compose_ivol_final_table_name(delta1)
-    table_second = c.compose_ivol_final_table_name(delta2)
-    sql = f'''
-    WITH data AS (
-        SELECT
-            first.dt,
-            first.{args['tte']} - second.{args['tte']} AS value
-        FROM            {schema}.{table_first}  first
-        FULL OUTER JOIN {schema}.{table_second} second
-            ON first.dt = second.dt
-        WHERE first.dt
-            BETWEEN '{args['startdate']}'
-            AND     '{args['enddate']}'
-        ORDER BY first.dt {args['order']}
-    )
-    SELECT json_agg(data) FROM data;
-    '''
-    return sql
-
-
-async def resolve_risk_reversal(args, con: Session):
-    sql = await select_risk_reversal(args)
-    cursor = con.execute(sql)
-    data = cursor.fetchall()
-    if len(data) != 0 and len(data[0]) != 0:
-        return data[0][0]
-    else:
-        return []
+    legs = [
+        SpreadLeg(resolve_series_key(args['symbol'], delta, args['tte'], args['ust'], args['exchange']), weight)
+        for delta, weight in ((args['delta1'], 1.0), (args['delta2'], -1.0))
+    ]
+    return await evaluate_spread(legs, args['startdate'], args['enddate'], order=args['order'])
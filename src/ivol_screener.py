@@ -0,0 +1,326 @@
+"""
+cross sectional screener over the implied volatility of all covered symbols
+
+Each worker keeps one matrix per time to expiry holding the ATM (``d050``)
+implied volatility of every symbol of ``symbol_registry.ivol_configs`` over
+the last ``appconfig.SCREENER_WINDOW_DAYS`` calendar days::
+
+              2020-01-02  2020-01-03  ...
+    spy       0.14        0.15
+    cl        0.31        nan
+
+The matrix is rebuilt once a day (or after ``appconfig.SCREENER_REFRESH_SECONDS``).
+Ranks, percentiles, z-scores and changes of all symbols are evaluated in one
+vectorized pass over the matrix.
+"""
+import asyncio
+from datetime import date as Date
+from datetime import datetime as dt
+from datetime import timedelta
+from enum import Enum
+import logging
+import math
+import time
+import typing as t
+
+from databases import Database
+import fastapi
+from fastapi import Depends
+from fastapi.responses import ORJSONResponse
+import numpy as np
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+import appconfig
+from src.const import (
+    OrderChoices,
+    deltaChoicesPractical,
+    tteChoices,
+)
+from src.db import async_engines
+from src.ivol_series import (
+    SeriesKey,
+    align_series,
+    load_series,
+)
+from src.schema import (
+    BaseContract,
+    symbol_registry,
+)
+from src.users import (
+    User,
+    get_current_active_user,
+)
+
+logger = logging.getLogger(__name__)
+
+router = fastapi.APIRouter()
+
+ATM_DELTA = deltaChoicesPractical._d050.value
+
+
+class ScreenerMatrix(t.NamedTuple):
+    """``values`` indexed by ``[config][date]``. ``nan`` where no observation is available"""
+    configs: t.Tuple[BaseContract, ...]
+    dates: t.List[Date]
+    values: np.ndarray
+
+
+def build_matrix(
+        configs: t.Sequence[BaseContract],
+        series: t.Sequence[t.Optional[t.List[t.Tuple[Date, t.Optional[float]]]]],
+) -> ScreenerMatrix:
+    dates, columns = align_series(series)
+    values = np.array(columns, dtype=np.float64).reshape(len(configs), len(dates))
+    return ScreenerMatrix(tuple(configs), dates, values)
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """replace ``nan`` by the last preceding observation of the row"""
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(values.shape[0])[:, None], index]
+
+
+def screen(matrix: ScreenerMatrix, change_days: int) -> t.Dict[str, np.ndarray]:
+    """
+    metrics of the latest observation of each row
+
+    - ``last``: latest observation
+    - ``percentile``: share of observations of the row at or below ``last`` (0 to 100)
+    - ``zscore``: distance of ``last`` from the mean of the row in standard deviations
+    - ``change``: ``last`` minus the observation ``change_days`` observations of the row earlier
+    - ``rank``: rank of ``last`` among all rows. ``1`` is the highest
+    """
+    values = matrix.values
+    filled = forward_fill(values)
+    last = filled[:, -1] if values.shape[1] else np.full(values.shape[0], np.nan)
+    observed = ~np.isnan(values)
+    count = observed.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        at_or_below = (np.where(observed, values, np.inf) <= last[:, None]).sum(axis=1)
+        percentile = np.where(count > 0, 100 * at_or_below / count, np.nan)
+        mean = np.where(observed, values, 0.0).sum(axis=1) / count
+        std = np.sqrt(
+            np.sum(np.where(observed, values - mean[:, None], 0.0) ** 2, axis=1) / (count - 1)
+        )
+        zscore = np.where(std > 0, (last - mean) / std, np.nan)
+    # the observations of each row moved to its front in chronological order
+    compact = np.take_along_axis(values, np.argsort(~observed, axis=1, kind='stable'), axis=1)
+    earlier = count - 1 - change_days
+    change = np.full(values.shape[0], np.nan)
+    rows = np.flatnonzero((earlier >= 0) & (change_days > 0))
+    change[rows] = last[rows] - compact[rows, earlier[rows]]
+    order = np.argsort(np.where(np.isnan(last), np.inf, -last), kind='stable')
+    rank = np.empty(len(last), dtype=np.float64)
+    rank[order] = np.arange(1, len(last) + 1)
+    rank[np.isnan(last)] = np.nan
+    return {
+        'last': last,
+        'percentile': percentile,
+        'zscore': zscore,
+        'change': change,
+        'rank': rank,
+    }
+
+
+class _Entry:
+    def __init__(self):
+        self.matrix: t.Optional[ScreenerMatrix] = None
+        self.built_at: t.Optional[float] = None
+        self.built_on: t.Optional[Date] = None
+        self.lock = asyncio.Lock()
+
+
+class IvolScreener:
+    """per worker matrices of the ATM implied volatility of all symbols. one per time to expiry"""
+    def __init__(
+            self,
+            window_days: int,
+            refresh_seconds: float,
+            *,
+            timer: t.Callable[[], float] = time.monotonic,
+            today: t.Callable[[], Date] = lambda: dt.now().date(),
+    ):
+        self.window_days = window_days
+        self.refresh_seconds = refresh_seconds
+        self.timer = timer
+        self.today = today
+        self._entries: t.Dict[str, _Entry] = {}
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        return (
+            entry.matrix is not None
+            and entry.built_on == self.today()
+            and self.timer() - entry.built_at < self.refresh_seconds
+        )
+
+    async def get_matrix(self, tte: str, database: Database = None) -> ScreenerMatrix:
+        entry = self._entries.setdefault(tte, _Entry())
+        if self._is_fresh(entry):
+            return entry.matrix
+        async with entry.lock:
+            # another request may have rebuilt the matrix meanwhile
+            if not self._is_fresh(entry):
+                today = self.today()
+                entry.matrix = await self._load(tte, today, database)
+                entry.built_at = self.timer()
+                entry.built_on = today
+        return entry.matrix
+
+    async def _load(self, tte: str, today: Date, database: t.Optional[Database]) -> ScreenerMatrix:
+        configs = symbol_registry.ivol_configs
+        keys = [SeriesKey(config.ust, config.exchange, config.symbol, ATM_DELTA, tte) for config in configs]
+        startdate = today - timedelta(days=self.window_days)
+        series = await load_series(
+            keys,
+            startdate.strftime('%Y-%m-%d'),
+            today.strftime('%Y-%m-%d'),
+            database=database or async_engines.pgivbase,
+        )
+        matrix = build_matrix(configs, [series[key] for key in keys])
+        logger.info(f'built the {tte} ivol screener matrix of {len(configs)} symbols and {len(matrix.dates)} dates')
+        return matrix
+
+
+ivol_screener = IvolScreener(
+    window_days=appconfig.SCREENER_WINDOW_DAYS,
+    refresh_seconds=appconfig.SCREENER_REFRESH_SECONDS,
+)
+
+
+class ScreenerSortChoices(str, Enum):
+    _last = 'last'
+    _percentile = 'percentile'
+    _zscore = 'zscore'
+    _change = 'change'
+
+
+class ScreenerRow(BaseModel):
+    ust: str
+    exchange: str
+    symbol: str
+    dt: Date
+    last: float
+    percentile: float
+    zscore: t.Optional[float]
+    change: t.Optional[float]
+    rank: int
+
+
+def _bounds_mask(values: np.ndarray, lower: t.Optional[float], upper: t.Optional[float]) -> np.ndarray:
+    mask = np.ones(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        if lower is not None:
+            mask &= values >= lower
+        if upper is not None:
+            mask &= values <= upper
+    return mask
+
+
+def compose_screener(
+        matrix: ScreenerMatrix,
+        args: t.Dict[str, t.Any],
+) -> t.List[t.Dict[str, t.Any]]:
+    metrics = screen(matrix, args['change_days'])
+    mask = ~np.isnan(metrics['last'])
+    for metric in ('percentile', 'zscore', 'change'):
+        mask &= _bounds_mask(metrics[metric], args[f'min_{metric}'], args[f'max_{metric}'])
+    selected = np.flatnonzero(mask)
+    sort_values = metrics[args['sort_by']][selected]
+    if args['order'] == 'desc':
+        sort_values = -sort_values
+    # symbols lacking the metric come last in either order
+    order = np.argsort(np.where(np.isnan(sort_values), np.inf, sort_values), kind='stable')
+    selected = selected[order][:args['top_n']]
+
+    last_dates = _last_dates(matrix)
+    rows = []
+    for k in selected.tolist():
+        config = matrix.configs[k]
+        rows.append({
+            'ust': config.ust,
+            'exchange': config.exchange,
+            'symbol': config.symbol,
+            'dt': last_dates[k],
+            'last': float(metrics['last'][k]),
+            'percentile': float(metrics['percentile'][k]),
+            'zscore': _optional_float(metrics['zscore'][k]),
+            'change': _optional_float(metrics['change'][k]),
+            'rank': int(metrics['rank'][k]),
+        })
+    return rows
+
+
+def _last_dates(matrix: ScreenerMatrix) -> t.List[t.Optional[Date]]:
+    observed = ~np.isnan(matrix.values)
+    last_index = observed.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    return [
+        matrix.dates[index] if observed[k].any() else None
+        for k, index in enumerate(last_index.tolist())
+    ]
+
+
+def _optional_float(value: float) -> t.Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+
+@router.get(
+    '/ivol/screener',
+    summary='Screen the ATM implied volatility of all covered symbols',
+    operation_id='get_ivol_screener',
+    response_model=t.List[ScreenerRow],
+    response_class=ORJSONResponse,
+)
+async def get_ivol_screener(
+        tte: tteChoices = tteChoices._1m,
+        min_percentile: float = None,
+        max_percentile: float = None,
+        min_zscore: float = None,
+        max_zscore: float = None,
+        min_change: float = None,
+        max_change: float = None,
+        change_days: int = 5,
+        sort_by: ScreenerSortChoices = ScreenerSortChoices._percentile,
+        order: OrderChoices = OrderChoices._desc,
+        top_n: int = 20,
+        user: User = Depends(get_current_active_user),
+):
+    """
+    ATM implied volatility of all covered symbols compared to their own history
+    of the last year. e.g. symbols trading above their 90th percentile: `min_percentile=90`
+
+    - **tte**: time until expiry. 1m 3m 12m ...
+    - **min_percentile**, **max_percentile**: bounds of the percentile (0 to 100) of the latest value
+    - **min_zscore**, **max_zscore**: bounds of the z-score of the latest value
+    - **min_change**, **max_change**: bounds of the change over the last `change_days` observations
+    - **change_days**: number of observations to look back for `change`
+    - **sort_by**: one of: ['last', 'percentile', 'zscore', 'change']
+    - **order**:  sorting order with respect to `sort_by`
+    - **top_n**: number of symbols to return
+
+    `rank` is the rank of the latest value among all symbols (1 is the highest).
+    """
+    for name, value in (('change_days', change_days), ('top_n', top_n)):
+        if value < 1:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f'`{name}` needs to be a positive integer. received: {value}',
+            )
+    args = {
+        'tte': tte.value,
+        'min_percentile': min_percentile,
+        'max_percentile': max_percentile,
+        'min_zscore': min_zscore,
+        'max_zscore': max_zscore,
+        'min_change': min_change,
+        'max_change': max_change,
+        'change_days': change_days,
+        'sort_by': sort_by.value,
+        'order': order.value,
+        'top_n': top_n,
+    }
+    matrix = await ivol_screener.get_matrix(args['tte'])
+    content = compose_screener(matrix, args)
+    return content
@@ -0,0 +1,176 @@
+"""
+load many implied volatility series with few queries
+
+A series is one time to expiry column (``varN``) of one per delta table
+(``{ust}_{exchange}_{symbol}_dpyd_{delta}``). Series of the same table are
+read together. The tables are read concurrently.
+
+If ``appconfig.IVOLAPI_WIDE_IVOL_TABLES`` is set, series of the same symbol are
+read together from its wide relation (see ``src.ivol_wide``) instead.
+"""
+from datetime import date as Date
+import logging
+import typing as t
+
+from databases import Database
+from falib.contract import ContractSync
+
+import appconfig
+from src.const import time_to_var_func
+from src.db import (
+    async_engines,
+    fetch_all_concurrently,
+)
+from src.ivol_wide import compose_wide_relation
+from src.utils import guess_exchange_and_ust
+
+logger = logging.getLogger(__name__)
+
+Observations = t.List[t.Tuple[Date, t.Optional[float]]]
+
+
+class SeriesKey(t.NamedTuple):
+    """``tte`` in its human readable form e.g. ``1m``"""
+    ust: str
+    exchange: str
+    symbol: str
+    delta: str
+    tte: str
+
+    @property
+    def table_key(self) -> t.Tuple[str, str, str, str]:
+        return self.ust, self.exchange, self.symbol, self.delta
+
+    @property
+    def symbol_key(self) -> t.Tuple[str, str, str]:
+        return self.ust, self.exchange, self.symbol
+
+
+def resolve_series_key(
+        symbol: str,
+        delta: str,
+        tte: str,
+        ust: str = None,
+        exchange: str = None,
+) -> SeriesKey:
+    """guess and validate ``ust`` and ``exchange``. raises ``HTTPException`` for unknown combos"""
+    args = guess_exchange_and_ust({'symbol': symbol, 'ust': ust, 'exchange': exchange})
+    return SeriesKey(
+        ust=args['ust'],
+        exchange=args['exchange'],
+        symbol=args['symbol'].lower(),
+        delta=delta,
+        tte=tte,
+    )
+
+
+def compose_ivol_relation(ust: str, exchange: str, symbol: str, delta: str) -> t.Tuple[str, str]:
+    c = ContractSync()
+    c.symbol = symbol
+    c.exchange = exchange
+    c.security_type = ust
+    c.target_table_name_base = c.compose_ivol_table_name_base()
+    return c.compose_2_part_schema_name(), c.compose_ivol_final_table_name(delta)
+
+
+def select_columns_sql(
+        schema: str,
+        table: str,
+        columns: t.Iterable[str],
+        startdate: str,
+        enddate: str,
+) -> str:
+    return f'''
+        SELECT      dt, {', '.join(columns)}
+        FROM        {schema}.{table}
+        WHERE       dt BETWEEN '{startdate}' AND '{enddate}'
+        ORDER BY    dt;
+    '''
+
+
+def select_wide_columns_sql(
+        schema: str,
+        table: str,
+        columns: t.Iterable[str],
+        ttes: t.Iterable[str],
+        startdate: str,
+        enddate: str,
+) -> str:
+    """``ttes`` are database column names e.g. ``var3``"""
+    return f'''
+        SELECT      dt, tte, {', '.join(columns)}
+        FROM        {schema}.{table}
+        WHERE       tte IN ({', '.join(f"'{tte}'" for tte in ttes)})
+            AND     dt BETWEEN '{startdate}' AND '{enddate}'
+        ORDER BY    dt;
+    '''
+
+
+def _select_group_sql(group_keys: t.Sequence[SeriesKey], startdate: str, enddate: str, wide: bool) -> str:
+    key = group_keys[0]
+    if wide:
+        schema, table = compose_wide_relation(key.ust, key.exchange, key.symbol)
+        columns = dict.fromkeys(key.delta for key in group_keys)
+        ttes = dict.fromkeys(time_to_var_func(key.tte) for key in group_keys)
+        return select_wide_columns_sql(schema, table, columns, ttes, startdate, enddate)
+    schema, table = compose_ivol_relation(key.ust, key.exchange, key.symbol, key.delta)
+    columns = dict.fromkeys(time_to_var_func(key.tte) for key in group_keys)
+    return select_columns_sql(schema, table, columns, startdate, enddate)
+
+
+def _extract_series(rows: t.Sequence[t.Mapping[str, t.Any]], key: SeriesKey, wide: bool) -> Observations:
+    column = time_to_var_func(key.tte)
+    if wide:
+        return [(row['dt'], row[key.delta]) for row in rows if row['tte'] == column]
+    return [(row['dt'], row[column]) for row in rows]
+
+
+async def load_series(
+        keys: t.Iterable[SeriesKey],
+        startdate: str,
+        enddate: str,
+        *,
+        database: Database = None,
+        wide: bool = None,
+) -> t.Dict[SeriesKey, t.Optional[Observations]]:
+    """
+    observations of each series ordered by date. one query per table
+    (or per symbol if ``wide``, which defaults to ``appconfig.IVOLAPI_WIDE_IVOL_TABLES``).
+    ``None`` for series whose table could not be read (e.g. missing table)
+    """
+    if wide is None:
+        wide = appconfig.IVOLAPI_WIDE_IVOL_TABLES
+    keys = list(dict.fromkeys(keys))
+    keys_by_group: t.Dict[t.Tuple[str, ...], t.List[SeriesKey]] = {}
+    for key in keys:
+        keys_by_group.setdefault(key.symbol_key if wide else key.table_key, []).append(key)
+    queries = [
+        _select_group_sql(group_keys, startdate, enddate, wide)
+        for group_keys in keys_by_group.values()
+    ]
+
+    results = await fetch_all_concurrently(database or async_engines.pgivbase, queries)
+    series = {}
+    for (group, group_keys), result in zip(keys_by_group.items(), results):
+        if isinstance(result, BaseException):
+            logger.warning(f'could not read the ivol table of {group}: {result!r}')
+            series.update((key, None) for key in group_keys)
+            continue
+        for key in group_keys:
+            series[key] = _extract_series(result, key, wide)
+    return series
+
+
+def align_series(
+        series: t.Sequence[t.Optional[Observations]],
+) -> t.Tuple[t.List[Date], t.List[t.List[t.Optional[float]]]]:
+    """
+    align series on the union of their dates.
+    returns the dates and one column per series. missing values are ``None``
+    """
+    dates = sorted({date for observations in series if observations for date, _value in observations})
+    columns = []
+    for observations in series:
+        values_by_date = dict(observations or ())
+        columns.append([values_by_date.get(date) for date in dates])
+    return dates, columns
@@ -1,19 +1,24 @@
 from datetime import date as Date
 import typing as t
 
+from databases.core import Connection
 from falib.contract import ContractSync
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 
+import appconfig
 from src.const import (
     OrderChoices,
     time_to_var_func,
     tteChoices,
 )
-from src.db import get_pgivbase_db
+from src.db import get_async_pgivbase_db
+from src.ivol_wide import (
+    DELTA_COLUMNS,
+    compose_wide_relation,
+)
 from src.users import (
     User,
     get_current_active_user,
@@ -63,7 +68,7 @@ async def get_ivol_smile(
         enddate: Date = None,
         dminus: int = 30,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_pgivbase_db),
+        con: Connection = Depends(get_async_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -168,9 +173,31 @@ async def select_ivol_fitted_smile(args):
     return sql_code
 
 
-async def resolve_ivol_smile(args, con: Session):
-    sql = await select_ivol_fitted_smile(args)
-    data = con.execute(sql).fetchall()
+async def select_ivol_fitted_smile_wide(args):
+    """same as ``select_ivol_fitted_smile`` but reads the consolidated view of the symbol"""
+    args = eod_ini_logic_new(args)
+    args = guess_exchange_and_ust(args)
+    args['tte'] = time_to_var_func(args['tte'])
+    schema, table = compose_wide_relation(args['ust'], args['exchange'], args['symbol'])
+    sql_code = f'''
+    WITH raw_data AS (
+    SELECT  dt,
+            {', '.join(DELTA_COLUMNS)}
+    FROM    {schema}.{table}
+    WHERE   tte = '{args['tte']}'
+        AND dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
+    ORDER BY dt
+    ) SELECT json_agg(raw_data) AS smile_ts FROM raw_data;
+    '''
+    return sql_code
+
+
+async def resolve_ivol_smile(args, con: Connection):
+    if appconfig.IVOLAPI_WIDE_IVOL_TABLES:
+        sql = await select_ivol_fitted_smile_wide(args)
+    else:
+        sql = await select_ivol_fitted_smile(args)
+    data = await con.fetch_all(sql)
     if len(data) != 0 and len(data[0]) != 0:
         return data[0][0]
     else:
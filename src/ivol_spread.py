@@ -0,0 +1,234 @@
+"""
+in-process spread engine for implied volatility series
+
+A spread is a linear combination of implied volatility series (legs)::
+
+    value = constant + weight_1 * leg_1 + ... + weight_n * leg_n
+
+e.g. a risk reversal (``d060 - d040``), a calendar spread (``1m - 3m``),
+an inter symbol spread (``spy - ewz``) or a butterfly (``d025 + d075 - 2 * d050``).
+The legs are read with ``src.ivol_series.load_series`` (one query per table)
+and kept in a short lived per worker cache. They are aligned on the union of
+their dates. The value of a date is ``None`` if any leg lacks an observation.
+"""
+from datetime import date as Date
+import math
+import typing as t
+
+from databases import Database
+import fastapi
+from fastapi import (
+    Body,
+    Depends,
+)
+from fastapi.responses import ORJSONResponse
+import numpy as np
+import pydantic
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+from starlette.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
+
+import appconfig
+from src.cache import TTLCache
+from src.const import (
+    OrderChoices,
+    deltaChoicesPractical,
+    tteChoices,
+)
+from src.ivol_series import (
+    Observations,
+    SeriesKey,
+    load_series,
+    resolve_series_key,
+)
+from src.users import (
+    User,
+    get_current_active_user,
+)
+from src.utils import eod_ini_logic_new
+
+router = fastapi.APIRouter()
+
+leg_cache = TTLCache(maxsize=appconfig.SPREAD_LEG_CACHE_MAXSIZE, ttl=appconfig.SPREAD_LEG_CACHE_TTL_SECONDS)
+
+
+class SpreadLeg(t.NamedTuple):
+    key: SeriesKey
+    weight: float
+
+
+async def load_legs(
+        keys: t.Iterable[SeriesKey],
+        startdate: str,
+        enddate: str,
+        *,
+        database: Database = None,
+) -> t.Dict[SeriesKey, t.Optional[Observations]]:
+    """like ``load_series`` but serves the legs from ``leg_cache`` where possible"""
+    series = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        observations = leg_cache.get((key, startdate, enddate))
+        if observations is None:
+            missing.append(key)
+        else:
+            series[key] = observations
+    if missing:
+        loaded = await load_series(missing, startdate, enddate, database=database)
+        for key, observations in loaded.items():
+            if observations is not None:
+                leg_cache.set((key, startdate, enddate), observations)
+            series[key] = observations
+    return series
+
+
+def observations_to_arrays(observations: Observations) -> t.Tuple[np.ndarray, np.ndarray]:
+    """``datetime64[D]`` dates and ``float64`` values. ``None`` becomes ``nan``"""
+    dates = np.array([date for date, _value in observations], dtype='datetime64[D]')
+    values = np.array([np.nan if value is None else value for _date, value in observations], dtype=np.float64)
+    return dates, values
+
+
+def combine(
+        legs: t.Sequence[t.Tuple[Observations, float]],
+        constant: float = 0.0,
+) -> t.Tuple[np.ndarray, np.ndarray]:
+    """
+    evaluate ``constant + sum(weight * leg)`` on the sorted union of the dates of all legs.
+    values are ``nan`` where any leg lacks an observation
+    """
+    arrays = [(observations_to_arrays(observations), weight) for observations, weight in legs]
+    if not arrays:
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64)
+    dates = np.unique(np.concatenate([leg_dates for (leg_dates, _values), _weight in arrays]))
+    total = np.full(len(dates), constant, dtype=np.float64)
+    for (leg_dates, leg_values), weight in arrays:
+        aligned = np.full(len(dates), np.nan)
+        aligned[np.searchsorted(dates, leg_dates)] = leg_values
+        total += weight * aligned
+    return dates, total
+
+
+def compose_spread(dates: np.ndarray, values: np.ndarray, order: str = 'asc') -> t.List[t.Dict[str, t.Any]]:
+    """pack the result of ``combine`` into ``[{'dt': ..., 'value': ...}, ...]``"""
+    data = [
+        {'dt': date, 'value': None if math.isnan(value) else value}
+        for date, value in zip(dates.tolist(), values.tolist())
+    ]
+    if order.lower() == 'desc':
+        data.reverse()
+    return data
+
+
+async def evaluate_spread(
+        legs: t.Sequence[SpreadLeg],
+        startdate: str,
+        enddate: str,
+        *,
+        constant: float = 0.0,
+        order: str = 'asc',
+        database: Database = None,
+) -> t.List[t.Dict[str, t.Any]]:
+    """raises ``HTTPException`` if the data of a leg could not be read"""
+    series = await load_legs([leg.key for leg in legs], startdate, enddate, database=database)
+    for leg in legs:
+        if series[leg.key] is None:
+            raise HTTPException(
+                status_code=HTTP_404_NOT_FOUND,
+                detail=f'no implied volatility data found for {leg.key.symbol} {leg.key.delta} {leg.key.tte}',
+            )
+    dates, values = combine([(series[leg.key], leg.weight) for leg in legs], constant)
+    return compose_spread(dates, values, order)
+
+
+class SpreadLegSpec(BaseModel):
+    symbol: str
+    ust: t.Optional[str] = None
+    exchange: t.Optional[str] = None
+    tte: tteChoices = tteChoices._1m
+    delta: deltaChoicesPractical = deltaChoicesPractical._d050
+    weight: float = 1.0
+
+
+class SpreadQuery(BaseModel):
+    legs: t.List[SpreadLegSpec]
+    constant: float = 0.0
+    startdate: t.Optional[Date] = None
+    enddate: t.Optional[Date] = None
+    dminus: int = 30
+    order: OrderChoices = OrderChoices._asc
+
+    @pydantic.validator('legs')
+    def legs_validator(cls, v):
+        if not 0 < len(v) <= appconfig.SPREAD_MAX_LEGS:
+            raise ValueError(f'between 1 and {appconfig.SPREAD_MAX_LEGS} legs are allowed per spread')
+        return v
+
+
+class Spread(BaseModel):
+    dt: Date
+    value: t.Optional[float]
+
+
+@router.post(
+    '/ivol/spread',
+    summary='Calculate a linear combination of implied volatility series',
+    operation_id='post_ivol_spread',
+    response_model=t.List[Spread],
+    response_class=ORJSONResponse,
+)
+async def post_ivol_spread(
+        query: SpreadQuery = Body(
+            ...,
+            example={
+                'legs': [
+                    {'symbol': 'spy', 'tte': '1m', 'delta': 'd025', 'weight': 1},
+                    {'symbol': 'spy', 'tte': '1m', 'delta': 'd075', 'weight': 1},
+                    {'symbol': 'spy', 'tte': '1m', 'delta': 'd050', 'weight': -2},
+                ],
+                'dminus': 30,
+            },
+        ),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    Calculate ``constant + weight_1 * leg_1 + ... + weight_n * leg_n``
+    where each leg is the implied volatility series of a (`symbol`, `tte`, `delta`).
+
+    Examples:
+
+    >butterfly: d025 (weight 1), d075 (weight 1), d050 (weight -2)
+
+    >ratio spread: 1m (weight 1), 3m (weight -0.5)
+
+    Response series include ``null`` where not all legs are available.
+    """
+    args = query.dict()
+    args = eod_ini_logic_new(args)
+    legs = []
+    for spec in args['legs']:
+        try:
+            key = resolve_series_key(
+                symbol=spec['symbol'],
+                delta=spec['delta'].value,
+                tte=spec['tte'].value,
+                ust=spec['ust'],
+                exchange=spec['exchange'],
+            )
+        except HTTPException as e:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f'leg {spec["symbol"]}: {e.detail}',
+            )
+        legs.append(SpreadLeg(key, spec['weight']))
+    content = await evaluate_spread(
+        legs,
+        args['startdate'],
+        args['enddate'],
+        constant=args['constant'],
+        order=args['order'].value,
+    )
+    return content
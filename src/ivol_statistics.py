@@ -0,0 +1,294 @@
+"""
+rolling statistics of implied volatility series
+
+``/ivol/summary/*`` describe the last ``dminus`` calendar days of one implied
+volatility series (``symbol``, ``delta``, ``tte``). Instead of aggregating the
+whole window per request, each worker keeps a ``RollingStatistics`` per series.
+A series is loaded once. Afterwards, only observations published since the last
+one are read (at most every ``appconfig.IVOL_STATISTICS_REFRESH_SECONDS``).
+"""
+from collections import deque
+from datetime import date as Date
+from datetime import datetime as dt
+from datetime import timedelta
+import logging
+import time
+import typing as t
+
+from databases import Database
+from falib.contract import ContractSync
+
+import appconfig
+from src.cache import TTLCache
+from src.const import time_to_var_func
+from src.db import fetch_all_concurrently
+
+logger = logging.getLogger(__name__)
+
+# the lookback history covers six calendar weeks before the last observation
+# and another week to reach the last observation on or before the sixth lookback
+LOOKBACK_DAYS = 7 * 7
+LOOKBACK_WEEKS = ('one', 'two', 'three', 'four', 'five', 'six')
+
+
+class RollingStatistics:
+    """
+    statistics over the observations of the last ``window_days`` calendar days
+
+    mean and variance are updated with Welford's algorithm when observations enter
+    or leave the window. minimum and maximum are kept in monotonic queues.
+    Hence, every observation is processed once when added and once when evicted.
+    Observations need to be added in chronological order. Observations at or
+    before the last one are ignored.
+    """
+    def __init__(self, window_days: int):
+        self.window_days = window_days
+        self.observations: t.Deque[t.Tuple[Date, float]] = deque()
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._minima: t.Deque[t.Tuple[Date, float]] = deque()
+        self._maxima: t.Deque[t.Tuple[Date, float]] = deque()
+
+    @property
+    def first_date(self) -> t.Optional[Date]:
+        return self.observations[0][0] if self.observations else None
+
+    @property
+    def last_date(self) -> t.Optional[Date]:
+        return self.observations[-1][0] if self.observations else None
+
+    def add(self, date: Date, value: float):
+        if self.observations and date <= self.observations[-1][0]:
+            return
+        self.observations.append((date, value))
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        while self._minima and self._minima[-1][1] >= value:
+            self._minima.pop()
+        self._minima.append((date, value))
+        while self._maxima and self._maxima[-1][1] <= value:
+            self._maxima.pop()
+        self._maxima.append((date, value))
+
+    def _remove_first(self):
+        date, value = self.observations.popleft()
+        if self.count == 1:
+            self.mean = 0.0
+            self._m2 = 0.0
+        else:
+            mean = (self.count * self.mean - value) / (self.count - 1)
+            self._m2 -= (value - mean) * (value - self.mean)
+            self.mean = mean
+        self.count -= 1
+        if self._minima[0][0] == date:
+            self._minima.popleft()
+        if self._maxima[0][0] == date:
+            self._maxima.popleft()
+
+    def roll(self, end: Date):
+        """evict the observations before the window ending at ``end``"""
+        start = end - timedelta(days=self.window_days)
+        while self.observations and self.observations[0][0] < start:
+            self._remove_first()
+
+    @property
+    def standard_dev(self) -> t.Optional[float]:
+        if self.count < 2:
+            return None
+        return (max(self._m2, 0.0) / (self.count - 1)) ** 0.5
+
+    @property
+    def min(self) -> t.Optional[float]:
+        return self._minima[0][1] if self._minima else None
+
+    @property
+    def max(self) -> t.Optional[float]:
+        return self._maxima[0][1] if self._maxima else None
+
+    def value_at(self, date: Date) -> t.Optional[float]:
+        """the last observation on or before ``date``"""
+        for observation_date, value in reversed(self.observations):
+            if observation_date <= date:
+                return value
+        return None
+
+    def summary(self, history: 'ObservationHistory' = None) -> t.Optional[t.Dict[str, t.Any]]:
+        """the calendar lookbacks are taken from ``history`` if given, otherwise from the window"""
+        if self.count == 0:
+            return None
+        last_date = self.last_date
+        summary = {
+            'start_date': self.first_date,
+            'end_date': last_date,
+            'standard_dev': self.standard_dev,
+            'average': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'observations': self.count,
+            'last': self.observations[-1][1],
+        }
+        for weeks, label in enumerate(LOOKBACK_WEEKS, start=1):
+            summary[f'week_ago_{label}'] = (history or self).value_at(last_date - timedelta(weeks=weeks))
+        return summary
+
+
+class ObservationHistory:
+    """the observations of the last ``window_days`` calendar days. serves calendar lookbacks"""
+    def __init__(self, window_days: int):
+        self.window_days = window_days
+        self.observations: t.Deque[t.Tuple[Date, float]] = deque()
+
+    @property
+    def last_date(self) -> t.Optional[Date]:
+        return self.observations[-1][0] if self.observations else None
+
+    def add(self, date: Date, value: float):
+        if self.observations and date <= self.observations[-1][0]:
+            return
+        self.observations.append((date, value))
+
+    def roll(self, end: Date):
+        start = end - timedelta(days=self.window_days)
+        while self.observations and self.observations[0][0] < start:
+            self.observations.popleft()
+
+    def value_at(self, date: Date) -> t.Optional[float]:
+        """the last observation on or before ``date``"""
+        for observation_date, value in reversed(self.observations):
+            if observation_date <= date:
+                return value
+        return None
+
+
+class SeriesSpec(t.NamedTuple):
+    """an implied volatility series. ``tte`` in its human readable form e.g. ``1m``"""
+    ust: str
+    exchange: str
+    symbol: str
+    delta: str
+    tte: str
+    window_days: int
+
+
+def compose_series_spec(args: t.Dict[str, t.Any]) -> SeriesSpec:
+    """``args`` need validated ``ust`` and ``exchange`` (see ``guess_exchange_and_ust``)"""
+    return SeriesSpec(
+        ust=args['ust'],
+        exchange=args['exchange'],
+        symbol=args['symbol'].lower(),
+        delta=args['delta'],
+        tte=args['tte'],
+        window_days=int(args['dminus']),
+    )
+
+
+def select_observations_sql(spec: SeriesSpec, start: Date, end: Date) -> str:
+    c = ContractSync()
+    c.symbol = spec.symbol
+    c.exchange = spec.exchange
+    c.security_type = spec.ust
+    c.target_table_name_base = c.compose_ivol_table_name_base()
+    schema = c.compose_2_part_schema_name()
+    table = c.compose_ivol_final_table_name(spec.delta)
+    var = time_to_var_func(spec.tte)
+    return f'''
+    SELECT      dt, {var} AS value
+    FROM        {schema}.{table}
+    WHERE       dt BETWEEN '{start}' AND '{end}'
+        AND     {var} IS NOT NULL
+    ORDER BY    dt;
+    '''
+
+
+class _Series:
+    """statistics over exactly ``window_days`` and the history of the calendar lookbacks"""
+    def __init__(self, window_days: int):
+        self.statistics = RollingStatistics(window_days)
+        self.history = ObservationHistory(LOOKBACK_DAYS)
+        self.checked_at: t.Optional[float] = None
+
+
+class IvolStatisticsStore:
+    """
+    per worker store of ``RollingStatistics``. bounded and least recently used series are dropped
+    """
+    def __init__(
+            self,
+            maxsize: int,
+            refresh_seconds: float,
+            *,
+            timer: t.Callable[[], float] = time.monotonic,
+            today: t.Callable[[], Date] = lambda: dt.now().date(),
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.timer = timer
+        self.today = today
+        # the refresh bounds the staleness. the time to live only drops idle series
+        self._series = TTLCache(maxsize=maxsize, ttl=24 * 60 * 60, timer=timer)
+
+    def _get_series(self, spec: SeriesSpec) -> _Series:
+        series = self._series.get(spec)
+        if series is None:
+            series = _Series(spec.window_days)
+            self._series.set(spec, series)
+        return series
+
+    async def get_summaries(
+            self,
+            specs: t.Sequence[SeriesSpec],
+            database: Database,
+    ) -> t.List[t.Optional[t.Dict[str, t.Any]]]:
+        """
+        summaries in the order of ``specs``. ``None`` for series without observations
+        or whose observations could not be read (e.g. missing table)
+        """
+        today = self.today()
+        now = self.timer()
+        series_list = [self._get_series(spec) for spec in specs]
+        stale = []
+        for spec, series in zip(specs, series_list):
+            if series.checked_at is not None and now - series.checked_at < self.refresh_seconds:
+                continue
+            # either window may have rolled past the last observation
+            last_date = max(filter(None, (series.statistics.last_date, series.history.last_date)), default=None)
+            start = (
+                last_date + timedelta(days=1)
+                if last_date is not None
+                else today - timedelta(days=max(spec.window_days, LOOKBACK_DAYS))
+            )
+            stale.append((spec, series, select_observations_sql(spec, start, today)))
+
+        results = await fetch_all_concurrently(database, [sql for _spec, _series, sql in stale])
+        failed = set()
+        for (spec, series, _sql), result in zip(stale, results):
+            if isinstance(result, BaseException):
+                logger.warning(f'could not update the ivol statistics of {spec}: {result!r}')
+                self._series.invalidate(spec)
+                failed.add(spec)
+                continue
+            for row in result:
+                series.statistics.add(row['dt'], float(row['value']))
+                series.history.add(row['dt'], float(row['value']))
+            series.checked_at = now
+
+        summaries = []
+        for spec, series in zip(specs, series_list):
+            if spec in failed:
+                summaries.append(None)
+                continue
+            series.statistics.roll(today)
+            series.history.roll(today)
+            summary = series.statistics.summary(series.history)
+            if summary is not None:
+                summary.update(symbol=spec.symbol, delta=spec.delta, expiry=spec.tte)
+            summaries.append(summary)
+        return summaries
+
+
+ivol_statistics_store = IvolStatisticsStore(
+    maxsize=appconfig.IVOL_STATISTICS_MAXSIZE,
+    refresh_seconds=appconfig.IVOL_STATISTICS_REFRESH_SECONDS,
+)
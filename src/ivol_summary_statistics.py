@@ -1,24 +1,33 @@
 from datetime import date as Date
+import logging
 import typing as t
 from typing import List
 
+from databases.core import Connection
 from falib.contract import ContractSync
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
+from starlette.exceptions import HTTPException
 
+from src.catalog import cinfo_catalog
 from src.const import (
     deltaChoicesPractical,
     time_to_var_func,
     tteChoices,
 )
 from src.db import (
-    get_options_rawdata_db,
-    get_pgivbase_db,
+    async_engines,
+    get_async_options_rawdata_db,
+    get_async_pgivbase_db,
     results_proxy_to_list_of_dict,
 )
+from src.ivol_statistics import (
+    SeriesSpec,
+    compose_series_spec,
+    ivol_statistics_store,
+)
 from src.users import (
     User,
     get_current_active_user,
@@ -29,6 +38,8 @@ from src.utils import (
     guess_exchange_and_ust,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class IVolSummary(BaseModel):
     symbol: str
@@ -36,18 +47,18 @@ class IVolSummary(BaseModel):
     end_date: Date
     delta: str
     expiry: str
-    standard_dev: float
+    standard_dev: t.Optional[float]
     average: float
     min: float
     max: float
     observations: float
     last: float
-    week_ago_one: float
-    week_ago_two: float
-    week_ago_three: float
-    week_ago_four: float
-    week_ago_five: float
-    week_ago_six: float
+    week_ago_one: t.Optional[float]
+    week_ago_two: t.Optional[float]
+    week_ago_three: t.Optional[float]
+    week_ago_four: t.Optional[float]
+    week_ago_five: t.Optional[float]
+    week_ago_six: t.Optional[float]
 
 
 router = fastapi.APIRouter()
@@ -68,13 +79,17 @@ async def get_ivol_summary_single(
         enddate: Date = None,
         dminus: int = 365,
         delta: deltaChoicesPractical = deltaChoicesPractical._d050,
-        con: Session = Depends(get_pgivbase_db),
+        con: Connection = Depends(get_async_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
     Returns descriptive statistics and some slices of implied volatility data
     last, 1 week, 2 week, 3 week, 4 week, 5 week and 6 week ago
 
+    Without `startdate` and `enddate`, the statistics are served from a rolling store.
+    The weekly slices are then the last observation on or before the same weekday
+    1 to 6 calendar weeks before the last observation.
+
     - **symbol**: example: 'SPY' or 'spy' (case insensitive)
     - **ust**: underlying security type: 'eqt' e.g.
     - **exchange**: one of: 'usetf', e.g.
@@ -105,8 +120,7 @@ async def get_ivol_summary_single(
     response_model=t.List[IVolSummary],
 )
 async def get_ivol_summary_cme(
-        con_ivol: Session = Depends(get_pgivbase_db),
-        con_raw: Session = Depends(get_options_rawdata_db),
+        con_raw: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -122,11 +136,7 @@ async def get_ivol_summary_cme(
         'dminus': 365,
         'delta': deltaChoicesPractical._d050.value,
     }
-    content = await resolve_ivol_summary_multi(
-        args,
-        con_ivol=con_ivol,
-        con_raw=con_raw,
-    )
+    content = await resolve_ivol_summary_multi([args], con_raw=con_raw)
     return content
 
 
@@ -137,8 +147,7 @@ async def get_ivol_summary_cme(
     response_model=t.List[IVolSummary],
 )
 async def get_ivol_summary_ice(
-        con_ivol: Session = Depends(get_pgivbase_db),
-        con_raw: Session = Depends(get_options_rawdata_db),
+        con_raw: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -153,11 +162,7 @@ async def get_ivol_summary_ice(
         'dminus': 365,
         'delta': deltaChoicesPractical._d050.value
     }
-    content = await resolve_ivol_summary_multi(
-        args,
-        con_ivol=con_ivol,
-        con_raw=con_raw
-    )
+    content = await resolve_ivol_summary_multi([args], con_raw=con_raw)
     return content
 
 
@@ -169,8 +174,7 @@ async def get_ivol_summary_ice(
     response_class=ORJSONResponse,
 )
 async def get_ivol_summary_usetf(
-        con_ivol: Session = Depends(get_pgivbase_db),
-        con_raw: Session = Depends(get_options_rawdata_db),
+        con_raw: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -185,11 +189,7 @@ async def get_ivol_summary_usetf(
         'dminus': 365,
         'delta': deltaChoicesPractical._d050.value
     }
-    content = await resolve_ivol_summary_multi(
-        args,
-        con_ivol=con_ivol,
-        con_raw=con_raw
-    )
+    content = await resolve_ivol_summary_multi([args], con_raw=con_raw)
     return content
 
 
@@ -201,8 +201,7 @@ async def get_ivol_summary_usetf(
     response_class=ORJSONResponse,
 )
 async def get_ivol_summary_eurex(
-        con_ivol: Session = Depends(get_pgivbase_db),
-        con_raw: Session = Depends(get_options_rawdata_db),
+        con_raw: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -226,8 +225,7 @@ async def get_ivol_summary_eurex(
         'dminus': 365,
         'delta': deltaChoicesPractical._d050.value
     }
-    content = await resolve_ivol_summary_multi(args_indices, con_ivol=con_ivol, con_raw=con_raw)
-    content += await resolve_ivol_summary_multi(args_futures, con_ivol=con_ivol, con_raw=con_raw)
+    content = await resolve_ivol_summary_multi([args_indices, args_futures], con_raw=con_raw)
     return content
 
 
@@ -272,42 +270,56 @@ async def select_statistics_single(args):
     BETWEEN    '{args['startdate']}' AND '{args['enddate']}';'''
 
 
-async def select_ivol_summary_multi(args, con: Session):
+async def select_symbols(args, con: Connection) -> t.List[str]:
+    if cinfo_catalog.is_loaded:
+        return list(cinfo_catalog.index.get_symbols(args['ust'], args['exchange']))
     sql_info = CinfoQueries.symbol_where_ust_and_exchange_f(args)
-    symbols = con.execute(sql_info).fetchall()
-    sql_code = '( '
-    symbols_length = len(symbols)
-    for _idx, symbol in enumerate(symbols):
+    symbols = await con.fetch_all(sql_info)
+    return [symbol[0] for symbol in symbols]
+
+
+async def select_ivol_summary_multi(args, con: Connection) -> t.List[SeriesSpec]:
+    """one series per symbol. symbols which fail validation are skipped"""
+    specs = []
+    for symbol in await select_symbols(args, con):
         individual_args = {
-            'symbol': symbol[0],
+            'symbol': symbol,
             'ust': args['ust'],
             'exchange': args['exchange'],
             'tte': args['tte'],
-            'startdate': args['startdate'],
-            'enddate': args['enddate'],
             'dminus': args['dminus'],
             'delta': args['delta']
         }
-        sql_code += (await select_statistics_single(individual_args))[0:-1]
-        if _idx < symbols_length - 1:
-            sql_code += '\n)\n   UNION ALL\n(\n '
-    sql_code += ');'
-    return sql_code
+        try:
+            specs.append(compose_series_spec(guess_exchange_and_ust(individual_args)))
+        except HTTPException as e:
+            logger.warning(f'skipping {args["ust"]}/{args["exchange"]}/{symbol} in ivol summary: {e.detail}')
+    return specs
 
 
 async def resolve_ivol_summary_multi(
-        args,
+        args_list: t.List[t.Dict[str, t.Any]],
         *,
-        con_ivol: Session,
-        con_raw: Session,
+        con_raw: Connection,
 ):
-    sql = await select_ivol_summary_multi(args, con_raw)
-    data = con_ivol.execute(sql).fetchall()
-    return data
+    """
+    served from the rolling statistics store. the series which need an update
+    are read concurrently on connections of their own.
+    symbols whose series fails (e.g. missing table) or which have no data are left out
+    """
+    specs = []
+    for args in args_list:
+        specs += await select_ivol_summary_multi(args, con_raw)
+    summaries = await ivol_statistics_store.get_summaries(specs, async_engines.pgivbase)
+    return [summary for summary in summaries if summary is not None]
 
 
-async def resolve_ivol_summary_statistics(args, con: Session):
+async def resolve_ivol_summary_statistics(args, con: Connection):
+    if args['startdate'] is None and args['enddate'] is None:
+        spec = compose_series_spec(guess_exchange_and_ust(dict(args)))
+        summaries = await ivol_statistics_store.get_summaries([spec], async_engines.pgivbase)
+        return [summary for summary in summaries if summary is not None]
     sql = await select_statistics_single(args)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
@@ -2,23 +2,42 @@ from datetime import date as Date
 from datetime import datetime as dt
 import typing as t
 
+from databases.core import Connection
 from falib.contract import Contract
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
 
-from src.const import delta_choices_practical
-from src.db import get_pgivbase_db
+import appconfig
+from src.cache import TTLCache
+from src.const import (
+    delta_choices_practical,
+    time_to_var,
+)
+from src.db import get_async_pgivbase_db
+from src.ivol_wide import (
+    DELTA_COLUMNS,
+    TTE_COLUMNS,
+    compose_ivol_table_name_base,
+    compose_wide_relation,
+)
 from src.users import (
     User,
     get_current_active_user,
 )
-from src.utils import guess_exchange_and_ust
+from src.utils import (
+    eod_ini_logic_new,
+    guess_exchange_and_ust,
+)
 
 router = fastapi.APIRouter()
 
+surface_cache = TTLCache(maxsize=appconfig.SURFACE_CACHE_MAXSIZE, ttl=appconfig.SURFACE_CACHE_TTL_SECONDS)
+last_date_cache = TTLCache(maxsize=appconfig.SURFACE_CACHE_MAXSIZE, ttl=appconfig.SURFACE_LAST_DATE_TTL_SECONDS)
+
 
 class SurfaceValue(BaseModel):
     var1: float
@@ -56,7 +75,7 @@ async def get_surface_by_delta(
         date: Date = None,
         exchange: str = None,
         ust: str = None,
-        con: Session = Depends(get_pgivbase_db),
+        con: Connection = Depends(get_async_pgivbase_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -101,14 +120,65 @@ async def prepare_surface_sql_arguments(args):
     return sql_code
 
 
-async def resolve_last_date(c: Contract, con: Session) -> str:
+async def resolve_last_date(c: Contract, con: Connection) -> str:
     schema = await c.compose_2_part_schema_name()
     table = await c.compose_ivol_final_table_name('d050')
     sql = f'SELECT max(dt) FROM {schema}.{table};'
-    data = con.execute(sql).fetchall()
+    data = await con.fetch_all(sql)
     return data[0][0].strftime('%Y-%m-%d')
 
 
+async def select_last_date(args: t.Dict[str, t.Any], con: Connection) -> t.Optional[Date]:
+    """last date with a published surface. ``None`` if there is none"""
+    if appconfig.IVOLAPI_WIDE_IVOL_TABLES:
+        schema, table = compose_wide_relation(args['ust'], args['exchange'], args['symbol'])
+    else:
+        schema, table_name_base = compose_ivol_table_name_base(args['ust'], args['exchange'], args['symbol'])
+        table = f'{table_name_base}d050'
+    sql = f'SELECT max(dt) FROM {schema}.{table};'
+    data = await con.fetch_all(sql)
+    return data[0][0]
+
+
+async def select_last_date_cached(args: t.Dict[str, t.Any], con: Connection) -> t.Optional[Date]:
+    key = (args['ust'], args['exchange'], args['symbol'].lower())
+    last_date = last_date_cache.get(key)
+    if last_date is None:
+        last_date = await select_last_date(args, con)
+        if last_date is not None:
+            last_date_cache.set(key, last_date)
+    return last_date
+
+
+async def surface_json_wide(args, con):
+    """
+    same output as ``surface_json`` but reads the consolidated view of the symbol.
+    the 16 rows (one per time to expiry) of the date are transposed into one row per delta
+    """
+    args = guess_exchange_and_ust(args)
+    if args['date'] is None:
+        args['date'] = (await select_last_date(args, con)).strftime('%Y-%m-%d')
+    else:
+        args['date'] = args['date'].strftime('%Y-%m-%d')
+    schema, table = compose_wide_relation(args['ust'], args['exchange'], args['symbol'])
+    deltas = ', '.join(f"('{delta}', {delta})" for delta in DELTA_COLUMNS)
+    sql_code = f'''
+    WITH level_one AS (
+        SELECT      w.dt AS dt,
+                    d.delta AS delta,
+                    json_object_agg(w.tte, d.value ORDER BY substring(w.tte FROM 4)::int) AS values
+        FROM        {schema}.{table} w
+        CROSS JOIN LATERAL (VALUES {deltas}) AS d(delta, value)
+        WHERE       w.dt = '{args['date']}'
+        GROUP BY    w.dt, d.delta
+        ORDER BY    d.delta
+    )
+    SELECT json_agg(level_one) as surface_ts
+    FROM level_one;
+    '''
+    return sql_code
+
+
 async def surface_json(args, con):
     """ """
     args = guess_exchange_and_ust(args)
@@ -156,11 +226,152 @@ async def surface_json(args, con):
 
 async def surface_resolver(
         args: t.Dict[str, t.Any],
-        con: Session,
+        con: Connection,
 ):
-    sql = await surface_json(args, con)
-    data = con.execute(sql).fetchall()
-    if len(data) != 0 and len(data[0]) != 0:
+    """
+    published EOD surfaces do not change. they are cached per ``(ust, exchange, symbol, date)``.
+    the last available date is cached for a shorter time to pick up new publications
+    """
+    args = guess_exchange_and_ust(args)
+    if args['date'] is None:
+        args['date'] = await select_last_date_cached(args, con)
+        if args['date'] is None:
+            return []
+    key = (args['ust'], args['exchange'], args['symbol'].lower(), args['date'])
+    surface = surface_cache.get(key)
+    if surface is not None:
+        return surface
+    if appconfig.IVOLAPI_WIDE_IVOL_TABLES:
+        sql = await surface_json_wide(args, con)
+    else:
+        sql = await surface_json(args, con)
+    data = await con.fetch_all(sql)
+    if len(data) != 0 and len(data[0]) != 0 and data[0][0] is not None:
+        surface_cache.set(key, data[0][0])
         return data[0][0]
     else:
         return []
+
+
+class SurfaceRange(BaseModel):
+    """
+    surfaces of consecutive dates as one array indexed by ``[date][delta][tte]``
+    """
+    dates: t.List[Date]
+    deltas: t.List[str]
+    ttes: t.List[str]
+    values: t.List[t.List[t.List[t.Optional[float]]]]
+
+
+@router.get(
+    '/ivol/surface/range',
+    operation_id='get_surface_range',
+    summary='returns the surfaces of a date range as a `dates x deltas x ttes` array',
+    response_model=SurfaceRange,
+    response_class=ORJSONResponse,
+)
+async def get_surface_range(
+        symbol: str,
+        ust: str = None,
+        exchange: str = None,
+        startdate: Date = None,
+        enddate: Date = None,
+        dminus: int = 30,
+        con: Connection = Depends(get_async_pgivbase_db),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    - **symbol**: example: 'SPY' or 'spy' (case insensitive)
+    - **ust**: underlying security type: ['fut', 'eqt', 'ind', 'fx']
+    - **exchange**: one of: ['usetf', 'cme', 'ice', 'eurex']
+    - **startdate**: format: yyyy-mm-dd
+    - **enddate**: format: yyyy-mm-dd
+    - **dminus**: indicate the number of days back from `enddate`
+
+    `values[i][j][k]` is the implied volatility at `dates[i]`, `deltas[j]` and `ttes[k]`.
+    Missing points are `null`. The range may span up to a year.
+    """
+    args = {
+        'symbol': symbol,
+        'ust': ust,
+        'exchange': exchange,
+        'startdate': startdate,
+        'enddate': enddate,
+        'dminus': dminus,
+    }
+    content = await surface_range_resolver(args, con)
+    return content
+
+
+async def select_surface_range(args: t.Dict[str, t.Any]) -> str:
+    """rows of ``dt``, ``delta`` and the 16 time to expiry columns"""
+    vars = ', '.join(TTE_COLUMNS)
+    if appconfig.IVOLAPI_WIDE_IVOL_TABLES:
+        schema, table = compose_wide_relation(args['ust'], args['exchange'], args['symbol'])
+        deltas = ', '.join(f"('{delta}', {delta})" for delta in DELTA_COLUMNS)
+        tte_columns = ', '.join(f"max(d.value) FILTER (WHERE w.tte = '{tte}') AS {tte}" for tte in TTE_COLUMNS)
+        return f'''
+        SELECT      w.dt AS dt,
+                    d.delta AS delta,
+                    {tte_columns}
+        FROM        {schema}.{table} w
+        CROSS JOIN LATERAL (VALUES {deltas}) AS d(delta, value)
+        WHERE       w.dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
+        GROUP BY    w.dt, d.delta;
+        '''
+    schema, table_name_base = compose_ivol_table_name_base(args['ust'], args['exchange'], args['symbol'])
+    return ' UNION ALL '.join(
+        f'''
+        (SELECT       dt AS dt,
+                      '{delta}' AS delta,
+                      {vars}
+         FROM         {schema}.{table_name_base}{delta}
+         WHERE        dt BETWEEN '{args['startdate']}' AND '{args['enddate']}')'''
+        for delta in DELTA_COLUMNS
+    ) + ';'
+
+
+def compose_surface_range(rows: t.Iterable[t.Mapping[str, t.Any]]) -> t.Dict[str, t.Any]:
+    """pack rows of ``select_surface_range`` into the ``SurfaceRange`` layout"""
+    surfaces = {}
+    delta_index = {delta: k for k, delta in enumerate(DELTA_COLUMNS)}
+    for row in rows:
+        surface = surfaces.get(row['dt'])
+        if surface is None:
+            surface = surfaces[row['dt']] = [[None] * len(TTE_COLUMNS) for _ in DELTA_COLUMNS]
+        surface[delta_index[row['delta']]] = [row[tte] for tte in TTE_COLUMNS]
+    dates = sorted(surfaces)
+    return {
+        'dates': dates,
+        'deltas': list(DELTA_COLUMNS),
+        'ttes': list(time_to_var),
+        'values': [surfaces[date] for date in dates],
+    }
+
+
+async def surface_range_resolver(
+        args: t.Dict[str, t.Any],
+        con: Connection,
+):
+    args = eod_ini_logic_new(args)
+    args = guess_exchange_and_ust(args)
+    startdate = dt.strptime(args['startdate'], '%Y-%m-%d').date()
+    enddate = dt.strptime(args['enddate'], '%Y-%m-%d').date()
+    if (enddate - startdate).days > appconfig.SURFACE_RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f'the date range may not span more than {appconfig.SURFACE_RANGE_MAX_DAYS} days',
+        )
+    key = ('range', args['ust'], args['exchange'], args['symbol'].lower(), startdate, enddate)
+    surface_range = surface_cache.get(key)
+    if surface_range is not None:
+        return surface_range
+    sql = await select_surface_range(args)
+    rows = await con.fetch_all(sql)
+    surface_range = compose_surface_range(rows)
+    # surfaces after the last published date may still be published
+    last_date = await select_last_date_cached(args, con)
+    final = last_date is not None and enddate <= last_date
+    ttl = None if final else appconfig.SURFACE_LAST_DATE_TTL_SECONDS
+    surface_cache.set(key, surface_range, ttl=ttl)
+    return surface_range
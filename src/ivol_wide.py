@@ -0,0 +1,87 @@
+"""
+consolidated ("wide") implied volatility relations
+
+The fitted implied volatility of a symbol is stored in one table per delta
+(``{ust}_{exchange}_{symbol}_dpyd_d010`` ... ``_d090``) with one column per
+time to expiry (``var1`` ... ``var16``). Reading a smile therefore joins 17 tables.
+
+The wide relation is a materialized view per symbol keyed by ``(dt, tte)``
+with one column per delta::
+
+    dt          | tte  | d010 | d015 | ... | d090
+    2020-10-30  | var3 | 0.41 | 0.39 | ... | 0.33
+
+``tte`` holds the database column name of the time to expiry (see ``const.time_to_var``).
+The views are created and refreshed by ``refresh_wide_ivol_tables.py`` and are read
+instead of the per delta tables if ``appconfig.IVOLAPI_WIDE_IVOL_TABLES`` is set.
+"""
+import typing as t
+
+from falib.contract import ContractSync
+
+from src.const import (
+    delta_choices_practical,
+    time_to_var,
+)
+
+WIDE_TABLE_SUFFIX = 'wide'
+DELTA_COLUMNS = tuple(delta_choices_practical)
+TTE_COLUMNS = tuple(time_to_var.values())
+
+
+def compose_wide_table_name(table_name_base: str) -> str:
+    """``fut_cme_cl_dpyd_`` -> ``fut_cme_cl_dpyd_wide``"""
+    return f'{table_name_base}{WIDE_TABLE_SUFFIX}'
+
+
+def compose_ivol_table_name_base(ust: str, exchange: str, symbol: str) -> t.Tuple[str, str]:
+    """``(schema, table_name_base)`` of the per delta tables of a symbol"""
+    c = ContractSync()
+    c.symbol = symbol
+    c.exchange = exchange
+    c.security_type = ust
+    return c.compose_2_part_schema_name(), c.compose_ivol_table_name_base()
+
+
+def compose_wide_relation(ust: str, exchange: str, symbol: str) -> t.Tuple[str, str]:
+    """``(schema, table)`` of the wide relation of a symbol"""
+    schema, table_name_base = compose_ivol_table_name_base(ust, exchange, symbol)
+    return schema, compose_wide_table_name(table_name_base)
+
+
+def create_wide_view_sql(schema: str, table_name_base: str) -> str:
+    """
+    unpivot the time to expiry columns of each per delta table and pivot the deltas into columns.
+    the unique index allows ``REFRESH MATERIALIZED VIEW CONCURRENTLY``
+    and serves time series of one ``tte``. The index on ``dt`` serves surfaces.
+    """
+    table = compose_wide_table_name(table_name_base)
+    tte_values = ', '.join(f"('{tte}', {tte})" for tte in TTE_COLUMNS)
+    long_format = '\n            UNION ALL\n'.join(
+        f'''            SELECT dt, '{delta}' AS delta, v.tte, v.value
+            FROM {schema}.{table_name_base}{delta}
+            CROSS JOIN LATERAL (VALUES {tte_values}) AS v(tte, value)'''
+        for delta in DELTA_COLUMNS
+    )
+    delta_columns = ',\n                '.join(
+        f"max(value) FILTER (WHERE delta = '{delta}') AS {delta}"
+        for delta in DELTA_COLUMNS
+    )
+    return f'''
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {schema}.{table} AS
+        SELECT  dt,
+                tte,
+                {delta_columns}
+        FROM (
+{long_format}
+        ) long_format
+        GROUP BY dt, tte
+    WITH DATA;
+    CREATE UNIQUE INDEX IF NOT EXISTS {table}_tte_dt_idx ON {schema}.{table} (tte, dt);
+    CREATE INDEX IF NOT EXISTS {table}_dt_idx ON {schema}.{table} (dt);
+    '''
+
+
+def refresh_wide_view_sql(schema: str, table_name_base: str) -> str:
+    table = compose_wide_table_name(table_name_base)
+    return f'REFRESH MATERIALIZED VIEW CONCURRENTLY {schema}.{table};'
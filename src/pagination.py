@@ -0,0 +1,80 @@
+"""
+keyset pagination of time series keyed on ``dt``
+
+A page holds at most ``limit`` rows. If more rows are available, the response carries
+an opaque cursor in the ``X-Next-Cursor`` header. Passing it as ``cursor`` along with
+otherwise unchanged query parameters returns the next page, i.e. the rows after
+(``asc``) or before (``desc``) the last row of the previous page. The next page is
+selected with ``dt > cursor`` (or ``dt < cursor``) which is served by the index on ``dt``.
+"""
+import base64
+import binascii
+from datetime import date as Date
+from datetime import datetime as dt
+import typing as t
+
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.status import HTTP_400_BAD_REQUEST
+
+import appconfig
+from src.const import OrderChoices
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def validate_page_size(limit: int) -> int:
+    if not 0 < limit <= appconfig.PAGE_SIZE_MAX:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f'`limit` needs to be between 1 and {appconfig.PAGE_SIZE_MAX}',
+        )
+    return limit
+
+
+def encode_cursor(value: t.Union[Date, dt]) -> str:
+    return base64.urlsafe_b64encode(value.isoformat().encode()).decode()
+
+
+def decode_cursor(cursor: t.Optional[str]) -> t.Optional[str]:
+    """ISO formatted ``dt`` of the last row of the previous page. ``None`` for the first page"""
+    if cursor is None:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        dt.fromisoformat(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f'invalid `cursor`: {cursor}',
+        )
+    return value
+
+
+def keyset_condition(cursor: t.Optional[str], order: str, *, inclusive: bool = False) -> str:
+    """
+    SQL condition selecting the rows after the cursor in the given order.
+    ``inclusive`` keeps rows at the cursor for ascending pages
+    """
+    if cursor is None:
+        return ''
+    if order == OrderChoices._desc.value:
+        return f"AND dt < '{cursor}'"
+    return f"AND dt {'>=' if inclusive else '>'} '{cursor}'"
+
+
+def paginate(
+        rows: t.Sequence[t.Any],
+        limit: int,
+        response: Response,
+        *,
+        has_more: bool = False,
+) -> t.List[t.Any]:
+    """
+    the first ``limit`` rows. sets the cursor of the next page if more rows are available.
+    select ``limit + 1`` rows to tell whether another page follows
+    """
+    page = list(rows[:limit])
+    if page and (has_more or len(rows) > limit):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(page[-1]['dt'])
+    return page
@@ -2,18 +2,26 @@ from collections import namedtuple
 from datetime import date
 import typing as t
 
+from databases.core import Connection
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
+from starlette.responses import Response
 
+import appconfig
 from src.const import (
     OrderChoices,
     conti_futures_choices,
     nth_contract_choices,
 )
-from src.db import get_prices_intraday_db
+from src.db import get_async_prices_intraday_db
+from src.pagination import (
+    decode_cursor,
+    keyset_condition,
+    paginate,
+    validate_page_size,
+)
 from src.users import (
     User,
     get_current_active_user,
@@ -34,6 +42,7 @@ ContiEodParams = namedtuple(
         'enddate',
         'order',
         'limit',
+        'cursor',
     ]
 )
 
@@ -113,6 +122,7 @@ class ContiEodArray(BaseModel):
     response_class=ORJSONResponse,
 )
 async def get_conti_eod(
+        response: Response,
         symbol: str,
         ust: str = 'fut',
         exchange: str = None,
@@ -121,7 +131,9 @@ async def get_conti_eod(
         enddate: date = None,
         dminus:  int = 20,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_prices_intraday_db),
+        limit: int = appconfig.PAGE_SIZE_DEFAULT,
+        cursor: str = None,
+        con: Connection = Depends(get_async_prices_intraday_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -131,6 +143,9 @@ async def get_conti_eod(
     The values are calculates by rolling the the future at specified time.
 
     Only available for futures.
+
+    - **limit**: maximum number of rows per page
+    - **cursor**: the `X-Next-Cursor` header of the previous page
     """
     args = {
         'symbol': symbol,
@@ -141,10 +156,12 @@ async def get_conti_eod(
         'enddate': enddate,
         'dminus': dminus,
         'order': order.value,
-        'array': 0
+        'array': 0,
+        'limit': validate_page_size(limit),
+        'cursor': decode_cursor(cursor),
     }
     content = await conti_resolver(args, con)
-    return content
+    return paginate(content, limit, response)
 
 
 @router.get(
@@ -154,6 +171,7 @@ async def get_conti_eod(
     response_class=ORJSONResponse,
 )
 async def get_continuous_eod_spread(
+        response: Response,
         symbol: str,
         ust: str = 'fut',  # TODO: only futures is actually supported
         exchange: str = None,
@@ -163,10 +181,17 @@ async def get_continuous_eod_spread(
         enddate: date = None,
         dminus:  int = 20,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_prices_intraday_db),
+        limit: int = appconfig.PAGE_SIZE_DEFAULT,
+        cursor: str = None,
+        con: Connection = Depends(get_async_prices_intraday_db),
         user: User = Depends(get_current_active_user),
 ):
-    """ return the (price) spread for an underlying between the x-th and n-th continues future"""
+    """
+    return the (price) spread for an underlying between the x-th and n-th continues future
+
+    - **limit**: maximum number of rows per page
+    - **cursor**: the `X-Next-Cursor` header of the previous page
+    """
     args = {
         'symbol': symbol,
         'ust': ust,
@@ -178,9 +203,11 @@ async def get_continuous_eod_spread(
         'dminus': dminus,
         'order': order.value,
         'array': 0,
+        'limit': validate_page_size(limit),
+        'cursor': decode_cursor(cursor),
     }
     content = await resolve_conti_spread(args, con)
-    return content
+    return paginate(content, limit, response)
 
 
 @router.get(
@@ -190,6 +217,7 @@ async def get_continuous_eod_spread(
     response_class=ORJSONResponse,
 )
 async def get_continuous_eod_as_array(
+        response: Response,
         symbol: str,
         ust: str = 'fut',
         exchange: str = None,
@@ -197,12 +225,17 @@ async def get_continuous_eod_as_array(
         enddate: date = None,
         dminus:  int = 20,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_prices_intraday_db),
+        limit: int = appconfig.PAGE_SIZE_DEFAULT,
+        cursor: str = None,
+        con: Connection = Depends(get_async_prices_intraday_db),
         user: User = Depends(get_current_active_user),
 ):
     """
     return the (price) spread of continues futures, compared to the first in line.
     The results are returned for 12 available continuous futures.
+
+    - **limit**: maximum number of rows per page
+    - **cursor**: the `X-Next-Cursor` header of the previous page
     """
     args = {
         'symbol': symbol,
@@ -213,9 +246,11 @@ async def get_continuous_eod_as_array(
         'dminus': dminus,
         'order': order.value,
         'array': 1,
+        'limit': validate_page_size(limit),
+        'cursor': decode_cursor(cursor),
     }
     content = await conti_array_resolver(args,  con)
-    return content
+    return paginate(content, limit, response)
 
 
 async def create_conti_eod_table_name(
@@ -279,7 +314,6 @@ async def eod_continuous_fut_sql_delivery(args):
         exchange=args['exchange'],
         contract_number=args['nthcontract']
     )
-    limit = 365 * 2
     sql = await select_all_from(
         ContiEodParams(
             schema=schema,
@@ -287,7 +321,8 @@ async def eod_continuous_fut_sql_delivery(args):
             startdate=args['startdate'],
             enddate=args['enddate'],
             order=args['order'],
-            limit=limit
+            limit=args['limit'],
+            cursor=args['cursor'],
         )
     )
     return sql
@@ -302,12 +337,12 @@ async def eod_continuous_fut_array_sql_delivery(args: dict):
         security_type=args['ust'],
         exchange=args['exchange']
     )
-    limit = 365 * 2
     params = ContiEodParams(
         schema=schema, table=table,
         startdate=args['startdate'], enddate=args['enddate'],
         order=args['order'],
-        limit=limit
+        limit=args['limit'],
+        cursor=args['cursor'],
     )
     sql = await select_all_from(params)
     return sql
@@ -318,8 +353,9 @@ async def select_all_from(nt: ContiEodParams) -> str:
        SELECT *
        FROM {nt.schema}.{nt.table}
        WHERE dt  BETWEEN '{nt.startdate}' AND '{nt.enddate}'
+           {keyset_condition(nt.cursor, nt.order)}
        ORDER BY dt {nt.order}
-       LIMIT {nt.limit};
+       LIMIT {nt.limit + 1};
     '''
 
 
@@ -344,7 +380,6 @@ async def nthcontract_to_column_mapping(nthcontract):
 async def select_conti_spread(args):
     args = eod_ini_logic_new(args)
     args = guess_exchange_and_ust(args)
-    args['limit'] = 365 * 2
     args['schema'] = await create_conti_eod_schema_name(args['ust'], args['exchange'])
     args['table'] = await create_conti_eod_array_table_name(
         symbol=args['symbol'],
@@ -360,24 +395,25 @@ async def select_conti_spread(args):
             {args['nthcontract1']} - {args['nthcontract2']} AS value
         FROM {args['schema']}.{args['table']}
         WHERE dt  BETWEEN '{args['startdate']}' AND '{args['enddate']}'
+            {keyset_condition(args['cursor'], args['order'])}
         ORDER BY dt {args['order']}
-        LIMIT {args['limit']};
+        LIMIT {args['limit'] + 1};
     '''
 
 
-async def resolve_conti_spread(args, con: Session):
+async def resolve_conti_spread(args, con: Connection):
     sql = await select_conti_spread(args)
-    data = con.execute(sql).fetchall()
+    data = await con.fetch_all(sql)
     return data
 
 
-async def conti_resolver(args, con: Session):
+async def conti_resolver(args, con: Connection):
     sql = await eod_continuous_fut_sql_delivery(args)
-    data = con.execute(sql).fetchall()
+    data = await con.fetch_all(sql)
     return data
 
 
-async def conti_array_resolver(args, db: Session):
+async def conti_array_resolver(args, db: Connection):
     sql = await eod_continuous_fut_array_sql_delivery(args)
-    data = db.execute(sql).fetchall()
+    data = await db.fetch_all(sql)
     return data
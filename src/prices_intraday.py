@@ -1,31 +1,56 @@
 from datetime import date as Date
 from datetime import datetime as dt
-import json
 import typing as t
 
+from databases import Database
+from databases.core import Connection
 from falib.contract import Contract
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
+import numpy as np
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 from starlette.exceptions import HTTPException
-from starlette.status import (
-    HTTP_400_BAD_REQUEST,
-    HTTP_500_INTERNAL_SERVER_ERROR,
-)
+from starlette.responses import Response
+from starlette.status import HTTP_400_BAD_REQUEST
 
+import appconfig
+from src.cache import TTLCache
 from src.const import (
     IntervalUnitChoices,
-    IntervalValueChoices,
     OrderChoices,
+    ResponseFormatChoices,
 )
 from src.db import (
-    get_prices_intraday_db,
-    results_proxy_to_list_of_dict,
+    async_engines,
+    fresh_connection,
+    get_async_prices_intraday_db,
+)
+from src.pagination import (
+    decode_cursor,
+    keyset_condition,
+    paginate,
+    validate_page_size,
+)
+from src.prices_recent import recent_bars
+from src.prices_resample import (
+    COLUMNS,
+    Bars,
+    bars_to_records,
+    compose_bars,
+    interval_seconds,
+    plan_source,
+    resample,
+    resample_stream,
+)
+from src.prices_rollup import (
+    Rollup,
+    compose_rollup_table_name,
 )
+from src.streaming import streaming_response
 from src.users import (
     User,
+    get_current_active_superuser,
     get_current_active_user,
 )
 from src.utils import (
@@ -35,34 +60,7 @@ from src.utils import (
 
 router = fastapi.APIRouter()
 
-
-allowed_queries_configs = {
-    'month_1': {'unit': 'month', 'value': 1, 'query': 'date_trunc', 'multiplier': None},
-    'week_1': {'unit': 'week', 'value': 1, 'query': 'date_trunc', 'multiplier': None},
-    'day_1': {'unit': 'day', 'value': 1, 'query': 'date_trunc', 'multiplier': None},
-    'hour_2': {'unit': 'hour', 'value': 2, 'query': 'floor_extract', 'multiplier': 60 * 60 * 2},
-    'hour_1': {'unit': 'hour', 'value': 1, 'query': 'date_trunc', 'multiplier': None},
-    'minutes_30': {'unit': 'minutes', 'value': 30, 'query': 'floor_extract', 'multiplier': 60 * 30},
-    'minutes_20': {'unit': 'minutes', 'value': 20, 'query': 'floor_extract', 'multiplier': 60 * 20},
-    'minutes_15': {'unit': 'minutes', 'value': 15, 'query': 'floor_extract', 'multiplier': 60 * 15},
-    'minutes_10': {'unit': 'minutes', 'value': 10, 'query': 'floor_extract', 'multiplier': 60 * 10},
-    'minutes_5': {'unit': 'minutes', 'value': 5, 'query': 'floor_extract', 'multiplier': 60 * 5},
-    'minutes_4': {'unit': 'minutes', 'value': 4, 'query': 'floor_extract', 'multiplier': 60 * 4},
-    'minutes_3': {'unit': 'minutes', 'value': 3, 'query': 'floor_extract', 'multiplier': 60 * 3},
-    'minutes_2': {'unit': 'minutes', 'value': 2, 'query': 'floor_extract', 'multiplier': 60 * 2},
-    'minutes_1': {'unit': 'minutes', 'value': 1, 'query': 'regular', 'multiplier': None}
- }
-
-allowed_queries = list(allowed_queries_configs)
-unique_units = list(set([elm['unit'] for elm in allowed_queries_configs.values()]))
-valid_configs = {
-    unit: [
-        elm['value']
-        for elm in allowed_queries_configs.values()
-        if elm['unit'] == unit
-        ] for unit in unique_units
-}
-valid_configs_json = json.dumps(valid_configs)
+bars_cache = TTLCache(maxsize=appconfig.PRICES_BARS_CACHE_MAXSIZE, ttl=appconfig.PRICES_BARS_CACHE_TTL_SECONDS)
 
 
 class PricesIntraday(BaseModel):
@@ -96,6 +94,7 @@ class PricesIntradayQuery(BaseModel):
     response_class=ORJSONResponse,
 )
 async def get_intraday_prices(
+        response: Response,
         symbol: str,
         month: str = None,
         year: int = None,
@@ -104,12 +103,29 @@ async def get_intraday_prices(
         startdate: Date = None,
         enddate: Date = None,
         dminus: int = 20,
-        interval: IntervalValueChoices = IntervalValueChoices._1,
+        interval: int = 1,
         iunit: IntervalUnitChoices = IntervalUnitChoices._minutes,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_prices_intraday_db),
+        limit: int = appconfig.PAGE_SIZE_DEFAULT,
+        cursor: str = None,
+        format: ResponseFormatChoices = ResponseFormatChoices._json,
+        con: Connection = Depends(get_async_prices_intraday_db),
         user: User = Depends(get_current_active_user),
 ):
+    """
+    OHLCV bars of `interval` times `iunit` resampled from the 1 minute bars.
+
+    - **interval**: any positive integer e.g. 7 (minutes), 4 (hours)
+    - **iunit**: one of ['minutes', 'hour', 'day', 'week', 'month', 'session']
+    - **limit**: maximum number of bars per page
+    - **cursor**: the `X-Next-Cursor` header of the previous page
+    - **format**: one of ['json', 'ndjson', 'csv']. `ndjson` and `csv` stream all bars
+      of the range in chunks and ignore `limit` and `cursor`
+
+    Bars are aligned to the local time of the exchange. `dt` is the start of a bar in UTC.
+    A `session` ends after 30 minutes without any trades.
+    Pages of bars spanning more than 500,000 1 minute bars each are rejected. Stream them instead.
+    """
     args = {
         'symbol': symbol,
         'month': month,
@@ -119,12 +135,15 @@ async def get_intraday_prices(
         'startdate': startdate,
         'enddate': enddate,
         'dminus': dminus,
-        'interval': interval.value,
+        'interval': interval,
         'iunit': iunit.value,
         'order': order.value,
-        'limit': 365 * 2
+        'limit': validate_page_size(limit),
+        'cursor': decode_cursor(cursor),
     }
-    content = await resolve_prices_intraday(args, con)
+    if format != ResponseFormatChoices._json:
+        return await stream_prices_intraday(args, format.value)
+    content = await resolve_prices_intraday(args, con, response)
     return content
 
 
@@ -150,80 +169,39 @@ async def select_prices_intraday(args: dict):
     return sql_code
 
 
-async def _create_hash(unit, interval):
-    return f'{unit}_{interval}'
-
-
-async def select_price_data(args):
-    hash = await _create_hash(args['iunit'], args['interval'])
-    if hash not in allowed_queries:
-        raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail=f"received unit: {args['iunit']} and interval {args['interval']}`."
-                   f" Valid pairs are: {valid_configs}")
-    details = allowed_queries_configs[hash]
-    args['multiplier'] = details['multiplier']
-    if details['query'] == 'floor_extract':
-        sql = await select_via_floor_extract(args)
-    elif details['query'] == 'date_trunc':
-        sql = await select_via_date_trunc(args)
-    elif details['query'] == 'regular':
-        sql = await select_regular(args)
-    else:
-        raise HTTPException(
-            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-            detail='We fucked up.'
-        )
-    return sql
-
-
-async def select_via_floor_extract(args) -> str:
-    """case, where we truncate low level by converting datetime to epochs"""
-    return f'''
-    SELECT (to_timestamp(
-                floor((extract('epoch' FROM dt) / {args['multiplier']}))
-                 * {args['multiplier']}
-            ) AT TIME ZONE 'UTC')                          AS dt,
-           MAX(tz_offset)                                  AS tz,
-           (array_agg(open_value ORDER BY dt)) [1]         AS open,
-           MAX(high_value)                                 AS high,
-           MIN(low_value)                                  AS low,
-           (array_agg(close_value ORDER BY dt DESC))[1]    AS close,
-           SUM(volume_value)                               AS volume
-    FROM   {args['schema']}.{args['table']}
-    WHERE  dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
-    -- create one integers (although double) for each row
-    -- same like date_trunc() creates unqiue timestamps only with integers**
-    GROUP BY floor(extract('epoch' FROM dt) / {args['multiplier']})
-    ORDER BY dt  {args['order']}
-    LIMIT {args['limit']};
-    '''
-
-
-async def select_via_date_trunc(args) -> str:
+def source_row_limit(args: t.Dict[str, t.Any], rollup: t.Optional[Rollup]) -> int:
     """
-    case, where the database takes care of truncating data by date
+    number of source bars a page of fixed length bars is resampled from. the first bucket
+    of a page may have been returned with the previous page and one more bucket tells
+    whether another page follows. bounded by ``PRICES_RESAMPLE_MAX_ROWS``
     """
-    return f'''
-        SELECT   date_trunc('{args['iunit']}', dt)                    AS dt,
-                 MAX(tz_offset)                                  AS tz,
-                 (array_agg(open_value ORDER BY dt ASC))[1]      AS open,
-                 MAX(high_value)                                 AS high,
-                 MIN(low_value)                                  AS low,
-                 (array_agg(close_value ORDER BY dt DESC))[1]    AS close,
-                 SUM(volume_value)                               AS volume
-        FROM     {args['schema']}.{args['table']}
-        WHERE    dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
-        GROUP BY date_trunc('{args['iunit']}', dt)
-        ORDER BY dt  {args['order']}
-        LIMIT    {args['limit']};'''
+    seconds = interval_seconds(args['iunit'], args['interval'])
+    if seconds is None:
+        return appconfig.PRICES_RESAMPLE_MAX_ROWS
+    source_seconds = rollup.seconds if rollup is not None else 60
+    return min((args['limit'] + 2) * (seconds // source_seconds), appconfig.PRICES_RESAMPLE_MAX_ROWS)
 
 
-async def select_regular(args) -> str:
+async def select_price_data(args) -> str:
     """
-    case, where unit = minute and value = 1
+    the bars a page of the requested interval is resampled from (see ``src.prices_resample``).
+    at most ``args['source_limit']`` bars from the cursor on in the requested order.
+    ascending pages include the bars at the cursor to complete its bucket.
+    streams (``args['stream']``) select all bars of the range
     """
-    return f'''
+    if args['interval'] < 1:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"`interval` needs to be a positive integer. received: {args['interval']}",
+        )
+    rollup = plan_source(args['iunit'], args['interval']) if appconfig.IVOLAPI_PRICES_ROLLUPS else None
+    if args.get('stream'):
+        args['source_limit'], condition = None, ''
+    else:
+        args['source_limit'] = source_row_limit(args, rollup)
+        condition = keyset_condition(args['cursor'], args['order'], inclusive=True)
+    if rollup is None:
+        return f'''
         SELECT   dt AS dt,
                  tz_offset AS tz,
                  open_value AS open,
@@ -233,12 +211,108 @@ async def select_regular(args) -> str:
                  volume_value AS volume
         FROM     {args['schema']}.{args['table']}
         WHERE    dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
+            {condition}
+        ORDER BY dt  {args['order']}
+        LIMIT    {args['source_limit'] or 'ALL'};'''
+    table = compose_rollup_table_name(args['table'], rollup)
+    return f'''
+        SELECT   dt, tz, open, high, low, close, volume
+        FROM     {args['schema']}.{table}
+        WHERE    dt BETWEEN '{args['startdate']}' AND '{args['enddate']}'
+            {condition}
         ORDER BY dt  {args['order']}
-        LIMIT    {args['limit']};'''
+        LIMIT    {args['source_limit'] or 'ALL'};'''
 
 
-async def resolve_prices_intraday(args: t.Dict[str, t.Any], con: Session):
+def select_after_cursor(bars: Bars, cursor: t.Optional[str], order: str) -> Bars:
+    """the bars ``select_price_data`` selects with the keyset condition"""
+    if cursor is None:
+        return bars
+    cursor = np.datetime64(cursor, 's')
+    selected = bars.dt < cursor if order == OrderChoices._desc.value else bars.dt >= cursor
+    return Bars(*(column[selected] for column in bars))
+
+
+async def resolve_prices_intraday(args: t.Dict[str, t.Any], con: Connection, response: Response):
     sql = await select_prices_intraday(args)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
-    return data
+    truncated = False
+    bars = await recent_bars.get(con, args['schema'], args['table'], args['startdate'], args['enddate'])
+    if bars is not None:
+        bars = select_after_cursor(bars, args['cursor'], args['order'])
+    else:
+        bars = bars_cache.get(sql)
+        if bars is None:
+            rows = await con.fetch_all(sql)
+            bars = compose_bars(rows)
+            # large sources would pin hundreds of MB per worker
+            if len(bars.dt) <= appconfig.PRICES_BARS_CACHE_MAX_ROWS:
+                bars_cache.set(sql, bars)
+        truncated = len(bars.dt) >= args['source_limit']
+    data = bars_to_records(resample(bars, args['iunit'], args['interval']))
+    if args['order'] == OrderChoices._desc.value:
+        data.reverse()
+    if truncated:
+        # the source bars of the last bucket may continue beyond the selected ones
+        data = data[:-1]
+    if args['cursor'] is not None:
+        # the bucket at the cursor was returned with the previous page
+        cursor = dt.fromisoformat(args['cursor'])
+        data = [record for record in data if record['dt'] != cursor]
+    if truncated and not data:
+        # the next page would read the same bars again
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=(
+                f'a single bar of the interval spans more than {appconfig.PRICES_RESAMPLE_MAX_ROWS} source bars. '
+                'request a shorter interval or all bars with `format=ndjson` or `format=csv`'
+            ),
+        )
+    return paginate(data, args['limit'], response, has_more=truncated)
+
+
+async def iterate_bars(sql: str, chunk_rows: int, database: Database = None) -> t.AsyncIterator[Bars]:
+    """
+    the bars selected by ``sql`` in chunks of ``chunk_rows`` rows read from a server side cursor.
+    the connection is held until the stream ends, independent of the connection of the request
+    """
+    async with fresh_connection(database or async_engines.prices_intraday) as con:
+        rows = []
+        async for row in con.iterate(sql):
+            rows.append(row)
+            if len(rows) == chunk_rows:
+                yield compose_bars(rows)
+                rows = []
+        if rows:
+            yield compose_bars(rows)
+
+
+async def stream_prices_intraday(args: t.Dict[str, t.Any], media_format: str, database: Database = None):
+    args['stream'] = True
+    sql = await select_prices_intraday(args)
+    pieces = iterate_bars(sql, appconfig.STREAM_CHUNK_ROWS, database)
+    resampled = resample_stream(pieces, args['iunit'], args['interval'], args['order'])
+    chunks = (bars_to_records(bars) async for bars in resampled)
+    return streaming_response(chunks, media_format, COLUMNS)
+
+
+class RecentBarsStats(BaseModel):
+    tables: int
+    bars: int
+    hits: int
+    misses: int
+
+
+@router.get(
+    '/prices/intraday/recent/stats',
+    operation_id='get_intraday_recent_bars_stats',
+    response_model=RecentBarsStats,
+    response_class=ORJSONResponse,
+)
+async def get_intraday_recent_bars_stats(
+        user: User = Depends(get_current_active_superuser),
+):
+    """
+    number of buffered tables and bars and the hits and misses of the recent bars
+    of the worker processing the request. hits are requests served without querying the table
+    """
+    return recent_bars.stats()
@@ -0,0 +1,243 @@
+"""
+per worker ring buffers of the recent 1 minute bars of intraday tables
+
+The most common call to ``/prices/intraday`` asks for the last few days of an ETF.
+Instead of scanning the same recent rows of the table for each request, a worker
+keeps the bars of the last ``sessions`` sessions of recently requested tables in
+fixed size NumPy arrays. New rows are appended incrementally, at most once every
+``refresh_seconds``. Requests ending today whose range lies within a buffer are
+resampled from it without touching the database.
+
+Every worker holds its own buffers (see ``src.cache``). The number of tables is
+bounded by evicting the least recently used buffer.
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime as dt
+import logging
+import time
+import typing as t
+
+from databases.core import Connection
+import numpy as np
+
+import appconfig
+from src.prices_resample import (
+    Bars,
+    bucket_ids,
+    compose_bars,
+)
+
+logger = logging.getLogger(__name__)
+
+RelationKey = t.Tuple[str, str]
+
+
+class RingBuffer:
+    """
+    the last ``capacity`` bars in ascending order of ``dt``.
+    all bars since ``complete_since`` are held. ``None`` if all bars of the table are held
+    """
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError('`capacity` needs to be a positive integer')
+        self.capacity = capacity
+        self._columns = Bars(
+            dt=np.empty(capacity, dtype='datetime64[s]'),
+            tz=np.empty(capacity, dtype=np.int64),
+            open=np.empty(capacity, dtype=np.float64),
+            high=np.empty(capacity, dtype=np.float64),
+            low=np.empty(capacity, dtype=np.float64),
+            close=np.empty(capacity, dtype=np.float64),
+            volume=np.empty(capacity, dtype=np.int64),
+        )
+        self._start = 0
+        self.size = 0
+        self.complete_since: t.Optional[np.datetime64] = None
+
+    def _positions(self) -> np.ndarray:
+        return (self._start + np.arange(self.size)) % self.capacity
+
+    @property
+    def last_dt(self) -> t.Optional[np.datetime64]:
+        if self.size == 0:
+            return None
+        return self._columns.dt[(self._start + self.size - 1) % self.capacity]
+
+    def bars(self) -> Bars:
+        positions = self._positions()
+        return Bars(*(column[positions] for column in self._columns))
+
+    def _drop(self, count: int):
+        """drop the ``count`` oldest bars"""
+        if count <= 0:
+            return
+        self._start = (self._start + count) % self.capacity
+        self.size -= count
+        self.complete_since = self._columns.dt[self._start] if self.size else None
+
+    def append(self, bars: Bars):
+        """append bars newer than the last one. the oldest bars are overwritten"""
+        if self.size:
+            bars = Bars(*(column[bars.dt > self.last_dt] for column in bars))
+        count = len(bars.dt)
+        if count == 0:
+            return
+        if count > self.capacity:
+            bars = Bars(*(column[-self.capacity:] for column in bars))
+            count = self.capacity
+        self._drop(self.size + count - self.capacity)
+        positions = (self._start + self.size + np.arange(count)) % self.capacity
+        for target, source in zip(self._columns, bars):
+            target[positions] = source
+        self.size += count
+
+    def keep_sessions(self, sessions: int):
+        """drop all bars before the last ``sessions`` sessions"""
+        if self.size == 0:
+            return
+        ids = bucket_ids(self.bars(), 'session', 1)
+        first_kept = ids[-1] - sessions + 1
+        if first_kept > 0:
+            self._drop(int(np.searchsorted(ids, first_kept)))
+
+    def covers(self, startdate: np.datetime64) -> bool:
+        return self.complete_since is None or startdate >= self.complete_since
+
+    def select(self, startdate: np.datetime64, enddate: np.datetime64) -> Bars:
+        """bars with ``startdate <= dt <= enddate``"""
+        bars = self.bars()
+        first = np.searchsorted(bars.dt, startdate, side='left')
+        last = np.searchsorted(bars.dt, enddate, side='right')
+        return Bars(*(column[first:last] for column in bars))
+
+
+class _Entry:
+    def __init__(self, capacity: int):
+        self.buffer = RingBuffer(capacity)
+        self.synced_at: t.Optional[float] = None
+        self.lock = asyncio.Lock()
+
+
+def select_recent_rows(schema: str, table: str, limit: int, after: t.Optional[np.datetime64] = None) -> str:
+    """the last ``limit`` bars or the first ``limit`` bars after ``after``"""
+    if after is None:
+        condition, order = '', 'DESC'
+    else:
+        condition, order = f"WHERE    dt > '{after}'", 'ASC'
+    return f'''
+        SELECT   dt AS dt,
+                 tz_offset AS tz,
+                 open_value AS open,
+                 high_value AS high,
+                 low_value AS low,
+                 close_value AS close,
+                 volume_value AS volume
+        FROM     {schema}.{table}
+        {condition}
+        ORDER BY dt  {order}
+        LIMIT    {limit};'''
+
+
+class RecentBars:
+    """ring buffers of the recent bars of the ``max_tables`` most recently requested tables"""
+    def __init__(
+            self,
+            max_tables: int,
+            capacity: int,
+            sessions: int,
+            refresh_seconds: float,
+            *,
+            timer: t.Callable[[], float] = time.monotonic,
+            # `dt` is stored in UTC
+            today: t.Callable[[], str] = lambda: dt.utcnow().strftime('%Y-%m-%d'),
+    ):
+        self.max_tables = max_tables
+        self.capacity = capacity
+        self.sessions = sessions
+        self.refresh_seconds = refresh_seconds
+        self.timer = timer
+        self.today = today
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[RelationKey, _Entry]' = OrderedDict()
+
+    async def get(
+            self,
+            con: Connection,
+            schema: str,
+            table: str,
+            startdate: str,
+            enddate: str,
+    ) -> t.Optional[Bars]:
+        """
+        1 minute bars between ``startdate`` and ``enddate`` (``YYYY-MM-DD``, compared like
+        ``dt BETWEEN 'startdate' AND 'enddate'``). ``None`` if the range is not buffered.
+        only requests served without querying the table count as hits
+        """
+        if self.max_tables < 1 or enddate < self.today():
+            self.misses += 1
+            return None
+        key = (schema, table)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(self.capacity)
+            while len(self._entries) > self.max_tables:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        synced = False
+        if entry.synced_at is None or self.timer() - entry.synced_at >= self.refresh_seconds:
+            async with entry.lock:
+                # another request may have synced the buffer meanwhile
+                if entry.synced_at is None or self.timer() - entry.synced_at >= self.refresh_seconds:
+                    await self._sync(entry, con, schema, table)
+                    entry.synced_at = self.timer()
+                    synced = True
+        startdate, enddate = np.datetime64(startdate, 's'), np.datetime64(enddate, 's')
+        if not entry.buffer.covers(startdate):
+            self.misses += 1
+            return None
+        if synced:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry.buffer.select(startdate, enddate)
+
+    async def _sync(self, entry: _Entry, con: Connection, schema: str, table: str):
+        buffer = entry.buffer
+        if buffer.size:
+            rows = await con.fetch_all(select_recent_rows(schema, table, self.capacity, buffer.last_dt))
+            if len(rows) < self.capacity:
+                buffer.append(compose_bars(rows))
+                buffer.keep_sessions(self.sessions)
+                return
+            # too far behind. start over
+            entry.buffer = buffer = RingBuffer(self.capacity)
+        rows = await con.fetch_all(select_recent_rows(schema, table, self.capacity))
+        buffer.append(compose_bars(rows))
+        if len(rows) == self.capacity:
+            # older bars are not held
+            buffer.complete_since = buffer.bars().dt[0]
+        buffer.keep_sessions(self.sessions)
+        logger.info(f'buffered {buffer.size} recent bars of {schema}.{table}')
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            'tables': len(self._entries),
+            'bars': sum(entry.buffer.size for entry in self._entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+recent_bars = RecentBars(
+    max_tables=appconfig.RECENT_BARS_MAX_TABLES,
+    capacity=appconfig.RECENT_BARS_CAPACITY,
+    sessions=appconfig.RECENT_BARS_SESSIONS,
+    refresh_seconds=appconfig.RECENT_BARS_REFRESH_SECONDS,
+)
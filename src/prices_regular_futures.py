@@ -3,6 +3,7 @@ from datetime import date as Date
 from datetime import datetime as dt
 import typing as t
 
+from databases.core import Connection
 from falib.contract import Contract
 from fastapi import (
     APIRouter,
@@ -10,15 +11,22 @@ from fastapi import (
 )
 from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 from starlette import status
 from starlette.exceptions import HTTPException
+from starlette.responses import Response
 
+import appconfig
 from src.const import (
     OrderChoices,
     futuresMonthChars,
 )
-from src.db import get_prices_intraday_db
+from src.db import get_async_prices_intraday_db
+from src.pagination import (
+    decode_cursor,
+    keyset_condition,
+    paginate,
+    validate_page_size,
+)
 from src.users import (
     User,
     get_current_active_user,
@@ -32,7 +40,7 @@ router = APIRouter()
 
 RegularFuturesParams = namedtuple(
     'regularFuturesParams',
-    ['schema', 'table', 'startdate', 'enddate', 'order', 'limit'])
+    ['schema', 'table', 'startdate', 'enddate', 'order', 'limit', 'cursor'])
 
 
 class RegularFuturesEod(BaseModel):
@@ -52,6 +60,7 @@ class RegularFuturesEod(BaseModel):
     response_class=ORJSONResponse,
 )
 async def get_regular_futures_eod(
+        response: Response,
         symbol: str,
         month: futuresMonthChars = futuresMonthChars._z,
         year: int = dt.now().year + 1,
@@ -61,12 +70,17 @@ async def get_regular_futures_eod(
         enddate: Date = None,
         dminus: int = 30,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_prices_intraday_db),
+        limit: int = appconfig.PAGE_SIZE_DEFAULT,
+        cursor: str = None,
+        con: Connection = Depends(get_async_prices_intraday_db),
         user: User = Depends(get_current_active_user),
 ):
     """
     end of day prices for futures contracts
     ``year``has to be four digit number.
+
+    - **limit**: maximum number of rows per page
+    - **cursor**: the `X-Next-Cursor` header of the previous page
     """
     if len(str(year)) != 4:
         raise HTTPException(
@@ -83,9 +97,11 @@ async def get_regular_futures_eod(
         'enddate': enddate,
         'dminus': dminus,
         'order': order.value,
+        'limit': validate_page_size(limit),
+        'cursor': decode_cursor(cursor),
     }
     content = await resolve_eod_futures(args, con)
-    return content
+    return paginate(content, limit, response)
 
 
 async def eod_sql_delivery(args):
@@ -99,12 +115,12 @@ async def eod_sql_delivery(args):
     schema = f"{args['ust']}_{args['exchange']}_eod"
     contract = f"{args['symbol']}{args['month']}{args['year']}".lower()
     table = f"{args['ust']}_{args['exchange']}_{contract}_prices_eod"
-    limit = 365 * 2
     params = RegularFuturesParams(
         schema=schema, table=table,
         startdate=args['startdate'], enddate=args['enddate'],
         order=args['order'],
-        limit=limit
+        limit=args['limit'],
+        cursor=args['cursor'],
     )
     sql = await final_sql(params)
     return sql
@@ -115,12 +131,13 @@ async def final_sql(nt: RegularFuturesParams) -> str:
         SELECT *
         FROM {nt.schema}.{nt.table}
         WHERE dt  BETWEEN '{nt.startdate}' AND '{nt.enddate}'
+            {keyset_condition(nt.cursor, nt.order)}
         ORDER BY dt {nt.order}
-        LIMIT {nt.limit};
+        LIMIT {nt.limit + 1};
     '''
 
 
-async def resolve_eod_futures(args, con: Session):
+async def resolve_eod_futures(args, con: Connection):
     sql = await eod_sql_delivery(args)
-    data = con.execute(sql).fetchall()
+    data = await con.fetch_all(sql)
     return data
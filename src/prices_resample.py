@@ -0,0 +1,215 @@
+"""
+in-process resampling of intraday bars
+
+The bars of the requested date range are read once into NumPy arrays, either
+the 1 minute bars of the intraday table or a rollup which evenly divides the
+interval (see ``src.prices_rollup``). Bars of any interval (7 minutes, 45 minutes,
+4 hours, sessions, ...) are reduced from them with ``ufunc.reduceat`` over the runs
+of equal bucket ids: first open, highest high, lowest low, last close, sum of the volume.
+
+Buckets are aligned to the local time of the exchange, i.e. ``dt + tz_offset``.
+Hence, daily bars start at local midnight and 4 hour bars at 0:00, 4:00, ... local time.
+The ``dt`` of a bar is the start of its bucket in UTC. ``session`` bars are separated
+by gaps of more than ``SESSION_GAP_SECONDS`` without any bars and start at their first bar.
+
+Long ranges are resampled piece by piece with ``resample_stream``. The bars of the
+bucket at the end of a piece are held back until the next piece completes it.
+"""
+import math
+import typing as t
+
+import numpy as np
+
+from src.const import (
+    IntervalUnitChoices,
+    OrderChoices,
+)
+from src.prices_rollup import (
+    Rollup,
+    plan_rollup,
+)
+
+MINUTE_SECONDS = 60
+HOUR_SECONDS = 60 * MINUTE_SECONDS
+DAY_SECONDS = 24 * HOUR_SECONDS
+# `tz_offset` is stored in hours
+TZ_OFFSET_SECONDS = HOUR_SECONDS
+SESSION_GAP_SECONDS = 30 * MINUTE_SECONDS
+# days between 1970-01-01 (a thursday) and the first monday
+EPOCH_MONDAY_DAYS = 4
+
+UNIT_SECONDS = {
+    IntervalUnitChoices._minutes.value: MINUTE_SECONDS,
+    IntervalUnitChoices._hour.value: HOUR_SECONDS,
+    IntervalUnitChoices._day.value: DAY_SECONDS,
+}
+COLUMNS = ('dt', 'tz', 'open', 'high', 'low', 'close', 'volume')
+
+
+class Bars(t.NamedTuple):
+    """columns of bars in ascending order of ``dt``. ``dt`` in UTC as ``datetime64[s]``"""
+    dt: np.ndarray
+    tz: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+
+def compose_bars(rows: t.Iterable[t.Mapping[str, t.Any]]) -> Bars:
+    """``rows`` with the keys of ``COLUMNS`` in any order of ``dt``"""
+    rows = list(rows)
+    bars = Bars(
+        dt=np.array([row['dt'] for row in rows], dtype='datetime64[s]'),
+        tz=np.array([row['tz'] or 0 for row in rows], dtype=np.int64),
+        open=np.array([row['open'] for row in rows], dtype=np.float64),
+        high=np.array([row['high'] for row in rows], dtype=np.float64),
+        low=np.array([row['low'] for row in rows], dtype=np.float64),
+        close=np.array([row['close'] for row in rows], dtype=np.float64),
+        volume=np.array([row['volume'] or 0 for row in rows], dtype=np.int64),
+    )
+    order = np.argsort(bars.dt, kind='stable')
+    return Bars(*(column[order] for column in bars))
+
+
+def bars_to_records(bars: Bars) -> t.List[t.Dict[str, t.Any]]:
+    return [
+        dict(zip(COLUMNS, values))
+        for values in zip(*(column.tolist() for column in bars))
+    ]
+
+
+def interval_seconds(unit: str, value: int) -> t.Optional[int]:
+    """length of fixed intervals. ``None`` for weeks, months and sessions"""
+    if unit in UNIT_SECONDS:
+        return UNIT_SECONDS[unit] * value
+    return None
+
+
+def plan_source(unit: str, value: int) -> t.Optional[Rollup]:
+    """
+    the coarsest rollup the interval can be resampled from. ``None`` for 1 minute bars.
+    rollups are aligned to UTC. Hence, only rollups which evenly divide an hour (i.e. the
+    tz offset) are valid sources for buckets aligned to the local time of the exchange
+    """
+    if unit == IntervalUnitChoices._session.value:
+        # gaps are only visible in 1 minute bars
+        return None
+    seconds = interval_seconds(unit, value) or DAY_SECONDS
+    return plan_rollup(math.gcd(seconds, HOUR_SECONDS))
+
+
+def bucket_ids(bars: Bars, unit: str, value: int) -> np.ndarray:
+    """bucket of each bar. non decreasing unless the tz offset decreases"""
+    if unit == IntervalUnitChoices._session.value:
+        gaps = np.diff(bars.dt.astype(np.int64)) > SESSION_GAP_SECONDS
+        return np.concatenate(([0], np.cumsum(gaps))) // value
+    local = bars.dt.astype(np.int64) + bars.tz * TZ_OFFSET_SECONDS
+    seconds = interval_seconds(unit, value)
+    if seconds is not None:
+        return local // seconds
+    days = local // DAY_SECONDS
+    if unit == IntervalUnitChoices._week.value:
+        return (days - EPOCH_MONDAY_DAYS) // (7 * value)
+    if unit == IntervalUnitChoices._month.value:
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return months // value
+    raise ValueError(f'unknown interval unit: {unit}')
+
+
+def bucket_starts(ids: np.ndarray, unit: str, value: int) -> np.ndarray:
+    """local start of each bucket in seconds since the epoch"""
+    seconds = interval_seconds(unit, value)
+    if seconds is not None:
+        return ids * seconds
+    if unit == IntervalUnitChoices._week.value:
+        return (ids * 7 * value + EPOCH_MONDAY_DAYS) * DAY_SECONDS
+    if unit == IntervalUnitChoices._month.value:
+        return (ids * value).astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    raise ValueError(f'unknown interval unit: {unit}')
+
+
+def bucket_changes(bars: Bars, ids: np.ndarray, unit: str, value: int) -> np.ndarray:
+    """
+    whether a new bucket starts at the second of each pair of consecutive bars.
+    a new bucket starts at each change of the id. a decreasing tz offset (end of
+    daylight saving time) repeats the local hour. hence, it starts a new bucket of
+    intervals shorter than a day as well. local days simply last 25 hours
+    """
+    changes = ids[1:] != ids[:-1]
+    seconds = interval_seconds(unit, value)
+    if seconds is not None and seconds < DAY_SECONDS:
+        changes |= bars.tz[1:] < bars.tz[:-1]
+    return changes
+
+
+def resample(bars: Bars, unit: str, value: int) -> Bars:
+    """OHLCV bars of ``value`` times ``unit``. ``bars`` need to be sorted by ``dt``"""
+    if len(bars.dt) == 0:
+        return bars
+    ids = bucket_ids(bars, unit, value)
+    starts = np.flatnonzero(np.concatenate(([True], bucket_changes(bars, ids, unit, value))))
+    ends = np.concatenate((starts[1:], [len(ids)])) - 1
+    if unit == IntervalUnitChoices._session.value:
+        dt = bars.dt[starts]
+    else:
+        local_starts = bucket_starts(ids[starts], unit, value)
+        dt = (local_starts - bars.tz[starts] * TZ_OFFSET_SECONDS).astype('datetime64[s]')
+    return Bars(
+        dt=dt,
+        tz=np.maximum.reduceat(bars.tz, starts),
+        open=bars.open[starts],
+        high=np.maximum.reduceat(bars.high, starts),
+        low=np.minimum.reduceat(bars.low, starts),
+        close=bars.close[ends],
+        volume=np.add.reduceat(bars.volume, starts),
+    )
+
+
+def concat_bars(*pieces: Bars) -> Bars:
+    return Bars(*(np.concatenate(columns) for columns in zip(*pieces)))
+
+
+def reverse_bars(bars: Bars) -> Bars:
+    return Bars(*(column[::-1] for column in bars))
+
+
+def split_frontier(bars: Bars, unit: str, value: int, order: str) -> t.Tuple[Bars, Bars]:
+    """
+    bars of complete buckets and the bars of the bucket at the end of the stream so far,
+    i.e. the last (``asc``) or the first (``desc``) bucket of ``bars``
+    """
+    ids = bucket_ids(bars, unit, value)
+    changes = np.flatnonzero(bucket_changes(bars, ids, unit, value)) + 1
+    if order == OrderChoices._desc.value:
+        split = changes[0] if len(changes) else len(ids)
+        return Bars(*(column[split:] for column in bars)), Bars(*(column[:split] for column in bars))
+    split = changes[-1] if len(changes) else 0
+    return Bars(*(column[:split] for column in bars)), Bars(*(column[split:] for column in bars))
+
+
+async def resample_stream(
+        pieces: t.AsyncIterable[Bars],
+        unit: str,
+        value: int,
+        order: str,
+) -> t.AsyncIterator[Bars]:
+    """
+    resample consecutive ``pieces`` of the bars of a range in the given order.
+    each piece needs to be sorted by ``dt``. yields the resampled bars in the given order
+    """
+    descending = order == OrderChoices._desc.value
+    frontier = None
+    async for piece in pieces:
+        if frontier is not None:
+            piece = concat_bars(piece, frontier) if descending else concat_bars(frontier, piece)
+        if len(piece.dt) == 0:
+            continue
+        complete, frontier = split_frontier(piece, unit, value, order)
+        if len(complete.dt):
+            resampled = resample(complete, unit, value)
+            yield reverse_bars(resampled) if descending else resampled
+    if frontier is not None and len(frontier.dt):
+        resampled = resample(frontier, unit, value)
+        yield reverse_bars(resampled) if descending else resampled
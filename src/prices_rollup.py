@@ -0,0 +1,109 @@
+"""
+pre-aggregated OHLCV bars ("rollups") of the intraday price tables
+
+Each intraday table (``{ust}_{exchange}_{contract}_prices_intraday``, one row per minute)
+gets one materialized view per rollup interval::
+
+    {table}_rollup_5m   <- {table}
+    {table}_rollup_15m  <- {table}_rollup_5m
+    {table}_rollup_1h   <- {table}_rollup_15m
+
+Each rollup is aggregated from the next finer one. Hence, sorting a group for its
+first open and last close only touches a handful of rows. The views are created
+and refreshed by ``refresh_prices_rollups.py``. ``/prices/intraday`` resamples its bars
+from them if ``appconfig.IVOLAPI_PRICES_ROLLUPS`` is set. Rollups are aligned to UTC.
+Hence, bars aligned to the local time of the exchange can only be read from rollups which
+evenly divide an hour (see ``src.prices_resample.plan_source``). There is no daily rollup.
+Retired rollups are dropped by ``refresh_prices_rollups.py``.
+"""
+import typing as t
+
+RAW_COLUMNS = {
+    'tz': 'tz_offset',
+    'open': 'open_value',
+    'high': 'high_value',
+    'low': 'low_value',
+    'close': 'close_value',
+    'volume': 'volume_value',
+}
+ROLLUP_COLUMNS = {column: column for column in RAW_COLUMNS}
+
+
+class Rollup(t.NamedTuple):
+    suffix: str
+    seconds: int
+
+
+# from fine to coarse. each rollup evenly divides the next one
+ROLLUPS = (
+    Rollup('5m', 5 * 60),
+    Rollup('15m', 15 * 60),
+    Rollup('1h', 60 * 60),
+)
+# UTC days do not match the local days of the exchange
+RETIRED_ROLLUPS = (
+    Rollup('1d', 24 * 60 * 60),
+)
+
+
+def compose_rollup_table_name(table: str, rollup: Rollup) -> str:
+    """``fut_cme_clz20_prices_intraday`` -> ``fut_cme_clz20_prices_intraday_rollup_5m``"""
+    return f'{table}_rollup_{rollup.suffix}'
+
+
+def bucket_sql(seconds: int, column: str = 'dt') -> str:
+    """start of the ``seconds`` long bucket of ``column``. like the ``floor_extract`` queries"""
+    return f"(to_timestamp(floor(extract('epoch' FROM {column}) / {seconds}) * {seconds}) AT TIME ZONE 'UTC')"
+
+
+def aggregate_columns_sql(columns: t.Mapping[str, str]) -> str:
+    """OHLCV aggregates of a group. ``columns`` maps output names to source columns"""
+    return f'''MAX({columns['tz']})                                 AS tz,
+           (array_agg({columns['open']} ORDER BY dt))[1]       AS open,
+           MAX({columns['high']})                              AS high,
+           MIN({columns['low']})                               AS low,
+           (array_agg({columns['close']} ORDER BY dt DESC))[1] AS close,
+           SUM({columns['volume']})                            AS volume'''
+
+
+def create_rollup_view_sql(schema: str, table: str, rollup: Rollup) -> str:
+    """
+    the finest rollup aggregates the intraday table, all others the next finer rollup.
+    the unique index allows ``REFRESH MATERIALIZED VIEW CONCURRENTLY``
+    """
+    position = ROLLUPS.index(rollup)
+    if position == 0:
+        source, columns = table, RAW_COLUMNS
+    else:
+        source, columns = compose_rollup_table_name(table, ROLLUPS[position - 1]), ROLLUP_COLUMNS
+    view = compose_rollup_table_name(table, rollup)
+    return f'''
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {schema}.{view} AS
+    SELECT {bucket_sql(rollup.seconds)} AS dt,
+           {aggregate_columns_sql(columns)}
+    FROM   {schema}.{source}
+    GROUP BY 1
+    WITH DATA;
+    CREATE UNIQUE INDEX IF NOT EXISTS {view}_dt_idx ON {schema}.{view} (dt);
+    '''
+
+
+def refresh_rollup_view_sql(schema: str, table: str, rollup: Rollup) -> str:
+    view = compose_rollup_table_name(table, rollup)
+    return f'REFRESH MATERIALIZED VIEW CONCURRENTLY {schema}.{view};'
+
+
+def drop_rollup_view_sql(schema: str, table: str, rollup: Rollup) -> str:
+    view = compose_rollup_table_name(table, rollup)
+    return f'DROP MATERIALIZED VIEW IF EXISTS {schema}.{view};'
+
+
+def plan_rollup(seconds: t.Optional[int]) -> t.Optional[Rollup]:
+    """
+    the coarsest rollup whose interval evenly divides the requested one. ``None`` for raw bars.
+    ``seconds`` is ``None`` for calendar intervals (week, month) which consist of whole days
+    """
+    if seconds is None:
+        return ROLLUPS[-1]
+    candidates = [rollup for rollup in ROLLUPS if seconds % rollup.seconds == 0]
+    return candidates[-1] if candidates else None
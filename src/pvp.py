@@ -1,23 +1,36 @@
-from collections import namedtuple
+"""
+price volume profiles of intraday prices
+
+The volume of each day is summed per distinct close price with one query over
+the missing days of the requested range. These fine grained day profiles are cached
+per worker. The profile of a range is merged from its day profiles and bucketed
+with ``np.histogram`` weighted by volume. Hence, changing ``buckets`` or
+``value_area`` of a range which was requested before does not read the table again.
+"""
 from datetime import date as Date
+from datetime import datetime as dt
+from datetime import timedelta
 import typing as t
 
+from databases.core import Connection
 from falib.contract import Contract
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
+import numpy as np
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 from starlette import status
 from starlette.exceptions import HTTPException
 
+import appconfig
 from src import const
+from src.cache import TTLCache
 from src.const import (
     IntervalUnitChoices,
     OrderChoices,
     futuresMonthChars,
 )
-from src.db import get_prices_intraday_db
+from src.db import get_async_prices_intraday_db
 from src.users import (
     User,
     get_current_active_user,
@@ -29,6 +42,12 @@ from src.utils import (
 
 router = fastapi.APIRouter()
 
+# day profiles by schema, table and day
+day_profile_cache = TTLCache(
+    maxsize=appconfig.PVP_DAY_CACHE_MAXSIZE,
+    ttl=appconfig.PVP_DAY_CACHE_TTL_SECONDS,
+)
+
 
 class IntradayPvp(BaseModel):
     bucket: int
@@ -37,6 +56,41 @@ class IntradayPvp(BaseModel):
     max_close: float
 
 
+class IntradayPvpProfile(BaseModel):
+    buckets: t.List[IntradayPvp]
+    total_volume: int
+    point_of_control: float
+    point_of_control_bucket: int
+    value_area_low: float
+    value_area_high: float
+    value_area_volume: int
+
+
+class PriceProfile(t.NamedTuple):
+    """traded volume per distinct close price. ``prices`` in ascending order"""
+    prices: np.ndarray
+    volume: np.ndarray
+
+
+class BucketedProfile(t.NamedTuple):
+    """
+    ``volume`` and ``edges`` of all buckets as returned by ``np.histogram``.
+    ``bucket``, ``sum_volume``, ``min_close`` and ``max_close`` of the non empty buckets
+    """
+    volume: np.ndarray
+    edges: np.ndarray
+    bucket: np.ndarray
+    sum_volume: np.ndarray
+    min_close: np.ndarray
+    max_close: np.ndarray
+
+
+EMPTY_PROFILE = PriceProfile(
+    prices=np.empty(0, dtype=np.float64),
+    volume=np.empty(0, dtype=np.int64),
+)
+
+
 @router.get(
     '/prices/intraday/pvp',
     operation_id='get_pvp_intraday',
@@ -56,15 +110,16 @@ async def get_pvp_intraday(
         buckets: int = 100,
         iunit: IntervalUnitChoices = IntervalUnitChoices._minutes,
         order: OrderChoices = OrderChoices._asc,
-        con: Session = Depends(get_prices_intraday_db),
+        con: Connection = Depends(get_async_prices_intraday_db),
         user: User = Depends(get_current_active_user),
 ):
     """
     price volume profile. histogram of intraday price data
 
-    Creates equally spaced ``buckets`` number of well ... bucket ...
-    from the highest to the lowest price price in the time period and
+    Creates ``buckets`` number of equally spaced price intervals
+    from the lowest to the highest close price of the days in the time period and
     sums the trading volume in the local price range specified by  ``max_close`` and ``min_close``.
+    The highest price is part of the last bucket. Empty buckets are omitted.
 
     sample response:
 
@@ -74,8 +129,7 @@ async def get_pvp_intraday(
           {"bucket": 2, "max_close": 362.3, "min_close": 362.29, "sum_volume": 658616},
           {"bucket": 4, "max_close": 362.5, "min_close": 362.49, "sum_volume": 880421},
           ...
-          {"bucket": 100, "max_close": 372.32, "min_close": 372.25, "sum_volume": 630678},
-          {"bucket": 101, "max_close": 372.34, "min_close": 372.34, "sum_volume": 179559}
+          {"bucket": 100, "max_close": 372.34, "min_close": 372.25, "sum_volume": 810237}
         ]
     ```
 
@@ -93,7 +147,7 @@ async def get_pvp_intraday(
     """
     args = {
         'symbol': symbol,
-        'month': month.value,
+        'month': month.value if month is not None else None,
         'year': year,
         'ust': ust,
         'exchange': exchange,
@@ -108,9 +162,69 @@ async def get_pvp_intraday(
     return content
 
 
-pvpQueryParams = namedtuple(
-    'pvpQueryParams',
-    ['schema', 'table', 'startdate', 'enddate', 'buckets'])
+@router.get(
+    '/prices/intraday/pvp/profile',
+    operation_id='get_pvp_intraday_profile',
+    summary='price volume profile with point of control and value area',
+    response_model=IntradayPvpProfile,
+    response_class=ORJSONResponse,
+)
+async def get_pvp_intraday_profile(
+        symbol: str,
+        month: futuresMonthChars = None,
+        year: int = None,
+        ust: str = None,
+        exchange: str = None,
+        startdate: Date = None,
+        enddate: Date = None,
+        dminus: int = 20,
+        buckets: int = 100,
+        value_area: float = 0.7,
+        order: OrderChoices = OrderChoices._asc,
+        con: Connection = Depends(get_async_prices_intraday_db),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    price volume profile along with its point of control and value area
+
+    The buckets are the same as the ones of `/prices/intraday/pvp`.
+    The point of control is the center of the bucket with the highest volume.
+    The value area grows from the point of control towards the adjacent bucket with the
+    higher volume until it holds ``value_area`` of the total volume.
+    ``value_area_low`` and ``value_area_high`` are the outer edges of its buckets.
+
+    - **symbol**: example: 'SPY' or 'spy' (case insensitive)
+    - **month**: only for futures - one of ['F', 'G', 'H', 'J', 'K', 'M', 'N', 'Q', 'U', 'V', 'X', 'Z']
+    - **year**: only for futures - example: 19
+    - **ust**: underlying security type: ['fut', 'eqt', 'ind', 'fx']
+    - **exchange**: one of: ['usetf', 'cme', 'ice', 'eurex']
+    - **startdate**: format: yyyy-mm-dd
+    - **enddate**: format: yyyy-mm-dd
+    - **dminus**: indicate the number of days back from `enddate`
+    - **buckets**: number of intervals in the histogram
+    - **value_area**: share of the total volume within the value area. default: 0.7
+    - **order**:  sorting order of the buckets with respect to price interval
+    """
+    if not 0 < value_area <= 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='`value_area` needs to be greater than 0 and at most 1',
+        )
+    args = {
+        'symbol': symbol,
+        'month': month.value if month is not None else None,
+        'year': year,
+        'ust': ust,
+        'exchange': exchange,
+        'startdate': startdate,
+        'enddate': enddate,
+        'dminus': dminus,
+        'buckets': buckets,
+        'value_area': value_area,
+        'order': order.value
+    }
+    content = await resolve_pvp_profile(args, con)
+    return content
 
 
 async def pvp_query(args):
@@ -119,12 +233,17 @@ async def pvp_query(args):
     args = guess_exchange_and_ust(args)
     if (
             args['ust'] == const.STR_UNDERLYING_SECURITY_TYPE_FUTURES
-            and (args['year'] is None) or (args['month'] is None)
+            and (args['year'] is None or args['month'] is None)
     ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Specified future but did not provide both month and year parameters"
         )
+    if not 0 < args['buckets'] <= appconfig.PVP_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'`buckets` needs to be between 1 and {appconfig.PVP_MAX_BUCKETS}',
+        )
     c = Contract()
     c.symbol = args['symbol']
     c.exchange = args['exchange']
@@ -136,44 +255,179 @@ async def pvp_query(args):
         c.contract_month = args['month']
     if c.contract_month and c.contract_yyyy:
         c.contract = f'''{args['symbol']}{args['month']}{args['year']}'''.lower()
-    schema = await c.compose_2_part_schema_name()
-    table = await c.compose_prices_intraday_table_name()
-    params = pvpQueryParams(
-        schema=schema, table=table,
-        startdate=args['startdate'], enddate=args['enddate'],
-        buckets=args['buckets'],
-    )
-    sql = await final_sql(params)
-    return sql
+    args['schema'] = await c.compose_2_part_schema_name()
+    args['table'] = await c.compose_prices_intraday_table_name()
+    return args
 
 
-async def final_sql(nt: pvpQueryParams) -> str:
+def select_day_profiles(schema: str, table: str, first_day: Date, last_day: Date) -> str:
+    """volume per day and close price of the days from ``first_day`` to ``last_day``"""
     return f'''
+        SELECT   dt::date AS day,
+                 close_value AS close,
+                 SUM(volume_value) AS volume
+        FROM     {schema}.{table}
+        WHERE    dt >= '{first_day}' AND dt < '{last_day + timedelta(days=1)}'
+        GROUP BY 1, 2
+        ORDER BY 1, 2;'''
+
+
+def compose_day_profiles(
+        rows: t.Iterable[t.Mapping[str, t.Any]],
+        days: t.Sequence[Date],
+) -> t.Dict[Date, PriceProfile]:
+    """profiles of ``days`` from rows ordered by day and close. days without rows are empty"""
+    rows = list(rows)
+    row_days = np.array([row['day'] for row in rows], dtype='datetime64[D]')
+    prices = np.array([row['close'] for row in rows], dtype=np.float64)
+    volume = np.array([row['volume'] or 0 for row in rows], dtype=np.int64)
+    keys = np.array(days, dtype='datetime64[D]')
+    firsts = np.searchsorted(row_days, keys, side='left')
+    lasts = np.searchsorted(row_days, keys, side='right')
+    return {
+        day: PriceProfile(prices=prices[first:last], volume=volume[first:last])
+        for day, first, last in zip(days, firsts, lasts)
+    }
+
+
+def merge_profiles(profiles: t.Iterable[PriceProfile]) -> PriceProfile:
+    """sum the volume of equal prices of several profiles"""
+    profiles = list(profiles)
+    if not profiles:
+        return EMPTY_PROFILE
+    prices, inverse = np.unique(
+        np.concatenate([profile.prices for profile in profiles]),
+        return_inverse=True,
+    )
+    volume = np.bincount(
+        inverse,
+        weights=np.concatenate([profile.volume for profile in profiles]),
+        minlength=len(prices),
+    )
+    return PriceProfile(prices=prices, volume=volume.astype(np.int64))
+
 
-    WITH mima AS (
-            SELECT    MIN(close_value) AS abs_min,
-                      MAX(close_value)  AS abs_max
-            FROM      {nt.schema}.{nt.table}
-            WHERE dt BETWEEN '{nt.startdate}' AND  '{nt.enddate}'
+def bucket_profile(profile: PriceProfile, buckets: int) -> BucketedProfile:
+    """``buckets`` equally spaced price intervals from the lowest to the highest price"""
+    prices, volume = profile
+    hist, edges = np.histogram(prices, bins=buckets, range=(prices[0], prices[-1]), weights=volume)
+    # same assignment as `np.histogram`: half open intervals, the last one is closed
+    index = np.clip(np.searchsorted(edges, prices, side='right') - 1, 0, buckets - 1)
+    # prices are sorted. hence, the prices of a bucket are consecutive
+    starts = np.flatnonzero(np.concatenate(([True], index[1:] != index[:-1])))
+    ends = np.concatenate((starts[1:], [len(index)])) - 1
+    return BucketedProfile(
+        volume=hist.astype(np.int64),
+        edges=edges,
+        bucket=index[starts] + 1,
+        sum_volume=np.add.reduceat(volume, starts),
+        min_close=prices[starts],
+        max_close=prices[ends],
+    )
+
+
+def value_area_bounds(volume: np.ndarray, share: float) -> t.Tuple[int, int]:
+    """
+    first and last bucket of the value area. grows from the bucket with the highest volume
+    towards the adjacent bucket with the higher volume until it holds ``share`` of the volume
+    """
+    low = high = int(np.argmax(volume))
+    covered, target = volume[low], share * volume.sum()
+    while covered < target and (low > 0 or high < len(volume) - 1):
+        below = volume[low - 1] if low > 0 else -1
+        above = volume[high + 1] if high < len(volume) - 1 else -1
+        if above >= below:
+            high += 1
+            covered += above
+        else:
+            low -= 1
+            covered += below
+    return low, high
+
+
+def bucket_records(bucketed: BucketedProfile, order: str) -> t.List[t.Dict[str, t.Any]]:
+    records = [
+        {'bucket': bucket, 'sum_volume': sum_volume, 'min_close': min_close, 'max_close': max_close}
+        for bucket, sum_volume, min_close, max_close in zip(
+            bucketed.bucket.tolist(),
+            bucketed.sum_volume.tolist(),
+            bucketed.min_close.tolist(),
+            bucketed.max_close.tolist(),
         )
-    SELECT  width_bucket(
-                tab.close_value,
-                    (SELECT abs_min FROM mima LIMIT 1),
-                    (SELECT abs_max FROM mima LIMIT 1),
-                    {nt.buckets}
-                )
-                AS bucket,
-            SUM(tab.volume_value) AS sum_volume,
-            MIN(tab.close_value) AS min_close,
-            MAX(tab.close_value) AS max_close
-    FROM      {nt.schema}.{nt.table} tab
-    WHERE    tab.dt BETWEEN '{nt.startdate}' AND  '{nt.enddate}'
-    GROUP BY bucket
-    ORDER BY min_close;
-    '''
-
-
-async def resolve_pvp(args, con: Session):
-    sql = await pvp_query(args)
-    data = con.execute(sql).fetchall()
-    return data
+    ]
+    if order == OrderChoices._desc.value:
+        records.reverse()
+    return records
+
+
+async def load_day_profiles(
+        con: Connection,
+        schema: str,
+        table: str,
+        startdate: Date,
+        enddate: Date,
+        today: Date = None,
+) -> t.List[PriceProfile]:
+    """
+    profiles of the days from ``startdate`` to ``enddate``.
+    the days missing in the cache are read with a single query.
+    days are UTC days like ``dt``. hence, ``today`` defaults to the current UTC day
+    """
+    today = today or dt.utcnow().date()
+    days = [startdate + timedelta(days=i) for i in range((enddate - startdate).days + 1)]
+    profiles = {day: day_profile_cache.get((schema, table, day)) for day in days}
+    missing = [day for day in days if profiles[day] is None]
+    if missing:
+        first_day, last_day = missing[0], missing[-1]
+        rows = await con.fetch_all(select_day_profiles(schema, table, first_day, last_day))
+        loaded = compose_day_profiles(rows, days[days.index(first_day):days.index(last_day) + 1])
+        for day, profile in loaded.items():
+            # bars of the current day are still coming in
+            ttl = appconfig.PVP_DAY_CACHE_TODAY_TTL_SECONDS if day >= today else None
+            day_profile_cache.set((schema, table, day), profile, ttl=ttl)
+            profiles[day] = profile
+    return [profiles[day] for day in days]
+
+
+async def resolve_profile(args: t.Dict[str, t.Any], con: Connection) -> t.Optional[BucketedProfile]:
+    """bucketed profile of the requested range. ``None`` if no volume was traded"""
+    args = await pvp_query(args)
+    startdate = dt.strptime(args['startdate'], '%Y-%m-%d').date()
+    enddate = dt.strptime(args['enddate'], '%Y-%m-%d').date()
+    if (enddate - startdate).days >= appconfig.PVP_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'the range may span at most {appconfig.PVP_MAX_RANGE_DAYS} days',
+        )
+    profiles = await load_day_profiles(con, args['schema'], args['table'], startdate, enddate)
+    profile = merge_profiles(profiles)
+    if len(profile.prices) == 0:
+        return None
+    return bucket_profile(profile, args['buckets'])
+
+
+async def resolve_pvp(args: t.Dict[str, t.Any], con: Connection) -> t.List[t.Dict[str, t.Any]]:
+    bucketed = await resolve_profile(args, con)
+    if bucketed is None:
+        return []
+    return bucket_records(bucketed, args['order'])
+
+
+async def resolve_pvp_profile(args: t.Dict[str, t.Any], con: Connection) -> t.Dict[str, t.Any]:
+    bucketed = await resolve_profile(args, con)
+    if bucketed is None or bucketed.volume.sum() == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='no volume was traded in the range',
+        )
+    low, high = value_area_bounds(bucketed.volume, args['value_area'])
+    poc = int(np.argmax(bucketed.volume))
+    return {
+        'buckets': bucket_records(bucketed, args['order']),
+        'total_volume': int(bucketed.volume.sum()),
+        'point_of_control': float((bucketed.edges[poc] + bucketed.edges[poc + 1]) / 2),
+        'point_of_control_bucket': poc + 1,
+        'value_area_low': float(bucketed.edges[low]),
+        'value_area_high': float(bucketed.edges[high + 1]),
+        'value_area_volume': int(bucketed.volume[low:high + 1].sum()),
+    }
@@ -3,6 +3,7 @@ from enum import Enum
 import json
 import typing as t
 
+from databases.core import Connection
 from falib.contract import ContractSync
 from falib.dayindex import (
     get_day_index_schema_name,
@@ -14,13 +15,12 @@ from fastapi import (
     Header,
 )
 from fastapi.responses import ORJSONResponse
-from sqlalchemy.orm.session import Session
 from starlette.exceptions import HTTPException
 from starlette.responses import Response
 from starlette.status import HTTP_204_NO_CONTENT
 
 from src.db import (
-    get_options_rawdata_db,
+    get_async_options_rawdata_db,
     results_proxy_to_list_of_dict,
 )
 from src.users import (
@@ -48,7 +48,7 @@ async def get_all_options_single_underlying_single_day(
         ust: str = None,
         exchange: str = None,
         accept: ContentType = Header(default=ContentType.json),
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -99,7 +99,7 @@ async def to_csv(json_data: t.Dict[str, t.Any]) -> str:
     return csv
 
 
-async def get_all_relations(args: t.Dict, con: Session):
+async def get_all_relations(args: t.Dict, con: Connection):
     """
     will query the index table for all table names which
     have a record for a certain business day
@@ -117,7 +117,7 @@ async def get_all_relations(args: t.Dict, con: Session):
         FROM {schema}.{table}
         WHERE bizdt = '{args["date"]}';
     '''
-    relations = con.execute(sql).fetchall()
+    relations = await con.fetch_all(sql)
     return relations
 
 
@@ -163,10 +163,10 @@ async def select_union_all_ltds(args, con):
     return sql
 
 
-async def resolve_options_data(args: t.Dict[str, t.Any], con: Session):
+async def resolve_options_data(args: t.Dict[str, t.Any], con: Connection):
     sql = await select_union_all_ltds(args, con)
-    cursor = con.execute(sql)
-    data = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     if len(data) != 0:
         return data[0].get('json_agg')
     else:
@@ -2,13 +2,14 @@ from datetime import datetime as dt
 import re
 import typing as t
 
+from databases.core import Connection
 import fastapi
 from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 import pydantic
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 
+from src.catalog import cinfo_catalog
 from src.const import (
     RAWOPTION_MAP,
     OrderChoices,
@@ -16,14 +17,14 @@ from src.const import (
     RawDataMetricChoices,
     dminusLimits,
     exchange_choices,
-    iv_all_sym_choices,
     metric_mapper_f,
     ust_choices,
 )
 from src.db import (
-    get_options_rawdata_db,
+    get_async_options_rawdata_db,
     results_proxy_to_list_of_dict,
 )
+from src.schema import symbol_registry
 from src.users import (
     User,
     get_current_active_user,
@@ -56,7 +57,7 @@ class RawOption(BaseModel):
 
     @pydantic.validator('symbol')
     def symbol_validator(cls, v):
-        if v not in iv_all_sym_choices:
+        if not symbol_registry.is_ivol_symbol(v):
             raise ValueError('not a valid value for `symbol`')
         return v
 
@@ -135,7 +136,7 @@ async def post_raw_option_data(
                 "enddate": "2019-04-01"
             }
         ),
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -203,20 +204,32 @@ def resolve_schema_and_table_name_sql(args):
     return sql
 
 
-async def get_schema_and_table_name(args: t.Dict[str, t.Any], con: Session) -> t.Dict[str, str]:
+async def get_schema_and_table_name(args: t.Dict[str, t.Any], con: Connection) -> t.Dict[str, str]:
+    """
+    resolve the relation of an option chain from the in-memory ``cinfo`` catalog.
+    the database is only queried on a miss.
+    """
+    relation = cinfo_catalog.get_relation(args)
+    if relation is not None:
+        return {
+            'schema': relation[0],
+            'table': relation[1],
+        }
     sql = resolve_schema_and_table_name_sql(args)
-    cursor = con.execute(sql)
-    relation = results_proxy_to_list_of_dict(cursor)
+    rows = await con.fetch_all(sql)
+    relation = results_proxy_to_list_of_dict(rows)
     if len(relation) != 0:
+        schema, table = relation[0].get('schema_name'), relation[0].get('table_name')
+        cinfo_catalog.add_relation(args, schema, table)
         return {
-            'schema': relation[0].get('schema_name'),
-            'table': relation[0].get('table_name'),
+            'schema': schema,
+            'table': table,
         }
     else:
         return {}
 
 
-async def resolve_single_metric_raw_data(args: t.Dict[str, t.Any], con: Session):
+async def resolve_single_metric_raw_data(args: t.Dict[str, t.Any], con: Connection):
     args = await put_call_trafo(args)
     relation = await get_schema_and_table_name(args, con)
     if len(relation) != 2:
@@ -227,5 +240,6 @@ async def resolve_single_metric_raw_data(args: t.Dict[str, t.Any], con: Session)
     args['schema'] = relation['schema']
     args['table'] = relation['table']
     sql = await final_sql(args)
-    data = con.execute(sql).fetchall()
+    rows = await con.fetch_all(sql)
+    data = results_proxy_to_list_of_dict(rows)
     return data
@@ -0,0 +1,251 @@
+"""
+realized volatility and the spread of implied over realized volatility
+
+Realized volatility is estimated from the end of day prices of the first
+continuous future (``{ust}_{exchange}_{symbol}1_prices_eod_conti``):
+
+- ``close_to_close``: standard deviation of the log returns of the close
+- ``parkinson``: from the log range ``ln(high / low)``
+- ``garman_klass``: from the log range and the log return ``ln(close / open)``
+
+All windows are evaluated with rolling sums over NumPy arrays.
+The result is annualized with ``TRADING_DAYS`` and joined on ``dt``
+to the implied volatility of the symbol (see ``src.ivol_series.load_series``).
+"""
+from datetime import date as Date
+from datetime import datetime as dt
+from datetime import timedelta
+from enum import Enum
+import math
+import typing as t
+
+from databases.core import Connection
+import fastapi
+from fastapi import (
+    Body,
+    Depends,
+)
+from fastapi.responses import ORJSONResponse
+import numpy as np
+import pydantic
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+import appconfig
+from src.const import (
+    conti_futures_choices,
+    deltaChoicesPractical,
+    tteChoices,
+)
+from src.db import get_async_prices_intraday_db
+from src.ivol_series import (
+    SeriesKey,
+    load_series,
+)
+from src.prices_continuous import (
+    create_conti_eod_schema_name,
+    create_conti_eod_table_name,
+)
+from src.users import (
+    User,
+    get_current_active_user,
+)
+from src.utils import (
+    eod_ini_logic_new,
+    guess_exchange_and_ust,
+)
+
+router = fastapi.APIRouter()
+
+TRADING_DAYS = 252
+
+
+class EstimatorChoices(str, Enum):
+    _close_to_close = 'close_to_close'
+    _parkinson = 'parkinson'
+    _garman_klass = 'garman_klass'
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """mean of the last ``window`` values. ``nan`` unless all of them are finite"""
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+    finite = np.isfinite(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(finite, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(finite)))
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    result[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return result
+
+
+def _log_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.log(numerator / denominator)
+    return np.where(np.isfinite(ratio), ratio, np.nan)
+
+
+def realized_variance(
+        prices: t.Dict[str, np.ndarray],
+        window: int,
+        estimator: str,
+) -> np.ndarray:
+    """daily variance over the last ``window`` observations. ``prices`` holds open, high, low and close"""
+    if estimator == EstimatorChoices._close_to_close.value:
+        returns = np.concatenate(([np.nan], _log_ratio(prices['close'][1:], prices['close'][:-1])))
+        mean = rolling_mean(returns, window)
+        mean_of_squares = rolling_mean(returns ** 2, window)
+        # sample variance
+        return np.maximum(mean_of_squares - mean ** 2, 0.0) * window / (window - 1)
+    log_range = _log_ratio(prices['high'], prices['low'])
+    if estimator == EstimatorChoices._parkinson.value:
+        return rolling_mean(log_range ** 2, window) / (4 * math.log(2))
+    if estimator == EstimatorChoices._garman_klass.value:
+        log_return = _log_ratio(prices['close'], prices['open'])
+        return rolling_mean(0.5 * log_range ** 2 - (2 * math.log(2) - 1) * log_return ** 2, window)
+    raise ValueError(f'unknown estimator: {estimator}')
+
+
+def realized_volatility(
+        prices: t.Dict[str, np.ndarray],
+        windows: t.Sequence[int],
+        estimator: str,
+) -> np.ndarray:
+    """annualized realized volatility indexed by ``[window][date]``"""
+    variance = np.array([realized_variance(prices, window, estimator) for window in windows])
+    return np.sqrt(np.maximum(variance, 0.0) * TRADING_DAYS)
+
+
+def compose_prices(rows: t.Iterable[t.Mapping[str, t.Any]]) -> t.Tuple[t.List[Date], t.Dict[str, np.ndarray]]:
+    rows = list(rows)
+    dates = [row['dt'] for row in rows]
+    prices = {
+        column: np.array([np.nan if row[column] is None else row[column] for row in rows], dtype=np.float64)
+        for column in ('open', 'high', 'low', 'close')
+    }
+    return dates, prices
+
+
+class RealizedVolQuery(BaseModel):
+    symbol: str
+    ust: str = 'fut'
+    exchange: t.Optional[str] = None
+    windows: t.List[int] = [10, 21, 63]
+    estimator: EstimatorChoices = EstimatorChoices._close_to_close
+    tte: tteChoices = tteChoices._1m
+    delta: deltaChoicesPractical = deltaChoicesPractical._d050
+    startdate: t.Optional[Date] = None
+    enddate: t.Optional[Date] = None
+    dminus: int = 365
+
+    @pydantic.validator('windows')
+    def windows_validator(cls, v):
+        if not 0 < len(v) <= appconfig.REALIZED_VOL_MAX_WINDOWS:
+            raise ValueError(f'between 1 and {appconfig.REALIZED_VOL_MAX_WINDOWS} windows are allowed per request')
+        if not all(1 < window <= TRADING_DAYS for window in v):
+            raise ValueError(f'windows need to be between 2 and {TRADING_DAYS} observations')
+        return v
+
+
+class RealizedVol(BaseModel):
+    """``realized[i][j]`` and ``spread[i][j]`` belong to ``windows[i]`` at ``dates[j]``"""
+    dates: t.List[Date]
+    windows: t.List[int]
+    implied: t.List[t.Optional[float]]
+    realized: t.List[t.List[t.Optional[float]]]
+    spread: t.List[t.List[t.Optional[float]]]
+
+
+@router.post(
+    '/ivol/realized',
+    summary='Get realized volatility and the implied minus realized volatility spread',
+    operation_id='post_ivol_realized',
+    response_model=RealizedVol,
+    response_class=ORJSONResponse,
+)
+async def post_ivol_realized(
+        query: RealizedVolQuery = Body(
+            ...,
+            example={
+                'symbol': 'cl',
+                'windows': [10, 21, 63],
+                'estimator': 'close_to_close',
+                'tte': '1m',
+                'dminus': 365,
+            },
+        ),
+        con: Connection = Depends(get_async_prices_intraday_db),
+        user: User = Depends(get_current_active_user),
+):
+    """
+    annualized realized volatility of the first continuous future for each window
+    and the spread of implied volatility (`tte`, `delta`) over it.
+
+    - **windows**: number of observations per estimate e.g. [10, 21, 63]
+    - **estimator**: one of: ['close_to_close', 'parkinson', 'garman_klass']
+    - **tte**: time until expiry of the implied volatility. 1m 3m 12m ...
+    - **delta**: delta of the implied volatility e.g. d050 (default)
+
+    Only available for futures with continuous contracts.
+    Values are `null` where the window is not complete or implied volatility is missing.
+    """
+    args = query.dict()
+    content = await resolve_realized_vol(args, con)
+    return content
+
+
+async def select_conti_prices(args: t.Dict[str, t.Any], startdate: Date) -> str:
+    schema = await create_conti_eod_schema_name(args['ust'], args['exchange'])
+    table = await create_conti_eod_table_name(
+        symbol=args['symbol'],
+        security_type=args['ust'],
+        exchange=args['exchange'],
+        contract_number=1,
+    )
+    return f'''
+        SELECT      dt, open, high, low, close
+        FROM        {schema}.{table}
+        WHERE       dt BETWEEN '{startdate}' AND '{args['enddate']}'
+        ORDER BY    dt;
+    '''
+
+
+def _to_list(values: np.ndarray) -> t.List[t.Optional[float]]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+async def resolve_realized_vol(args: t.Dict[str, t.Any], con: Connection):
+    args['symbol'] = args['symbol'].lower()
+    if args['symbol'] not in conti_futures_choices:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f'no continuous futures available for {args["symbol"]}',
+        )
+    args = eod_ini_logic_new(args)
+    args = guess_exchange_and_ust(args)
+    startdate = dt.strptime(args['startdate'], '%Y-%m-%d').date()
+    # prices before `startdate` fill the first windows. calendar days per trading day < 2
+    lookback_startdate = startdate - timedelta(days=2 * max(args['windows']) + 7)
+    rows = await con.fetch_all(await select_conti_prices(args, lookback_startdate))
+    dates, prices = compose_prices(rows)
+    realized = realized_volatility(prices, args['windows'], args['estimator'].value)
+
+    key = SeriesKey(args['ust'], args['exchange'], args['symbol'], args['delta'].value, args['tte'].value)
+    series = await load_series([key], args['startdate'], args['enddate'])
+    implied_by_date = dict(series[key] or ())
+    implied = np.array(
+        [np.nan if implied_by_date.get(date) is None else implied_by_date[date] for date in dates],
+        dtype=np.float64,
+    )
+    spread = implied[None, :] - realized
+
+    selected = np.array([date >= startdate for date in dates], dtype=bool)
+    return {
+        'dates': [date for date in dates if date >= startdate],
+        'windows': args['windows'],
+        'implied': _to_list(implied[selected]),
+        'realized': [_to_list(row[selected]) for row in realized],
+        'spread': [_to_list(row[selected]) for row in spread],
+    }
@@ -1,8 +1,21 @@
-from collections import namedtuple
+from collections import (
+    defaultdict,
+    namedtuple,
+)
+from types import MappingProxyType
+import typing as t
 
 from starlette.exceptions import HTTPException
 from starlette.status import HTTP_400_BAD_REQUEST
 
+from src.const import (
+    intraday_prices_cme_sym_choices,
+    iv_all_sym_choices,
+    iv_ice_choices,
+    prices_etf_sym_choices,
+    prices_fx_sym_choices,
+)
+
 BaseContract = namedtuple(
     'BaseContract',
     ['ust', 'exchange', 'symbol']
@@ -155,9 +168,101 @@ ALLOWED_CONFIGS_DICT = [
 
 ALLOWED_CONFIGS = [BaseContract(**elm) for elm in ALLOWED_CONFIGS_DICT]
 
+# symbols are matched against the groups in the given order. the first match wins
+EXCHANGE_GUESSES = (
+    ('cme', intraday_prices_cme_sym_choices),
+    ('usetf', prices_etf_sym_choices),
+    ('int', prices_fx_sym_choices),
+    ('ice', iv_ice_choices),
+)
+UST_GUESSES = (
+    ('fut', intraday_prices_cme_sym_choices),
+    ('eqt', prices_etf_sym_choices),
+    ('fx', prices_fx_sym_choices),
+)
+
+
+def _first_match(groups: t.Iterable[t.Tuple[str, t.Iterable[str]]]) -> t.Dict[str, str]:
+    guesses = {}
+    for value, symbols in groups:
+        for symbol in symbols:
+            guesses.setdefault(symbol, value)
+    return guesses
+
+
+class SymbolRegistry:
+    """
+    frozen, hash based lookups of the covered symbols. built once at import time.
+
+    >>> symbol_registry.get_pairs('spy')
+    (('eqt', 'usetf'), ('eqt', 'usyh'))
+    >>> symbol_registry.guess_exchange('spy')
+    'usetf'
+    """
+    def __init__(
+            self,
+            configs: t.Iterable[BaseContract],
+            exchange_guesses: t.Iterable[t.Tuple[str, t.Iterable[str]]],
+            ust_guesses: t.Iterable[t.Tuple[str, t.Iterable[str]]],
+            ivol_symbols: t.Iterable[str],
+    ):
+        self.configs = frozenset(configs)
+        pairs_by_symbol = defaultdict(list)
+        for config in sorted(self.configs):
+            pairs_by_symbol[config.symbol].append((config.ust, config.exchange))
+        self.pairs_by_symbol = MappingProxyType({
+            symbol: tuple(pairs) for symbol, pairs in pairs_by_symbol.items()
+        })
+        self.ambiguous_symbols = MappingProxyType({
+            symbol: pairs for symbol, pairs in self.pairs_by_symbol.items() if len(pairs) > 1
+        })
+        self.exchange_guesses = MappingProxyType(_first_match(exchange_guesses))
+        self.ust_guesses = MappingProxyType(_first_match(ust_guesses))
+        self.ivol_symbols = frozenset(ivol_symbols)
+        self.ivol_configs = tuple(
+            config
+            for config in (self._resolve_ivol_config(symbol) for symbol in sorted(self.ivol_symbols))
+            if config is not None
+        )
+
+    def _resolve_ivol_config(self, symbol: str) -> t.Optional[BaseContract]:
+        """the guessed combo if it is valid, the first valid combo otherwise"""
+        guess = BaseContract(self.ust_guesses.get(symbol), self.exchange_guesses.get(symbol), symbol)
+        if guess in self.configs:
+            return guess
+        pairs = self.pairs_by_symbol.get(symbol)
+        return BaseContract(*pairs[0], symbol) if pairs else None
+
+    def is_valid(self, config: BaseContract) -> bool:
+        return config in self.configs
+
+    def is_ivol_symbol(self, symbol: str) -> bool:
+        return symbol in self.ivol_symbols
+
+    def get_pairs(self, symbol: str) -> t.Tuple[t.Tuple[str, str], ...]:
+        """all valid ``(ust, exchange)`` pairs of ``symbol``"""
+        return self.pairs_by_symbol.get(symbol.lower(), ())
+
+    def is_ambiguous(self, symbol: str) -> bool:
+        return symbol.lower() in self.ambiguous_symbols
+
+    def guess_exchange(self, symbol: str) -> t.Optional[str]:
+        return self.exchange_guesses.get(symbol.lower())
+
+    def guess_ust(self, symbol: str) -> t.Optional[str]:
+        return self.ust_guesses.get(symbol.lower())
+
+
+symbol_registry = SymbolRegistry(
+    configs=ALLOWED_CONFIGS,
+    exchange_guesses=EXCHANGE_GUESSES,
+    ust_guesses=UST_GUESSES,
+    ivol_symbols=iv_all_sym_choices,
+)
+
 
 def _validate_config(config: BaseContract):
-    return True if config in ALLOWED_CONFIGS else False
+    return symbol_registry.is_valid(config)
 
 
 def validate_config(args: {}):
@@ -170,11 +275,17 @@ def validate_config(args: {}):
         )
     )
     if not is_valid:
+        pairs = symbol_registry.get_pairs(args['symbol'])
+        hint = (
+            f" Valid combos of `ust` and `exchange` for this symbol: {', '.join('/'.join(p) for p in pairs)}."
+            if pairs
+            else " Data is probably not available for this symbol."
+        )
         raise HTTPException(
             detail=(
                 "Could not validate the combo of"
                 " security type of the underlying `ust`, `exchange` and `symbol`."
-                " Data is probably not available for this symbol."
+                f"{hint}"
                 f" symbol: {args['symbol']}, exchange: {args['exchange']}, ust: {args['ust']}"
             ),
             status_code=HTTP_400_BAD_REQUEST
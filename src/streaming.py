@@ -0,0 +1,68 @@
+"""
+streaming responses of long results as newline delimited JSON or CSV
+
+Results are passed as an asynchronous iterable of chunks of records and are
+encoded and written chunk by chunk. Hence, the memory of a response is bounded
+by the size of a chunk rather than by the number of records.
+"""
+import csv
+import io
+import typing as t
+
+import orjson
+from starlette.responses import StreamingResponse
+
+from src.const import ResponseFormatChoices
+
+Record = t.Mapping[str, t.Any]
+
+MEDIA_TYPES = {
+    ResponseFormatChoices._ndjson.value: 'application/x-ndjson',
+    ResponseFormatChoices._csv.value: 'text/csv',
+}
+
+
+def encode_ndjson(records: t.Iterable[Record]) -> bytes:
+    return b''.join(orjson.dumps(record) + b'\n' for record in records)
+
+
+def encode_csv(records: t.Iterable[Record], columns: t.Sequence[str], *, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(columns)
+    writer.writerows(
+        [record[column].isoformat() if hasattr(record[column], 'isoformat') else record[column] for column in columns]
+        for record in records
+    )
+    return buffer.getvalue().encode()
+
+
+async def encode_chunks(
+        chunks: t.AsyncIterable[t.Sequence[Record]],
+        media_format: str,
+        columns: t.Sequence[str],
+) -> t.AsyncIterator[bytes]:
+    """encoded chunks. CSV starts with a header even if there are no records"""
+    if media_format == ResponseFormatChoices._csv.value:
+        yield encode_csv((), columns, header=True)
+    async for records in chunks:
+        if not records:
+            continue
+        if media_format == ResponseFormatChoices._csv.value:
+            yield encode_csv(records, columns)
+        else:
+            yield encode_ndjson(records)
+
+
+def streaming_response(
+        chunks: t.AsyncIterable[t.Sequence[Record]],
+        media_format: str,
+        columns: t.Sequence[str],
+) -> StreamingResponse:
+    if media_format not in MEDIA_TYPES:
+        raise ValueError(f'no streaming media type for {media_format}')
+    return StreamingResponse(
+        encode_chunks(chunks, media_format, columns),
+        media_type=MEDIA_TYPES[media_format],
+    )
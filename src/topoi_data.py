@@ -28,6 +28,7 @@ self explaining way:
 from datetime import datetime as dt
 import re
 
+from databases.core import Connection
 import fastapi
 from fastapi import (
     Body,
@@ -37,7 +38,6 @@ from fastapi import (
 from fastapi.responses import ORJSONResponse
 import pydantic
 from pydantic import BaseModel
-from sqlalchemy.orm.session import Session
 from starlette.status import HTTP_400_BAD_REQUEST
 
 from src.const import (
@@ -45,11 +45,11 @@ from src.const import (
     PutCallChoices,
     dminusLimits,
     exchange_choices,
-    iv_all_sym_choices,
     ust_choices,
 )
-from src.db import get_options_rawdata_db
+from src.db import get_async_options_rawdata_db
 from src.rawoption_data import get_schema_and_table_name
+from src.schema import symbol_registry
 from src.users import (
     User,
     get_current_active_user,
@@ -79,7 +79,7 @@ class TopOiQuery(BaseModel):
 
     @pydantic.validator('symbol')
     def symbol_validator(cls, v):
-        if v not in iv_all_sym_choices:
+        if not symbol_registry.is_ivol_symbol(v):
             raise ValueError('not a valid value for `symbol`')
         return v
 
@@ -164,7 +164,7 @@ async def post_top_oi_and_volume(
                 "order": "desc"
             }
         ),
-        con: Session = Depends(get_options_rawdata_db),
+        con: Connection = Depends(get_async_options_rawdata_db),
         user: User = Depends(get_current_active_user),
 ):
     """
@@ -205,7 +205,7 @@ async def post_top_oi_and_volume(
     return data
 
 
-async def resolve_top_oi_or_volume(args, con: Session):
+async def resolve_top_oi_or_volume(args, con: Connection):
     args = eod_ini_logic_new(args)
     args = await put_call_trafo(args)
     if args['ust'] == 'fut':
@@ -220,7 +220,7 @@ async def resolve_top_oi_or_volume(args, con: Session):
     args['schema'] = relation['schema']
     args['table'] = relation['table']
     sql = await top_x_oi_query(args)
-    data = con.execute(sql).fetchall()
+    data = await con.fetch_all(sql)
     if len(data) != 0 and len(data[0]) != 0:
         return data[0][0]
     else:
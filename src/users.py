@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import (
     datetime,
     timedelta,
@@ -36,7 +38,9 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.session import Session
 
 import appconfig
+from src.cache import TTLCache
 from src.db import (
+    async_engines,
     get_async_users_db,
     get_users_db,
     results_proxy_to_list_of_dict,
@@ -81,6 +85,14 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: t.Optional[str] = None
+    uid: t.Optional[uuid.UUID] = None
+    is_active: t.Optional[bool] = None
+    roles: t.Optional[str] = None
+
+    @property
+    def is_stateless(self) -> bool:
+        """whether the token carries all claims needed to authorize a request"""
+        return None not in (self.uid, self.is_active, self.roles)
 
 
 class UserInDB(User):
@@ -218,9 +230,27 @@ def create_default_users():
 def hash_and_insert_new_user(
         input_user: UserCreation,
         con: Session
+) -> t.Tuple[UserInDB, bool]:
+    hashed_salted_pwd = get_password_hash(input_user.password)
+    return insert_hashed_user(input_user, hashed_salted_pwd, con)
+
+
+async def async_hash_and_insert_new_user(
+        input_user: UserCreation,
+        con: Session
+) -> t.Tuple[UserInDB, bool]:
+    """same as ``hash_and_insert_new_user`` but hashes off the event loop"""
+    hashed_salted_pwd = await async_get_password_hash(input_user.password)
+    return insert_hashed_user(input_user, hashed_salted_pwd, con)
+
+
+def insert_hashed_user(
+        input_user: UserCreation,
+        hashed_salted_pwd: str,
+        con: Session
 ) -> t.Tuple[UserInDB, bool]:
     input_user_dict = input_user.dict()
-    input_user_dict["hashed_salted_pwd"] = get_password_hash(input_user_dict["password"])
+    input_user_dict["hashed_salted_pwd"] = hashed_salted_pwd
     user = UserInDB(**input_user_dict)
     user_in_db, is_new = UserCrud.insert_new_user(user, con)
     return user_in_db, is_new
@@ -247,6 +277,11 @@ pwd_context = CryptContext(
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="token",
 )
+# authenticated users by username, saves the users database round trip on most requests
+user_cache = TTLCache(
+    maxsize=appconfig.USER_CACHE_MAXSIZE,
+    ttl=appconfig.USER_CACHE_TTL_SECONDS,
+)
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -264,6 +299,40 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# bcrypt blocks the calling thread for tens to hundreds of milliseconds.
+# run it in a bounded pool instead of on the event loop
+password_hashing_executor = ThreadPoolExecutor(
+    max_workers=appconfig.PASSWORD_HASHING_WORKERS,
+    thread_name_prefix="password-hashing",
+)
+_login_semaphore: t.Optional[asyncio.Semaphore] = None
+
+
+def get_login_semaphore() -> asyncio.Semaphore:
+    """created lazily to bind it to the running event loop"""
+    global _login_semaphore
+    if _login_semaphore is None:
+        _login_semaphore = asyncio.Semaphore(appconfig.MAX_CONCURRENT_LOGINS)
+    return _login_semaphore
+
+
+def shutdown_password_hashing_executor():
+    password_hashing_executor.shutdown(wait=False)
+
+
+async def async_verify_password(
+        plain_password: str,
+        hashed_password: str,
+) -> bool:
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(password_hashing_executor, verify_password, plain_password, hashed_password)
+
+
+async def async_get_password_hash(password: str) -> str:
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(password_hashing_executor, get_password_hash, password)
+
+
 async def authenticate_user(
         username: str,
         password: str,
@@ -272,7 +341,7 @@ async def authenticate_user(
     user = await UserCrud.async_select_user_by_username(username, con)
     if not user:
         return False
-    if not verify_password(password, user.hashed_salted_pwd):
+    if not await async_verify_password(password, user.hashed_salted_pwd):
         return False
     return user
 
@@ -295,9 +364,45 @@ def create_access_token(
     return encoded_jwt
 
 
+def compose_token_claims(user: User) -> t.Dict[str, t.Any]:
+    """
+    the claims signed into an access token. See ``appconfig.IVOLAPI_STATELESS_TOKENS``
+    """
+    claims = {"sub": user.username}
+    if appconfig.IVOLAPI_STATELESS_TOKENS:
+        claims.update({
+            "uid": str(user.uid),
+            "is_active": user.is_active,
+            "roles": user.roles,
+        })
+    return claims
+
+
+def get_access_token_expires_timedelta() -> timedelta:
+    if appconfig.IVOLAPI_STATELESS_TOKENS:
+        return appconfig.STATELESS_ACCESS_TOKEN_EXPIRES_TIMEDELTA
+    return appconfig.ACCESS_TOKEN_EXPIRES_TIMEDELTA
+
+
+async def select_user_by_username_cached(username: str) -> t.Optional[User]:
+    """
+    look up the user in the per worker ``user_cache`` first.
+    A connection to the users database is only acquired on a cache miss.
+    """
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    async with async_engines.users.connection() as con:
+        user_in_db = await UserCrud.async_select_user_by_username(username, con)
+    if user_in_db is None:
+        return None
+    user = User(**user_in_db.dict())  # don't expose (or cache) the password
+    user_cache.set(username, user)
+    return user
+
+
 async def get_current_user(
         token: str = Depends(oauth2_scheme),
-        con: Connection = Depends(get_async_users_db),
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -315,16 +420,24 @@ async def get_current_user(
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
+        token_data = TokenData(
+            username=username,
+            uid=payload.get("uid"),
+            is_active=payload.get("is_active"),
+            roles=payload.get("roles"),
+        )
+    except (JWTError, pydantic.ValidationError):
         raise credentials_exception
-    user_in_db = await UserCrud.async_select_user_by_username(
-        token_data.username,
-        con,
-    )
-    if user_in_db is None:
+    if appconfig.IVOLAPI_STATELESS_TOKENS and token_data.is_stateless:
+        return User(
+            uid=token_data.uid,
+            username=token_data.username,
+            is_active=token_data.is_active,
+            roles=token_data.roles,
+        )
+    user = await select_user_by_username_cached(token_data.username)
+    if user is None:
         raise credentials_exception
-    user = User(**user_in_db.dict())  # don't expose the password
     return user
 
 
@@ -385,11 +498,12 @@ async def post_login_for_access_token(
         con: Connection = Depends(get_async_users_db),
 ):
     """endpoint to return API access token with your valid login data"""
-    user = await authenticate_user(
-        form_data.username,
-        form_data.password,
-        con,
-    )
+    async with get_login_semaphore():
+        user = await authenticate_user(
+            form_data.username,
+            form_data.password,
+            con,
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -397,8 +511,8 @@ async def post_login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token = create_access_token(
-        data={"sub": user.username},
-        expires_delta=appconfig.ACCESS_TOKEN_EXPIRES_TIMEDELTA,
+        data=compose_token_claims(user),
+        expires_delta=get_access_token_expires_timedelta(),
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -439,7 +553,8 @@ async def post_create_user(
     Create a new user for the API
     the UUID field is optional. Don't include it, or send ``null`` to be safe
     """
-    inserted_user, _is_new = hash_and_insert_new_user(input_user, con)
+    inserted_user, _is_new = await async_hash_and_insert_new_user(input_user, con)
+    user_cache.invalidate(input_user.username)
     user = User(**inserted_user.dict())
     return user
 
@@ -456,6 +571,7 @@ async def delete_user_by_username(
 ):
     """ Delete a user """
     existed = UserCrud.delete_user_by_username(username, con)
+    user_cache.invalidate(username)
     if not existed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,17 +1,17 @@
 from datetime import datetime as dt
 from datetime import timedelta
+import logging
 import typing as t
 
 from starlette.exceptions import HTTPException
 from starlette.status import HTTP_400_BAD_REQUEST
 
-from src.const import (
-    intraday_prices_cme_sym_choices,
-    iv_ice_choices,
-    prices_etf_sym_choices,
-    prices_fx_sym_choices,
+from src.schema import (
+    symbol_registry,
+    validate_config,
 )
-from src.schema import validate_config
+
+logger = logging.getLogger(__name__)
 
 
 def ensure_ust_and_exchange_are_set(args: t.Dict[str, t.Any]):
@@ -30,6 +30,11 @@ def ensure_security_type_is_set(args: t.Dict[str, t.Any]):
 
 
 def guess_exchange_and_ust(args: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+    if (args['exchange'] is None or args['ust'] is None) and symbol_registry.is_ambiguous(args['symbol']):
+        logger.debug(
+            f'guessing for the ambiguous symbol {args["symbol"]}.'
+            f' candidates: {symbol_registry.get_pairs(args["symbol"])}'
+        )
     if args['exchange'] is None:
         args['exchange'] = guess_exchange_from_symbol_intraday(args['symbol'])
     if args['ust'] is None:
@@ -57,26 +62,11 @@ def guess_exchange_and_ust(args: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
 
 
 def guess_exchange_from_symbol_intraday(symbol: str) -> str:
-    mapping = {
-        'cme': intraday_prices_cme_sym_choices,
-        'usetf': prices_etf_sym_choices,
-        'int': prices_fx_sym_choices,
-        'ice': iv_ice_choices
-    }
-    for exchange in list(mapping):
-        if symbol.lower() in mapping[exchange]:
-            return exchange
+    return symbol_registry.guess_exchange(symbol)
 
 
 def guess_ust_from_symbol_intraday(symbol: str) -> str:
-    mapping = {
-        'fut': intraday_prices_cme_sym_choices,
-        'eqt': prices_etf_sym_choices,
-        'fx': prices_fx_sym_choices,
-    }
-    for ust in list(mapping):
-        if symbol.lower() in mapping[ust]:
-            return ust
+    return symbol_registry.guess_ust(symbol)
 
 
 async def add_missing_keys(keys: t.List[str], args: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
@@ -132,6 +122,14 @@ async def put_call_trafo(args: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
 
 
 class CinfoQueries:
+    @staticmethod
+    def catalog_f() -> str:
+        return '''
+            SELECT DISTINCT ust, exchange, symbol, ltd, option_month, underlying_month,
+                            schema_name, table_name
+            FROM cinfo;
+        '''
+
     @staticmethod
     def ust_f():
         return '''
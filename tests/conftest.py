@@ -0,0 +1,34 @@
+import copy
+
+import pytest
+
+
+class RecordingConnection:
+    """
+    stands in for a ``databases`` connection. records the queries and returns ``rows``,
+    or ``rows(sql)`` if ``rows`` is callable
+    """
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.queries = []
+
+    async def fetch_all(self, sql):
+        self.queries.append(sql)
+        return self.rows(sql) if callable(self.rows) else self.rows
+
+
+@pytest.fixture
+def fake_connection():
+    """factory of ``RecordingConnection``s"""
+    return RecordingConnection
+
+
+@pytest.fixture
+def args(request):
+    """
+    builds the ``args`` of a resolver from the ``ARGS_DEFAULTS`` of the test module.
+    keyword arguments override the defaults
+    """
+    def build(**kwargs):
+        return {**copy.deepcopy(request.module.ARGS_DEFAULTS), **kwargs}
+    return build
@@ -0,0 +1,63 @@
+import pytest
+
+from src.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('spy', 1)
+    assert cache.get('spy') == 1
+    assert cache.get('qqq') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('spy', 1)
+    cache.set('qqq', 2)
+    cache.get('spy')
+    cache.set('iwm', 3)
+    assert 'qqq' not in cache
+    assert 'spy' in cache
+    assert 'iwm' in cache
+
+
+def test_entries_expire():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=2, ttl=10, timer=timer)
+    cache.set('spy', 1)
+    timer.now = 9.9
+    assert cache.get('spy') == 1
+    timer.now = 10
+    assert cache.get('spy') is None
+    assert len(cache) == 0
+
+
+def test_ttl_per_entry():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=2, ttl=10, timer=timer)
+    cache.set('spy', 1, ttl=100)
+    timer.now = 50
+    assert cache.get('spy') == 1
+
+
+def test_invalidate():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('spy', 1)
+    assert cache.invalidate('spy')
+    assert not cache.invalidate('spy')
+    assert cache.get('spy') is None
+
+
+def test_maxsize_validation():
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0, ttl=10)
@@ -0,0 +1,89 @@
+import pytest
+
+from src import info
+from src.catalog import CinfoCatalog
+
+ROWS = [
+    {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'spy', 'ltd': '20201218',
+     'option_month': None, 'underlying_month': None, 'schema_name': 'eqt_usetf', 'table_name': 'spy_20201218'},
+    {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'spy', 'ltd': '20200918',
+     'option_month': None, 'underlying_month': None, 'schema_name': 'eqt_usetf', 'table_name': 'spy_20200918'},
+    {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'xop', 'ltd': '20200117',
+     'option_month': None, 'underlying_month': None, 'schema_name': 'eqt_usetf', 'table_name': 'xop_20200117'},
+    {'ust': 'fut', 'exchange': 'cme', 'symbol': 'cl', 'ltd': '20201117',
+     'option_month': '202012', 'underlying_month': '202101', 'schema_name': 'fut_cme',
+     'table_name': 'cl_20201117_202012_202101'},
+    {'ust': 'fut', 'exchange': 'ice', 'symbol': 'brn', 'ltd': '20201026',
+     'option_month': '202012', 'underlying_month': '202101', 'schema_name': 'fut_ice',
+     'table_name': 'brn_20201026_202012_202101'},
+]
+
+
+@pytest.fixture
+def catalog():
+    catalog = CinfoCatalog()
+    catalog.load(ROWS)
+    return catalog
+
+
+def test_catalog_requires_loading():
+    catalog = CinfoCatalog()
+    assert not catalog.is_loaded
+    with pytest.raises(RuntimeError):
+        catalog.index
+
+
+def test_catalog_indexes(catalog):
+    index = catalog.index
+    assert index.size == len(ROWS)
+    assert index.usts == ('eqt', 'fut')
+    assert index.get_exchanges() == ('cme', 'ice', 'usetf')
+    assert index.get_exchanges('fut') == ('cme', 'ice')
+    assert index.get_exchanges('unknown') == ()
+    assert index.get_symbols() == ('brn', 'cl', 'spy', 'xop')
+    assert index.get_symbols(ust='fut') == ('brn', 'cl')
+    assert index.get_symbols(exchange='usetf') == ('spy', 'xop')
+    assert index.get_symbols(ust='fut', exchange='usetf') == ()
+    assert index.get_ltds('eqt', 'usetf', 'spy') == ('20200918', '20201218')
+    assert index.get_option_and_underlying_months('fut', 'cme', 'cl', '20201117') == (('202012', '202101'),)
+    assert index.get_option_and_underlying_months('eqt', 'usetf', 'spy', '20201218') == ()
+
+
+def test_catalog_reload_swaps_index(catalog):
+    previous = catalog.index
+    catalog.load(ROWS[:1])
+    assert catalog.index is not previous
+    assert catalog.index.usts == ('eqt',)
+    assert previous.usts == ('eqt', 'fut')
+    assert catalog.stats()['size'] == 1
+
+
+def test_catalog_relations(catalog):
+    args = {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'spy', 'ltd': '20201218'}
+    assert catalog.get_relation(args) == ('eqt_usetf', 'spy_20201218')
+    args = {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'spy', 'ltd': 20201218,
+            'option_month': '202012', 'underlying_month': None}
+    assert catalog.get_relation(args) == ('eqt_usetf', 'spy_20201218')
+    args = {'ust': 'fut', 'exchange': 'cme', 'symbol': 'cl', 'ltd': '20201117',
+            'option_month': '202012', 'underlying_month': '202101'}
+    assert catalog.get_relation(args) == ('fut_cme', 'cl_20201117_202012_202101')
+    args['underlying_month'] = '202102'
+    assert catalog.get_relation(args) is None
+
+
+def test_catalog_added_relations_until_reload(catalog):
+    args = {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'qqq', 'ltd': '20201218'}
+    assert catalog.get_relation(args) is None
+    catalog.add_relation(args, 'eqt_usetf', 'qqq_20201218')
+    assert catalog.get_relation(args) == ('eqt_usetf', 'qqq_20201218')
+    catalog.load(ROWS)
+    assert catalog.get_relation(args) is None
+
+
+@pytest.mark.asyncio
+async def test_info_routes_answered_by_the_catalog_do_not_connect(catalog, monkeypatch):
+    monkeypatch.setattr(info, 'cinfo_catalog', catalog)
+    # any connection attempt would fail
+    monkeypatch.setattr(info, 'async_engines', None)
+    assert await info.get_api_info_usts(user=None) == [{'ust': 'eqt'}, {'ust': 'fut'}]
+    assert await info.get_api_info_exchanges('fut', user=None) == [{'exchange': 'cme'}, {'exchange': 'ice'}]
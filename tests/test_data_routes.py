@@ -62,6 +62,22 @@ def test_get_surface_by_delta():
     assert response.status_code == 200
 
 
+def test_get_surface_range():
+    params = {
+        'symbol': 'cl',
+        'dminus': 10,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('get_surface_range')
+        response = client.get(
+            url=url,
+            params=params,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['values']) == len(data['dates'])
+
+
 def test_get_intraday_prices():
     params = {
         'symbol': 'cl',
@@ -78,6 +94,24 @@ def test_get_intraday_prices():
     assert response.status_code == 200
 
 
+def test_get_intraday_prices_as_csv():
+    params = {
+        'symbol': 'cl',
+        'month': 'g',
+        'year': 19,
+        'startdate': '2019-01-01',
+        'format': 'csv',
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('get_intraday_prices')
+        response = client.get(
+            url=url,
+            params=params,
+        )
+    assert response.status_code == 200
+    assert response.text.startswith('dt,tz,open,high,low,close,volume\n')
+
+
 def test_get_pvp_intraday():
     params = {
         'symbol': 'cl',
@@ -94,6 +128,24 @@ def test_get_pvp_intraday():
     assert response.status_code == 200
 
 
+def test_get_pvp_intraday_profile():
+    params = {
+        'symbol': 'cl',
+        'month': 'g',
+        'year': 19,
+        'startdate': '2019-01-01',
+        'buckets': 50,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('get_pvp_intraday_profile')
+        response = client.get(
+            url=url,
+            params=params,
+        )
+    assert response.status_code == 200
+    assert response.json()['value_area_low'] <= response.json()['point_of_control']
+
+
 def test_prices_eod_conti():
     params = {
         'symbol': 'cl',
@@ -106,6 +158,22 @@ def test_prices_eod_conti():
     assert response.status_code == 200
 
 
+def test_prices_eod_conti_pages():
+    params = {
+        'symbol': 'cl',
+        'dminus': 60,
+        'limit': 10,
+    }
+    with TestClient(app) as client:
+        first = client.get('/prices/eod/conti', params=params)
+        params['cursor'] = first.headers['X-Next-Cursor']
+        second = client.get('/prices/eod/conti', params=params)
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert len(first.json()) == 10
+    assert first.json()[-1]['dt'] < second.json()[0]['dt']
+
+
 def test_prices_eod_conti_array():
     params = {
         'symbol': 'cl',
@@ -535,3 +603,163 @@ def test_post_api_info_strikes():
             headers=headers,
         )
     assert response.status_code == 200
+
+
+def test_post_ivol_batch():
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    body = {
+        'series': [
+            {'symbol': 'cl', 'tte': '1m', 'delta': 'd050'},
+            {'symbol': 'cl', 'tte': '3m', 'delta': 'd050'},
+            {'symbol': 'spy', 'tte': '1m', 'delta': 'd025'},
+        ],
+        'dminus': 30,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('post_ivol_batch')
+        response = client.post(
+            url=url,
+            json=body,
+            headers=headers,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['values']) == len(body['series'])
+    assert all(len(values) == len(data['dates']) for values in data['values'])
+
+
+def test_get_ivol_term_structure():
+    params = {
+        'symbol': 'cl',
+        'dminus': 10,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('get_ivol_term_structure')
+        response = client.get(
+            url=url,
+            params=params,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['values']) == len(data['dates'])
+
+
+def test_post_ivol_spread():
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    body = {
+        'legs': [
+            {'symbol': 'spy', 'tte': '1m', 'delta': 'd025', 'weight': 1},
+            {'symbol': 'spy', 'tte': '1m', 'delta': 'd075', 'weight': 1},
+            {'symbol': 'spy', 'tte': '1m', 'delta': 'd050', 'weight': -2},
+        ],
+        'dminus': 30,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('post_ivol_spread')
+        response = client.post(
+            url=url,
+            json=body,
+            headers=headers,
+        )
+    assert response.status_code == 200
+
+
+def test_post_ivol_interpolate():
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    body = {
+        'symbol': 'spy',
+        'points': [
+            {'delta': 0.33, 'days': 45},
+            {'delta': 0.5, 'days': 365},
+        ],
+        'dminus': 30,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('post_ivol_interpolate')
+        response = client.post(
+            url=url,
+            json=body,
+            headers=headers,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert all(len(values) == len(body['points']) for values in data['values'])
+
+
+def test_get_ivol_screener():
+    params = {
+        'tte': '1m',
+        'min_percentile': 90,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('get_ivol_screener')
+        response = client.get(
+            url=url,
+            params=params,
+        )
+    assert response.status_code == 200
+
+
+def test_post_ivol_correlation():
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    body = {
+        'universe': 'usetf',
+        'tte': '1m',
+        'window': 90,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('post_ivol_correlation')
+        response = client.post(
+            url=url,
+            json=body,
+            headers=headers,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['values']) == len(data['symbols'])
+
+
+def test_get_ivol_cone():
+    params = {
+        'symbol': 'cl',
+        'lookback': 365,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('get_ivol_cone')
+        response = client.get(
+            url=url,
+            params=params,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['bands']) == len(data['percentiles'])
+
+
+def test_post_ivol_realized():
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    body = {
+        'symbol': 'cl',
+        'windows': [10, 21],
+        'estimator': 'parkinson',
+        'dminus': 90,
+    }
+    with TestClient(app) as client:
+        url = app.url_path_for('post_ivol_realized')
+        response = client.post(
+            url=url,
+            json=body,
+            headers=headers,
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['realized']) == len(body['windows'])
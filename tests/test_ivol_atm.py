@@ -0,0 +1,41 @@
+from datetime import date as Date
+
+import pytest
+
+from src.const import time_to_var
+from src.ivol_atm import (
+    compose_term_structure,
+    select_ivol_term_structure,
+)
+
+
+@pytest.mark.asyncio
+async def test_select_ivol_term_structure_reads_every_tte_column():
+    args = {
+        'symbol': 'cl',
+        'ust': None,
+        'exchange': None,
+        'startdate': None,
+        'enddate': Date(2020, 1, 31),
+        'dminus': 30,
+        'delta': 'd050',
+        'order': 'asc',
+    }
+    sql = await select_ivol_term_structure(args)
+    assert 'fut_cme.fut_cme_cl_dpyd_d050' in sql
+    assert 'var1, var2' in sql
+    assert 'var16' in sql
+
+
+def test_compose_term_structure():
+    row = {var: k / 100 for k, var in enumerate(time_to_var.values())}
+    rows = [
+        {'dt': Date(2020, 1, 2), **row},
+        {'dt': Date(2020, 1, 3), **row, 'var16': None},
+    ]
+    content = compose_term_structure(rows)
+    assert content['dates'] == [Date(2020, 1, 2), Date(2020, 1, 3)]
+    assert content['ttes'][-4:] == ['15m', '18m', '21m', '24m']
+    assert len(content['values'][0]) == len(content['ttes']) == 16
+    assert content['values'][0][2] == row['var3']
+    assert content['values'][1][-1] is None
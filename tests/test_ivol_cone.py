@@ -0,0 +1,54 @@
+from datetime import date as Date
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from src import ivol_cone
+from src.ivol_cone import (
+    PERCENTILES,
+    TTES,
+    compute_cone,
+    resolve_cone,
+)
+
+
+def test_compute_cone():
+    values = np.tile(np.arange(1, 11, dtype=np.float64)[:, None] / 100, (1, 3))
+    values[9, 1] = np.nan
+    values[:, 2] = np.nan
+    cone = compute_cone(values)
+    assert cone['min'][0] == pytest.approx(0.01)
+    assert cone['max'][0] == pytest.approx(0.1)
+    np.testing.assert_allclose(cone['bands'][:, 0], np.percentile(values[:, 0], PERCENTILES))
+    assert cone['last'][:2].tolist() == pytest.approx([0.1, 0.09])
+    assert cone['observations'].tolist() == [10, 9, 0]
+    assert np.isnan(cone['bands'][:, 2]).all()
+    assert np.isnan(cone['last'][2])
+
+
+@pytest.mark.asyncio
+async def test_resolve_cone_is_cached_until_the_next_date(monkeypatch):
+    last_dates = [Date(2020, 1, 10)]
+    calls = []
+
+    async def fake_select_last_date_cached(args, con):
+        return last_dates[0]
+
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        calls.append(enddate)
+        dates = [Date(2020, 1, 1) + timedelta(days=k) for k in range(10)]
+        return {key: [(date, 0.2 + k / 100) for k, date in enumerate(dates)] for key in keys}
+
+    monkeypatch.setattr(ivol_cone, 'select_last_date_cached', fake_select_last_date_cached)
+    monkeypatch.setattr(ivol_cone, 'load_series', fake_load_series)
+    ivol_cone.cone_cache.clear()
+    args = {'symbol': 'SPY', 'ust': None, 'exchange': None, 'delta': 'd050', 'lookback': 365}
+    content = await resolve_cone(dict(args), con=None)
+    assert content['ttes'] == list(TTES)
+    assert content['last'][0] == pytest.approx(0.29)
+    assert content['observations'] == [10] * len(TTES)
+    assert await resolve_cone(dict(args), con=None) is content
+    last_dates[0] = Date(2020, 1, 13)
+    await resolve_cone(dict(args), con=None)
+    assert calls == ['2020-01-10', '2020-01-13']
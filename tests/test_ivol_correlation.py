@@ -0,0 +1,117 @@
+from datetime import date as Date
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from src import ivol_correlation
+from src.cache import TTLCache
+from src.const import (
+    deltaChoicesPractical,
+    tteChoices,
+)
+from src.ivol_correlation import (
+    MeasureChoices,
+    SeriesTransformChoices,
+    UniverseChoices,
+    compute_matrix,
+    daily_changes,
+    resolve_correlation,
+    resolve_universe,
+)
+
+
+def test_compute_matrix_matches_numpy_on_complete_panels():
+    rng = np.random.default_rng(1)
+    panel = rng.normal(size=(50, 4))
+    np.testing.assert_allclose(compute_matrix(panel, 'correlation'), np.corrcoef(panel.T))
+    np.testing.assert_allclose(compute_matrix(panel, 'covariance'), np.cov(panel.T))
+
+
+def test_compute_matrix_uses_pairwise_complete_observations():
+    rng = np.random.default_rng(2)
+    panel = rng.normal(size=(40, 3))
+    panel[:10, 0] = np.nan
+    panel[30:, 2] = np.nan
+    matrix = compute_matrix(panel, 'correlation')
+    assert matrix[0, 2] == pytest.approx(np.corrcoef(panel[10:30, 0], panel[10:30, 2])[0, 1])
+    assert matrix[0, 1] == pytest.approx(np.corrcoef(panel[10:, 0], panel[10:, 1])[0, 1])
+    panel[:, 1] = np.nan
+    assert np.isnan(compute_matrix(panel, 'correlation')[0, 1])
+
+
+def test_daily_changes():
+    observations = [(Date(2020, 1, 2), 0.1), (Date(2020, 1, 3), 0.2), (Date(2020, 1, 6), None), (Date(2020, 1, 7), 0.4)]
+    changes = daily_changes(observations)
+    assert [date for date, _change in changes] == [Date(2020, 1, 3), Date(2020, 1, 7)]
+    assert [change for _date, change in changes] == pytest.approx([0.1, 0.2])
+    assert daily_changes(None) is None
+
+
+def test_daily_changes_of_series_on_different_calendars():
+    dates = [Date(2020, 1, 1) + timedelta(days=i) for i in range(10)]
+    holiday = dates[4]
+    rng = np.random.default_rng(3)
+    levels = np.cumsum(rng.normal(size=(10, 2)), axis=0)
+    cme = [(date, value) for date, value in zip(dates, levels[:, 0].tolist()) if date != holiday]
+    eurex = list(zip(dates, levels[:, 1].tolist()))
+    _dates, panel = ivol_correlation.compose_panel([daily_changes(cme), daily_changes(eurex)])
+    # the holiday of one series only merges two of its changes into one
+    assert (~np.isnan(panel)).sum(axis=0).tolist() == [8, 9]
+    assert compute_matrix(panel, 'correlation')[0, 1] == pytest.approx(
+        compute_matrix(panel[~np.isnan(panel).any(axis=1)], 'correlation')[0, 1]
+    )
+
+
+ARGS_DEFAULTS = {
+    'universe': UniverseChoices._usetf,
+    'symbols': None,
+    'tte': tteChoices._1m,
+    'delta': deltaChoicesPractical._d050,
+    'window': 30,
+    'enddate': Date(2020, 1, 31),
+    'measure': MeasureChoices._correlation,
+    'transform': SeriesTransformChoices._levels,
+}
+
+
+def test_resolve_universe(args):
+    keys = resolve_universe(args())
+    assert ('eqt', 'usetf', 'spy', 'd050', '1m') in keys
+    assert all(key.exchange == 'usetf' for key in keys)
+    keys = resolve_universe(args(symbols=['SPY', 'cl']))
+    assert [key.symbol for key in keys] == ['spy', 'cl']
+
+
+@pytest.mark.asyncio
+async def test_resolve_correlation_is_cached(monkeypatch, args):
+    calls = []
+
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        calls.append(keys)
+        dates = [Date(2020, 1, 1) + timedelta(days=k) for k in range(10)]
+        return {
+            key: [(date, 0.2 + k * 0.01 * (1 if key.symbol == 'spy' else -1)) for k, date in enumerate(dates)]
+            for key in keys
+        }
+
+    async def fake_select_last_published_date(keys):
+        return Date(2020, 1, 31)
+
+    monkeypatch.setattr(ivol_correlation, 'load_series', fake_load_series)
+    monkeypatch.setattr(ivol_correlation, 'select_last_published_date', fake_select_last_published_date)
+    now = [0.0]
+    monkeypatch.setattr(ivol_correlation, 'correlation_cache', TTLCache(maxsize=8, ttl=3600, timer=lambda: now[0]))
+    content = await resolve_correlation(args(symbols=['spy', 'cl']))
+    assert content['symbols'] == ['spy', 'cl']
+    assert content['observations'] == [10, 10]
+    assert content['values'][0][1] == pytest.approx(-1.0)
+    assert await resolve_correlation(args(symbols=['spy', 'cl'])) is content
+    assert len(calls) == 1
+
+    # a window ending after the last published date expires after the shorter time to live
+    await resolve_correlation(args(symbols=['spy', 'cl'], enddate=Date(2020, 2, 3)))
+    now[0] = 600.0
+    await resolve_correlation(args(symbols=['spy', 'cl']))
+    await resolve_correlation(args(symbols=['spy', 'cl'], enddate=Date(2020, 2, 3)))
+    assert len(calls) == 3
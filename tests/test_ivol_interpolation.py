@@ -0,0 +1,95 @@
+from datetime import date as Date
+
+import numpy as np
+import pytest
+
+from src import ivol_interpolation
+from src.ivol_interpolation import (
+    DELTA_GRID,
+    TTE_GRID,
+    TTES,
+    interpolate,
+    required_grid_points,
+    resolve_interpolation,
+    tte_to_days,
+)
+from src.ivol_wide import DELTA_COLUMNS
+
+
+def test_tte_to_days():
+    assert tte_to_days('10d') == 10
+    assert tte_to_days('12m') == pytest.approx(365)
+    assert TTE_GRID[-1] == pytest.approx(730)
+
+
+def grid(dates: int = 2) -> np.ndarray:
+    """implied volatility rising with delta and falling with time to expiry"""
+    smile = 0.2 + 0.1 * DELTA_GRID[:, None]
+    term = 0.05 * np.exp(-TTE_GRID[None, :] / 365)
+    return np.broadcast_to(smile + term, (dates, len(DELTA_GRID), len(TTE_GRID))).copy()
+
+
+def test_interpolate_reproduces_grid_points():
+    values = grid()
+    result = interpolate(values, np.array([0.1, 0.5, 0.9]), np.array([10.0, tte_to_days('3m'), 730.0]))
+    assert result.shape == (2, 3)
+    np.testing.assert_allclose(result[0], [values[0, 0, 0], values[0, 8, 4], values[0, -1, -1]])
+
+
+def test_interpolate_delta_linearly_and_time_in_variance():
+    values = grid()
+    one_month, two_months = TTE_GRID[2], TTE_GRID[3]
+    days = 45.0
+    result = interpolate(values, np.array([0.33]), np.array([days]))
+    vol_lower = values[0, 4, 2] + (values[0, 5, 2] - values[0, 4, 2]) * 0.6
+    vol_upper = values[0, 4, 3] + (values[0, 5, 3] - values[0, 4, 3]) * 0.6
+    weight = (days - one_month) / (two_months - one_month)
+    variance = vol_lower ** 2 * one_month * (1 - weight) + vol_upper ** 2 * two_months * weight
+    assert result[0, 0] == pytest.approx((variance / days) ** 0.5)
+    assert min(vol_lower, vol_upper) <= result[0, 0] <= max(vol_lower, vol_upper)
+
+
+def test_interpolate_on_grid_points_ignores_missing_neighbours():
+    values = grid(dates=1)
+    values[0, 9, :] = np.nan
+    values[0, :, 3] = np.nan
+    result = interpolate(values, np.array([DELTA_GRID[8]]), np.array([TTE_GRID[2]]))
+    assert result[0, 0] == pytest.approx(values[0, 8, 2])
+    # between grid points both neighbours are needed
+    result = interpolate(values, np.array([0.52]), np.array([TTE_GRID[2]]))
+    assert np.isnan(result[0, 0])
+
+
+def test_required_grid_points():
+    assert required_grid_points(np.array([0.33]), np.array([45.0])) == [(4, 2), (4, 3), (5, 2), (5, 3)]
+
+
+@pytest.mark.asyncio
+async def test_resolve_interpolation_reads_the_surrounding_grid_points(monkeypatch):
+    values = grid(dates=1)
+    requested = []
+
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        requested.extend(keys)
+        return {
+            key: [(Date(2020, 1, 2), values[0, DELTA_COLUMNS.index(key.delta), TTES.index(key.tte)])]
+            for key in keys
+        }
+
+    monkeypatch.setattr(ivol_interpolation, 'load_series', fake_load_series)
+    args = {
+        'symbol': 'spy',
+        'ust': None,
+        'exchange': None,
+        'points': [{'delta': 0.5, 'days': 45.0}],
+        'startdate': None,
+        'enddate': Date(2020, 1, 31),
+        'dminus': 30,
+    }
+    content = await resolve_interpolation(args)
+    assert {(key.delta, key.tte) for key in requested} == {
+        ('d050', '1m'), ('d050', '2m'), ('d055', '1m'), ('d055', '2m'),
+    }
+    assert content['dates'] == [Date(2020, 1, 2)]
+    expected = interpolate(values, np.array([0.5]), np.array([45.0]))[0, 0]
+    assert content['values'] == [[pytest.approx(expected)]]
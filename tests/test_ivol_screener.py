@@ -0,0 +1,106 @@
+from datetime import date as Date
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from starlette.exceptions import HTTPException
+
+from src import ivol_screener
+from src.ivol_screener import (
+    IvolScreener,
+    ScreenerMatrix,
+    compose_screener,
+    forward_fill,
+    screen,
+)
+from src.schema import BaseContract
+
+START = Date(2020, 1, 1)
+CONFIGS = (
+    BaseContract('eqt', 'usetf', 'spy'),
+    BaseContract('fut', 'cme', 'cl'),
+    BaseContract('eqt', 'usetf', 'ewz'),
+)
+
+
+def matrix() -> ScreenerMatrix:
+    nan = np.nan
+    values = np.array([
+        [0.10, 0.12, 0.11, 0.13, 0.20],
+        [0.40, 0.35, nan, 0.30, nan],
+        [nan, nan, nan, nan, nan],
+    ])
+    return ScreenerMatrix(CONFIGS, [START + timedelta(days=k) for k in range(5)], values)
+
+
+ARGS_DEFAULTS = {
+    'min_percentile': None,
+    'max_percentile': None,
+    'min_zscore': None,
+    'max_zscore': None,
+    'min_change': None,
+    'max_change': None,
+    'change_days': 2,
+    'sort_by': 'percentile',
+    'order': 'desc',
+    'top_n': 20,
+}
+
+
+def test_forward_fill():
+    filled = forward_fill(matrix().values)
+    np.testing.assert_allclose(filled[1], [0.40, 0.35, 0.35, 0.30, 0.30])
+    assert np.isnan(filled[2]).all()
+
+
+def test_screen():
+    metrics = screen(matrix(), change_days=2)
+    spy = [0.10, 0.12, 0.11, 0.13, 0.20]
+    np.testing.assert_allclose(metrics['last'][:2], [0.20, 0.30])
+    np.testing.assert_allclose(metrics['percentile'][:2], [100, 100 / 3])
+    assert metrics['zscore'][0] == pytest.approx((0.20 - np.mean(spy)) / np.std(spy, ddof=1))
+    # cl lacks observations on two dates. its change reaches two of its own observations back
+    np.testing.assert_allclose(metrics['change'][:2], [0.20 - 0.11, 0.30 - 0.40])
+    assert np.isnan(screen(matrix(), change_days=3)['change'][1])
+    assert metrics['rank'][:2].tolist() == [2, 1]
+    assert np.isnan(metrics['last'][2]) and np.isnan(metrics['rank'][2])
+
+
+def test_compose_screener_filters_and_sorts(args):
+    rows = compose_screener(matrix(), args())
+    assert [row['symbol'] for row in rows] == ['spy', 'cl']
+    assert rows[1]['dt'] == START + timedelta(days=3)
+    rows = compose_screener(matrix(), args(min_percentile=90))
+    assert [row['symbol'] for row in rows] == ['spy']
+    rows = compose_screener(matrix(), args(sort_by='last', order='asc', top_n=1))
+    assert [row['symbol'] for row in rows] == ['spy']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('params', [{'top_n': 0}, {'top_n': -1}, {'change_days': 0}])
+async def test_get_ivol_screener_rejects_non_positive_counts(params):
+    with pytest.raises(HTTPException) as e:
+        await ivol_screener.get_ivol_screener(**params, user=None)
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_screener_rebuilds_the_matrix_once_a_day(monkeypatch):
+    calls = []
+
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        calls.append(enddate)
+        return {key: [(Date(2020, 1, 2), 0.2)] for key in keys}
+
+    monkeypatch.setattr(ivol_screener, 'load_series', fake_load_series)
+    now = [0.0]
+    today = [Date(2020, 1, 2)]
+    screener = IvolScreener(window_days=366, refresh_seconds=3600, timer=lambda: now[0], today=lambda: today[0])
+    first = await screener.get_matrix('1m', database=object())
+    assert await screener.get_matrix('1m', database=object()) is first
+    assert first.values.shape == (len(first.configs), 1)
+    today[0] = Date(2020, 1, 3)
+    await screener.get_matrix('1m', database=object())
+    now[0] = 3600.0
+    await screener.get_matrix('1m', database=object())
+    assert calls == ['2020-01-02', '2020-01-03', '2020-01-03']
@@ -0,0 +1,79 @@
+from datetime import date as Date
+
+import pytest
+
+from src import ivol_series
+from src.ivol_series import (
+    SeriesKey,
+    align_series,
+    load_series,
+)
+
+
+def test_align_series_on_the_union_of_dates():
+    first = [(Date(2020, 1, 2), 0.2), (Date(2020, 1, 3), 0.21)]
+    second = [(Date(2020, 1, 3), 0.3), (Date(2020, 1, 6), 0.31)]
+    dates, columns = align_series([first, None, second])
+    assert dates == [Date(2020, 1, 2), Date(2020, 1, 3), Date(2020, 1, 6)]
+    assert columns == [
+        [0.2, 0.21, None],
+        [None, None, None],
+        [None, 0.3, 0.31],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_load_series_reads_each_table_once(monkeypatch):
+    queries_seen = []
+
+    async def fake_fetch_all_concurrently(database, queries):
+        queries_seen.extend(queries)
+        results = []
+        for sql in queries:
+            if '_d025' in sql:
+                results.append(RuntimeError('relation does not exist'))
+            else:
+                results.append([
+                    {'dt': Date(2020, 1, 2), 'var3': 0.2, 'var5': 0.3},
+                    {'dt': Date(2020, 1, 3), 'var3': 0.21, 'var5': 0.31},
+                ])
+        return results
+
+    monkeypatch.setattr(ivol_series, 'fetch_all_concurrently', fake_fetch_all_concurrently)
+    one_month = SeriesKey('fut', 'cme', 'cl', 'd050', '1m')
+    three_months = SeriesKey('fut', 'cme', 'cl', 'd050', '3m')
+    missing = SeriesKey('fut', 'cme', 'cl', 'd025', '1m')
+    series = await load_series(
+        [one_month, three_months, one_month, missing],
+        '2020-01-01',
+        '2020-01-31',
+        database=object(),
+        wide=False,
+    )
+    assert len(queries_seen) == 2
+    assert 'var3, var5' in queries_seen[0]
+    assert series[one_month] == [(Date(2020, 1, 2), 0.2), (Date(2020, 1, 3), 0.21)]
+    assert series[three_months] == [(Date(2020, 1, 2), 0.3), (Date(2020, 1, 3), 0.31)]
+    assert series[missing] is None
+
+
+@pytest.mark.asyncio
+async def test_load_series_reads_each_wide_relation_once(monkeypatch):
+    queries_seen = []
+
+    async def fake_fetch_all_concurrently(database, queries):
+        queries_seen.extend(queries)
+        return [[
+            {'dt': Date(2020, 1, 2), 'tte': 'var3', 'd040': 0.2, 'd060': 0.3},
+            {'dt': Date(2020, 1, 2), 'tte': 'var5', 'd040': 0.21, 'd060': 0.31},
+        ]]
+
+    monkeypatch.setattr(ivol_series, 'fetch_all_concurrently', fake_fetch_all_concurrently)
+    put = SeriesKey('fut', 'cme', 'cl', 'd060', '1m')
+    call = SeriesKey('fut', 'cme', 'cl', 'd040', '3m')
+    series = await load_series([put, call], '2020-01-01', '2020-01-31', database=object(), wide=True)
+    assert len(queries_seen) == 1
+    assert 'fut_cme.fut_cme_cl_dpyd_wide' in queries_seen[0]
+    assert "tte IN ('var3', 'var5')" in queries_seen[0]
+    assert series[put] == [(Date(2020, 1, 2), 0.3)]
+    assert series[call] == [(Date(2020, 1, 2), 0.21)]
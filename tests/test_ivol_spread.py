@@ -0,0 +1,73 @@
+from datetime import date as Date
+
+import pytest
+from starlette.exceptions import HTTPException
+
+from src import ivol_spread
+from src.ivol_series import SeriesKey
+from src.ivol_spread import (
+    SpreadLeg,
+    combine,
+    compose_spread,
+    evaluate_spread,
+)
+
+D025 = SeriesKey('eqt', 'usetf', 'spy', 'd025', '1m')
+D050 = SeriesKey('eqt', 'usetf', 'spy', 'd050', '1m')
+D075 = SeriesKey('eqt', 'usetf', 'spy', 'd075', '1m')
+
+
+def test_combine_aligns_legs_on_the_union_of_dates():
+    first = [(Date(2020, 1, 2), 0.3), (Date(2020, 1, 3), 0.32), (Date(2020, 1, 6), None)]
+    second = [(Date(2020, 1, 3), 0.2), (Date(2020, 1, 6), 0.21), (Date(2020, 1, 7), 0.22)]
+    dates, values = combine([(first, 1.0), (second, -1.0)])
+    data = compose_spread(dates, values)
+    assert [row['dt'] for row in data] == [Date(2020, 1, k) for k in (2, 3, 6, 7)]
+    assert data[0]['value'] is None
+    assert data[1]['value'] == pytest.approx(0.12)
+    assert data[2]['value'] is None
+    assert data[3]['value'] is None
+    assert compose_spread(dates, values, 'desc')[0]['dt'] == Date(2020, 1, 7)
+
+
+def test_combine_evaluates_a_butterfly():
+    dates = [Date(2020, 1, 2), Date(2020, 1, 3)]
+    dates, values = combine(
+        [
+            (list(zip(dates, (0.25, 0.26))), 1.0),
+            (list(zip(dates, (0.21, 0.22))), 1.0),
+            (list(zip(dates, (0.2, 0.2))), -2.0),
+        ],
+        constant=0.01,
+    )
+    assert values.tolist() == pytest.approx([0.07, 0.09])
+
+
+@pytest.mark.asyncio
+async def test_evaluate_spread_loads_legs_once(monkeypatch):
+    calls = []
+
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        calls.append(list(keys))
+        return {key: [(Date(2020, 1, 2), 0.2)] for key in keys}
+
+    monkeypatch.setattr(ivol_spread, 'load_series', fake_load_series)
+    ivol_spread.leg_cache.clear()
+    legs = [SpreadLeg(D025, 1.0), SpreadLeg(D075, 1.0), SpreadLeg(D050, -2.0)]
+    data = await evaluate_spread(legs, '2020-01-01', '2020-01-31')
+    assert data == [{'dt': Date(2020, 1, 2), 'value': pytest.approx(0.0)}]
+    data = await evaluate_spread(legs[:2], '2020-01-01', '2020-01-31')
+    assert data == [{'dt': Date(2020, 1, 2), 'value': pytest.approx(0.4)}]
+    assert calls == [[D025, D075, D050]]
+
+
+@pytest.mark.asyncio
+async def test_evaluate_spread_raises_for_missing_legs(monkeypatch):
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        return {key: None for key in keys}
+
+    monkeypatch.setattr(ivol_spread, 'load_series', fake_load_series)
+    ivol_spread.leg_cache.clear()
+    with pytest.raises(HTTPException) as e:
+        await evaluate_spread([SpreadLeg(D050, 1.0)], '2020-01-01', '2020-01-31')
+    assert e.value.status_code == 404
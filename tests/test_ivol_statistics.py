@@ -0,0 +1,115 @@
+from datetime import date as Date
+from datetime import timedelta
+import statistics
+
+import numpy as np
+import pytest
+
+from src import ivol_statistics
+from src.ivol_statistics import (
+    IvolStatisticsStore,
+    RollingStatistics,
+    SeriesSpec,
+)
+
+START = Date(2020, 1, 1)
+
+
+def business_days(n: int):
+    day = START
+    while n:
+        if day.weekday() < 5:
+            yield day
+            n -= 1
+        day += timedelta(days=1)
+
+
+def test_rolling_statistics_match_the_window():
+    rolling = RollingStatistics(window_days=30)
+    observations = [(day, 0.2 + (k % 7) * 0.01 + k * 0.001) for k, day in enumerate(business_days(120))]
+    for day, value in observations:
+        rolling.add(day, value)
+        rolling.roll(day)
+        window = [v for d, v in observations if day - timedelta(days=30) <= d <= day]
+        assert rolling.count == len(window)
+        assert rolling.mean == pytest.approx(statistics.mean(window))
+        assert rolling.min == min(window)
+        assert rolling.max == max(window)
+        if len(window) > 1:
+            assert rolling.standard_dev == pytest.approx(statistics.stdev(window))
+
+
+def test_rolling_statistics_ignores_known_observations():
+    rolling = RollingStatistics(window_days=30)
+    rolling.add(START, 0.2)
+    rolling.add(START, 0.5)
+    assert rolling.count == 1
+    assert rolling.standard_dev is None
+
+
+def test_rolling_statistics_calendar_lookbacks():
+    rolling = RollingStatistics(window_days=365)
+    for k, day in enumerate(business_days(60)):
+        rolling.add(day, float(k))
+    summary = rolling.summary()
+    last_date = summary['end_date']
+    assert summary['last'] == 59.0
+    assert summary['week_ago_one'] == rolling.value_at(last_date - timedelta(weeks=1))
+    assert summary['week_ago_one'] == 54.0
+    assert summary['week_ago_six'] == 29.0
+
+
+@pytest.mark.asyncio
+async def test_store_reads_only_new_observations(monkeypatch):
+    queries = []
+    published = {'rows': [{'dt': Date(2020, 11, 2), 'value': 0.2}]}
+
+    async def fetch_all_concurrently(database, sqls):
+        queries.extend(sqls)
+        return [published['rows'] for _ in sqls]
+
+    clock = {'now': 0.0}
+    monkeypatch.setattr(ivol_statistics, 'fetch_all_concurrently', fetch_all_concurrently)
+    store = IvolStatisticsStore(
+        maxsize=16,
+        refresh_seconds=60,
+        timer=lambda: clock['now'],
+        today=lambda: Date(2020, 11, 3),
+    )
+    spec = SeriesSpec('eqt', 'usetf', 'spy', 'd050', '1m', 365)
+    [summary] = await store.get_summaries([spec], database=None)
+    assert summary['observations'] == 1
+    assert "BETWEEN '2019-11-04' AND '2020-11-03'" in queries[-1]
+
+    [summary] = await store.get_summaries([spec], database=None)
+    assert len(queries) == 1
+
+    clock['now'] = 61.0
+    published['rows'] = [{'dt': Date(2020, 11, 3), 'value': 0.3}]
+    [summary] = await store.get_summaries([spec], database=None)
+    assert "BETWEEN '2020-11-03' AND '2020-11-03'" in queries[-1]
+    assert summary['observations'] == 2
+    assert summary['last'] == 0.3
+
+
+@pytest.mark.asyncio
+async def test_store_short_windows_keep_the_lookbacks(monkeypatch):
+    days = list(business_days(60))
+    values = [0.2 + (k % 5) * 0.01 + k * 0.002 for k in range(len(days))]
+
+    async def fetch_all_concurrently(database, sqls):
+        return [[{'dt': day, 'value': value} for day, value in zip(days, values)] for _ in sqls]
+
+    monkeypatch.setattr(ivol_statistics, 'fetch_all_concurrently', fetch_all_concurrently)
+    today = days[-1]
+    store = IvolStatisticsStore(maxsize=16, refresh_seconds=60, today=lambda: today)
+    spec = SeriesSpec('eqt', 'usetf', 'spy', 'd050', '1m', 10)
+    [summary] = await store.get_summaries([spec], database=None)
+
+    window = np.array([value for day, value in zip(days, values) if day >= today - timedelta(days=10)])
+    assert summary['observations'] == len(window)
+    assert summary['average'] == pytest.approx(window.mean())
+    assert summary['standard_dev'] == pytest.approx(window.std(ddof=1))
+    assert summary['min'] == window.min()
+    assert summary['max'] == window.max()
+    assert summary['week_ago_six'] == values[-31]
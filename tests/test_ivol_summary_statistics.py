@@ -0,0 +1,42 @@
+from datetime import date as Date
+
+import asyncpg
+import pytest
+
+from src import (
+    ivol_statistics,
+    ivol_summary_statistics,
+)
+
+
+@pytest.mark.asyncio
+async def test_resolve_ivol_summary_multi_returns_partial_results(monkeypatch):
+    async def select_symbols(args, con):
+        return ['spy', 'qqq', 'stop', 'xop']
+
+    async def fetch_all_concurrently(database, queries):
+        assert len(queries) == 3
+        return [
+            [{'dt': Date(2020, 11, 2), 'value': 0.2}, {'dt': Date(2020, 11, 3), 'value': 0.3}],
+            asyncpg.exceptions.UndefinedTableError('relation does not exist'),
+            [],
+        ]
+
+    store = ivol_statistics.IvolStatisticsStore(maxsize=16, refresh_seconds=60, today=lambda: Date(2020, 11, 3))
+    monkeypatch.setattr(ivol_summary_statistics, 'select_symbols', select_symbols)
+    monkeypatch.setattr(ivol_summary_statistics, 'ivol_statistics_store', store)
+    monkeypatch.setattr(ivol_statistics, 'fetch_all_concurrently', fetch_all_concurrently)
+    args = {
+        'ust': 'eqt',
+        'exchange': 'usetf',
+        'tte': '1m',
+        'startdate': None,
+        'enddate': None,
+        'dminus': 365,
+        'delta': 'd050',
+    }
+    data = await ivol_summary_statistics.resolve_ivol_summary_multi([args], con_raw=None)
+    assert len(data) == 1
+    assert data[0]['symbol'] == 'spy'
+    assert data[0]['observations'] == 2
+    assert data[0]['last'] == 0.3
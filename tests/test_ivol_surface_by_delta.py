@@ -0,0 +1,67 @@
+from datetime import date as Date
+
+import pytest
+
+from src import ivol_surface_by_delta
+from src.cache import TTLCache
+from src.ivol_wide import (
+    DELTA_COLUMNS,
+    TTE_COLUMNS,
+)
+
+
+def test_compose_surface_range():
+    rows = [
+        {'dt': Date(2020, 11, 3), 'delta': 'd050', **{tte: 0.3 for tte in TTE_COLUMNS}},
+        {'dt': Date(2020, 11, 2), 'delta': 'd010', **{tte: 0.4 for tte in TTE_COLUMNS}},
+        {'dt': Date(2020, 11, 2), 'delta': 'd050', **{tte: 0.2 for tte in TTE_COLUMNS}},
+    ]
+    surface_range = ivol_surface_by_delta.compose_surface_range(rows)
+    assert surface_range['dates'] == [Date(2020, 11, 2), Date(2020, 11, 3)]
+    assert surface_range['deltas'] == list(DELTA_COLUMNS)
+    assert surface_range['ttes'][2] == '1m'
+    values = surface_range['values']
+    assert len(values) == 2
+    assert len(values[0]) == len(DELTA_COLUMNS)
+    assert values[0][0] == [0.4] * len(TTE_COLUMNS)
+    assert values[0][DELTA_COLUMNS.index('d050')] == [0.2] * len(TTE_COLUMNS)
+    assert values[1][0] == [None] * len(TTE_COLUMNS)
+
+
+@pytest.mark.asyncio
+async def test_surface_resolver_caches_by_date(fake_connection):
+    surface = [{'dt': '2020-11-02', 'delta': 'd050', 'values': {'var1': 0.2}}]
+    con = fake_connection([[surface]])
+    args = {'symbol': 'CL', 'ust': None, 'exchange': None, 'date': Date(2020, 11, 2)}
+    try:
+        assert await ivol_surface_by_delta.surface_resolver(dict(args), con) == surface
+        assert await ivol_surface_by_delta.surface_resolver(dict(args, symbol='cl'), con) == surface
+    finally:
+        ivol_surface_by_delta.surface_cache.clear()
+    assert len(con.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_surface_range_is_final_up_to_the_last_published_date(monkeypatch, fake_connection):
+    now = [0.0]
+
+    async def fake_select_last_date_cached(args, con):
+        return Date(2020, 11, 2)
+
+    async def fake_select_surface_range(args):
+        return ''
+
+    monkeypatch.setattr(ivol_surface_by_delta, 'select_last_date_cached', fake_select_last_date_cached)
+    monkeypatch.setattr(ivol_surface_by_delta, 'select_surface_range', fake_select_surface_range)
+    monkeypatch.setattr(ivol_surface_by_delta, 'surface_cache', TTLCache(maxsize=8, ttl=3600, timer=lambda: now[0]))
+    con = fake_connection([])
+    published = {'symbol': 'CL', 'ust': 'fut', 'exchange': 'cme', 'startdate': Date(2020, 10, 1),
+                 'enddate': Date(2020, 11, 2), 'dminus': None}
+    pending = dict(published, enddate=Date(2020, 11, 3))
+    for args in (published, pending):
+        await ivol_surface_by_delta.surface_range_resolver(dict(args), con)
+    now[0] = 600.0
+    for args in (published, pending):
+        await ivol_surface_by_delta.surface_range_resolver(dict(args), con)
+    # the range ending after the last published date expired after the short time to live
+    assert len(con.queries) == 3
@@ -0,0 +1,27 @@
+from src.ivol_wide import (
+    DELTA_COLUMNS,
+    TTE_COLUMNS,
+    compose_wide_relation,
+    create_wide_view_sql,
+    refresh_wide_view_sql,
+)
+
+
+def test_compose_wide_relation():
+    assert compose_wide_relation('fut', 'cme', 'CL') == ('fut_cme', 'fut_cme_cl_dpyd_wide')
+
+
+def test_create_wide_view_sql():
+    sql = create_wide_view_sql('fut_cme', 'fut_cme_cl_dpyd_')
+    assert 'CREATE MATERIALIZED VIEW IF NOT EXISTS fut_cme.fut_cme_cl_dpyd_wide' in sql
+    assert 'ON fut_cme.fut_cme_cl_dpyd_wide (tte, dt)' in sql
+    for delta in DELTA_COLUMNS:
+        assert f'FROM fut_cme.fut_cme_cl_dpyd_{delta}\n' in sql
+        assert f'AS {delta}' in sql
+    for tte in TTE_COLUMNS:
+        assert f"('{tte}', {tte})" in sql
+
+
+def test_refresh_wide_view_sql():
+    sql = refresh_wide_view_sql('fut_cme', 'fut_cme_cl_dpyd_')
+    assert sql == 'REFRESH MATERIALIZED VIEW CONCURRENTLY fut_cme.fut_cme_cl_dpyd_wide;'
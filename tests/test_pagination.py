@@ -0,0 +1,54 @@
+from datetime import date as Date
+from datetime import datetime as dt
+
+import pytest
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+
+import appconfig
+from src.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    paginate,
+    validate_page_size,
+)
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(Date(2020, 10, 1))) == '2020-10-01'
+    assert decode_cursor(encode_cursor(dt(2020, 10, 1, 14, 15))) == '2020-10-01T14:15:00'
+    assert decode_cursor(None) is None
+    for cursor in ('not a cursor', encode_cursor(Date(2020, 10, 1))[:-2] + 'xx'):
+        with pytest.raises(HTTPException):
+            decode_cursor(cursor)
+
+
+def test_keyset_condition():
+    assert keyset_condition(None, 'asc') == ''
+    assert keyset_condition('2020-10-01', 'asc') == "AND dt > '2020-10-01'"
+    assert keyset_condition('2020-10-01', 'asc', inclusive=True) == "AND dt >= '2020-10-01'"
+    assert keyset_condition('2020-10-01', 'desc') == "AND dt < '2020-10-01'"
+
+
+def test_validate_page_size():
+    assert validate_page_size(1) == 1
+    for limit in (0, appconfig.PAGE_SIZE_MAX + 1):
+        with pytest.raises(HTTPException):
+            validate_page_size(limit)
+
+
+def test_paginate():
+    rows = [{'dt': Date(2020, 10, day)} for day in range(1, 5)]
+    response = Response()
+    assert paginate(rows, 3, response) == rows[:3]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == '2020-10-03'
+
+    response = Response()
+    assert paginate(rows, 4, response) == rows
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    response = Response()
+    paginate(rows, 4, response, has_more=True)
+    assert NEXT_CURSOR_HEADER in response.headers
@@ -0,0 +1,114 @@
+from datetime import datetime as dt
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from src.prices_recent import (
+    RecentBars,
+    RingBuffer,
+)
+from src.prices_resample import compose_bars
+
+
+def minute_rows(start: dt, n: int, offset: int = 0):
+    return [
+        {
+            'dt': start + timedelta(minutes=i),
+            'tz': -5,
+            'open': float(offset + i),
+            'high': float(offset + i),
+            'low': float(offset + i),
+            'close': float(offset + i),
+            'volume': 1,
+        }
+        for i in range(n)
+    ]
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(capacity=5)
+    buffer.append(compose_bars(minute_rows(dt(2020, 10, 1, 14), 3)))
+    assert buffer.size == 3
+    assert buffer.complete_since is None
+    buffer.append(compose_bars(minute_rows(dt(2020, 10, 1, 14), 4)))
+    assert buffer.size == 4
+    buffer.append(compose_bars(minute_rows(dt(2020, 10, 1, 14), 8)))
+    assert buffer.size == 5
+    assert buffer.bars().open.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert buffer.complete_since == np.datetime64('2020-10-01T14:03:00')
+    assert buffer.last_dt == np.datetime64('2020-10-01T14:07:00')
+
+
+def test_ring_buffer_keeps_the_last_sessions():
+    buffer = RingBuffer(capacity=100)
+    for day in (1, 2, 3):
+        buffer.append(compose_bars(minute_rows(dt(2020, 10, day, 14), 10, offset=10 * day)))
+    buffer.keep_sessions(2)
+    assert buffer.size == 20
+    assert buffer.complete_since == np.datetime64('2020-10-02T14:00:00')
+    assert not buffer.covers(np.datetime64('2020-10-02'))
+    assert buffer.covers(np.datetime64('2020-10-03'))
+    bars = buffer.select(np.datetime64('2020-10-03'), np.datetime64('2020-10-04'))
+    assert bars.open.tolist() == [float(30 + i) for i in range(10)]
+
+
+def recent_rows(rows):
+    """the rows after the last buffered bar or the last 100 rows"""
+    def select(sql):
+        if 'dt >' in sql:
+            return [row for row in rows if np.datetime64(row['dt']) > np.datetime64(sql.split("'")[1])]
+        return sorted(rows, key=lambda row: row['dt'], reverse=True)[:100]
+    return select
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_recent_bars_appends_incrementally(fake_connection):
+    timer = FakeTimer()
+    recent_bars = RecentBars(
+        max_tables=2, capacity=100, sessions=10, refresh_seconds=60, timer=timer, today=lambda: '2020-10-02',
+    )
+    rows = minute_rows(dt(2020, 10, 1, 14), 10)
+    con = fake_connection(recent_rows(rows))
+
+    bars = await recent_bars.get(con, 'eqt_usetf', 'eqt_usetf_spy_prices_intraday', '2020-09-28', '2020-10-02')
+    assert len(bars.dt) == 10
+    assert len(con.queries) == 1
+
+    rows += minute_rows(dt(2020, 10, 1, 14, 10), 5, offset=10)
+    bars = await recent_bars.get(con, 'eqt_usetf', 'eqt_usetf_spy_prices_intraday', '2020-09-28', '2020-10-02')
+    assert len(bars.dt) == 10
+    assert len(con.queries) == 1
+
+    timer.now = 60
+    bars = await recent_bars.get(con, 'eqt_usetf', 'eqt_usetf_spy_prices_intraday', '2020-09-28', '2020-10-02')
+    assert bars.open.tolist() == [float(i) for i in range(15)]
+    assert "dt > '2020-10-01T14:09:00'" in con.queries[-1]
+    # the initial fill and the refresh queried the table
+    assert recent_bars.stats() == {'tables': 1, 'bars': 15, 'hits': 1, 'misses': 2}
+
+
+@pytest.mark.asyncio
+async def test_recent_bars_misses(fake_connection):
+    recent_bars = RecentBars(max_tables=1, capacity=100, sessions=10, refresh_seconds=60, today=lambda: '2020-10-02')
+    con = fake_connection(recent_rows(minute_rows(dt(2020, 10, 1, 14), 200)))
+
+    # ranges not ending today are not buffered
+    assert await recent_bars.get(con, 'fut_cme', 'fut_cme_clz20_prices_intraday', '2020-09-01', '2020-10-01') is None
+    assert con.queries == []
+
+    # only the last 100 bars are held
+    assert await recent_bars.get(con, 'fut_cme', 'fut_cme_clz20_prices_intraday', '2020-10-01', '2020-10-02') is None
+    bars = await recent_bars.get(con, 'fut_cme', 'fut_cme_clz20_prices_intraday', '2020-10-02', '2020-10-02')
+    assert len(bars.dt) == 0
+
+    await recent_bars.get(con, 'fut_cme', 'fut_cme_clg21_prices_intraday', '2020-10-02', '2020-10-02')
+    assert recent_bars.stats() == {'tables': 1, 'bars': 100, 'hits': 1, 'misses': 3}
@@ -0,0 +1,309 @@
+from datetime import datetime as dt
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+
+import appconfig
+from src import prices_intraday
+from src.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+)
+from src.prices_intraday import (
+    resolve_prices_intraday,
+    select_price_data,
+    stream_prices_intraday,
+)
+from src.prices_resample import (
+    Bars,
+    bars_to_records,
+    compose_bars,
+    plan_source,
+    resample,
+    resample_stream,
+    reverse_bars,
+)
+
+TABLE = 'fut_cme_clz20_prices_intraday'
+
+
+def minute_rows(start: dt, n: int, tz: int = -5):
+    """``n`` 1 minute bars from ``start`` (UTC). open, high, low and close are the minute index"""
+    return [
+        {
+            'dt': start + timedelta(minutes=i),
+            'tz': tz,
+            'open': float(i),
+            'high': float(i) + 0.5,
+            'low': float(i) - 0.5,
+            'close': float(i) + 0.25,
+            'volume': 1,
+        }
+        for i in range(n)
+    ]
+
+
+def test_resample_minutes():
+    bars = compose_bars(minute_rows(dt(2020, 10, 1, 14, 0), 60))
+    records = bars_to_records(resample(bars, 'minutes', 7))
+    # 7 minute buckets since the epoch in local time. 9:00 local falls into the bucket starting at 8:59
+    assert records[0]['dt'] == dt(2020, 10, 1, 13, 59)
+    assert records[0]['open'] == 0.0
+    assert records[0]['close'] == 5.25
+    assert records[0]['volume'] == 6
+    assert records[1]['dt'] == dt(2020, 10, 1, 14, 6)
+    assert records[1]['high'] == 12.5
+    assert records[1]['low'] == 5.5
+    assert records[1]['volume'] == 7
+    assert sum(record['volume'] for record in records) == 60
+
+
+def test_resample_days_are_aligned_to_local_time():
+    # 04:00 to 06:00 UTC is 23:00 to 01:00 local time at UTC-5
+    bars = compose_bars(minute_rows(dt(2020, 10, 1, 4, 0), 120))
+    records = bars_to_records(resample(bars, 'day', 1))
+    assert [record['dt'] for record in records] == [dt(2020, 9, 30, 5, 0), dt(2020, 10, 1, 5, 0)]
+    assert [record['volume'] for record in records] == [60, 60]
+    assert records[0]['close'] == 59.25
+    assert records[1]['open'] == 60.0
+    assert all(record['tz'] == -5 for record in records)
+
+
+def dst_end_rows():
+    """05:00 to 08:00 UTC on 2020-11-01. the local hour 1:00 repeats at 06:00 UTC (EDT -> EST)"""
+    rows = minute_rows(dt(2020, 11, 1, 5, 0), 180)
+    for row in rows:
+        row['tz'] = -4 if row['dt'] < dt(2020, 11, 1, 6, 0) else -5
+    return rows
+
+
+def test_resample_end_of_daylight_saving_time():
+    bars = compose_bars(dst_end_rows())
+    hours = bars_to_records(resample(bars, 'hour', 1))
+    assert [record['dt'] for record in hours] == [dt(2020, 11, 1, 5), dt(2020, 11, 1, 6), dt(2020, 11, 1, 7)]
+    assert [record['volume'] for record in hours] == [60, 60, 60]
+    # the local day lasts 25 hours
+    days = bars_to_records(resample(bars, 'day', 1))
+    assert [record['volume'] for record in days] == [180]
+
+
+def test_resample_weeks_and_months():
+    rows = minute_rows(dt(2020, 9, 30, 12, 0), 3 * 24 * 60, tz=0)
+    weeks = bars_to_records(resample(compose_bars(rows), 'week', 1))
+    assert [record['dt'] for record in weeks] == [dt(2020, 9, 28)]
+    months = bars_to_records(resample(compose_bars(rows), 'month', 1))
+    assert [record['dt'] for record in months] == [dt(2020, 9, 1), dt(2020, 10, 1)]
+    quarters = bars_to_records(resample(compose_bars(rows), 'month', 3))
+    assert [record['dt'] for record in quarters] == [dt(2020, 7, 1), dt(2020, 10, 1)]
+
+
+def test_resample_sessions():
+    rows = minute_rows(dt(2020, 10, 1, 14, 0), 30) + minute_rows(dt(2020, 10, 1, 16, 0), 30)
+    records = bars_to_records(resample(compose_bars(rows[::-1]), 'session', 1))
+    assert [record['dt'] for record in records] == [dt(2020, 10, 1, 14, 0), dt(2020, 10, 1, 16, 0)]
+    assert [record['volume'] for record in records] == [30, 30]
+
+
+def test_resample_matches_1_minute_bars():
+    rows = minute_rows(dt(2020, 10, 1, 14, 0), 10)
+    assert bars_to_records(resample(compose_bars(rows), 'minutes', 1)) == rows
+
+
+def test_resample_empty():
+    bars = resample(compose_bars([]), 'hour', 4)
+    assert bars_to_records(bars) == []
+
+
+def test_plan_source():
+    assert plan_source('minutes', 45).suffix == '15m'
+    assert plan_source('hour', 4).suffix == '1h'
+    assert plan_source('day', 1).suffix == '1h'
+    assert plan_source('month', 1).suffix == '1h'
+    assert plan_source('minutes', 7) is None
+    assert plan_source('session', 1) is None
+
+
+def _args(iunit, interval, order='asc', limit=100, cursor=None):
+    return {
+        'iunit': iunit,
+        'interval': interval,
+        'schema': 'fut_cme',
+        'table': TABLE,
+        'startdate': '2020-10-01',
+        'enddate': '2020-10-31',
+        'order': order,
+        'limit': limit,
+        'cursor': cursor,
+    }
+
+
+@pytest.mark.asyncio
+async def test_select_price_data(monkeypatch):
+    monkeypatch.setattr(appconfig, 'IVOLAPI_PRICES_ROLLUPS', True)
+    sql = await select_price_data(_args('minutes', 45))
+    assert f'FROM     fut_cme.{TABLE}_rollup_15m' in sql
+    # the bucket at the cursor, one page and one more bucket of 3 rollup bars each
+    assert 'LIMIT    306;' in sql
+    sql = await select_price_data(_args('minutes', 7))
+    assert f'FROM     fut_cme.{TABLE}\n' in sql
+    assert 'open_value AS open' in sql
+
+    monkeypatch.setattr(appconfig, 'IVOLAPI_PRICES_ROLLUPS', False)
+    sql = await select_price_data(_args('hour', 4, cursor='2020-10-02T04:00:00'))
+    assert 'rollup' not in sql
+    assert "AND dt >= '2020-10-02T04:00:00'" in sql
+    sql = await select_price_data(_args('month', 1, order='desc', cursor='2020-10-01T00:00:00'))
+    assert "AND dt < '2020-10-01T00:00:00'" in sql
+    assert f'LIMIT    {appconfig.PRICES_RESAMPLE_MAX_ROWS};' in sql
+
+    with pytest.raises(HTTPException):
+        await select_price_data(_args('minutes', 0))
+
+
+@pytest.mark.asyncio
+async def test_resolve_prices_intraday_caches_bars(monkeypatch, fake_connection):
+    async def fake_select_prices_intraday(args):
+        return await select_price_data(args)
+
+    monkeypatch.setattr(prices_intraday, 'select_prices_intraday', fake_select_prices_intraday)
+    prices_intraday.bars_cache.clear()
+    con = fake_connection(minute_rows(dt(2020, 10, 1, 14, 0), 60)[::-1])
+
+    data = await resolve_prices_intraday(_args('minutes', 15, order='desc'), con, Response())
+    assert [record['dt'] for record in data] == [
+        dt(2020, 10, 1, 14, 45), dt(2020, 10, 1, 14, 30), dt(2020, 10, 1, 14, 15), dt(2020, 10, 1, 14, 0),
+    ]
+    assert np.isclose(data[0]['close'], 59.25)
+
+    data = await resolve_prices_intraday(_args('minutes', 15, order='desc'), con, Response())
+    assert len(data) == 4
+    assert len(con.queries) == 1
+
+    monkeypatch.setattr(appconfig, 'PRICES_BARS_CACHE_MAX_ROWS', 59)
+    prices_intraday.bars_cache.clear()
+    for _ in range(2):
+        await resolve_prices_intraday(_args('minutes', 15, order='desc'), con, Response())
+    assert len(con.queries) == 3
+
+
+def keyset_rows(rows):
+    """the rows a query selects with its keyset condition and limit"""
+    def select(sql):
+        selected = rows
+        if 'AND dt >=' in sql:
+            cursor = dt.fromisoformat(sql.split('AND dt >= ')[1].split("'")[1])
+            selected = [row for row in selected if row['dt'] >= cursor]
+        limit = int(sql.split('LIMIT')[1].strip(' ;'))
+        return selected[:limit]
+    return select
+
+
+@pytest.mark.asyncio
+async def test_resolve_prices_intraday_rejects_buckets_beyond_the_source_limit(monkeypatch, fake_connection):
+    async def fake_select_prices_intraday(args):
+        return await select_price_data(args)
+
+    monkeypatch.setattr(prices_intraday, 'select_prices_intraday', fake_select_prices_intraday)
+    monkeypatch.setattr(appconfig, 'IVOLAPI_PRICES_ROLLUPS', False)
+    monkeypatch.setattr(appconfig, 'PRICES_RESAMPLE_MAX_ROWS', 50)
+    prices_intraday.bars_cache.clear()
+    con = fake_connection(keyset_rows(minute_rows(dt(2020, 10, 1, 14, 0), 100)))
+    with pytest.raises(HTTPException) as e:
+        await resolve_prices_intraday(_args('month', 1), con, Response())
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_resolve_prices_intraday_pages(monkeypatch, fake_connection):
+    async def fake_select_prices_intraday(args):
+        return await select_price_data(args)
+
+    monkeypatch.setattr(prices_intraday, 'select_prices_intraday', fake_select_prices_intraday)
+    monkeypatch.setattr(appconfig, 'IVOLAPI_PRICES_ROLLUPS', False)
+    prices_intraday.bars_cache.clear()
+    con = fake_connection(keyset_rows(minute_rows(dt(2020, 10, 1, 14, 0), 100)))
+
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        data = await resolve_prices_intraday(_args('minutes', 15, limit=3, cursor=cursor), con, response)
+        pages.append([record['dt'] for record in data])
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        cursor = decode_cursor(response.headers[NEXT_CURSOR_HEADER])
+    assert pages == [
+        [dt(2020, 10, 1, 14, 0), dt(2020, 10, 1, 14, 15), dt(2020, 10, 1, 14, 30)],
+        [dt(2020, 10, 1, 14, 45), dt(2020, 10, 1, 15, 0), dt(2020, 10, 1, 15, 15)],
+        [dt(2020, 10, 1, 15, 30)],
+    ]
+
+
+async def pieces_of(bars, size):
+    for start in range(0, len(bars.dt), size):
+        yield Bars(*(column[start:start + size] for column in bars))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('unit, value', [('minutes', 7), ('hour', 1), ('session', 1), ('month', 1)])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+async def test_resample_stream_matches_resample(unit, value, order):
+    rows = []
+    for day in range(3):
+        # across the end of a month
+        rows += minute_rows(dt(2020, 9, 30, 14, 0) + timedelta(days=day), 150)
+    bars = compose_bars(rows)
+    expected = bars_to_records(resample(bars, unit, value))
+    if order == 'desc':
+        expected.reverse()
+        bars = reverse_bars(bars)
+    streamed = []
+    # pieces arrive in the requested order, each sorted by `dt`
+    async for chunk in resample_stream(
+            (compose_bars(bars_to_records(piece)) async for piece in pieces_of(bars, 40)), unit, value, order,
+    ):
+        streamed += bars_to_records(chunk)
+    assert streamed == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+async def test_resample_stream_end_of_daylight_saving_time(order):
+    bars = compose_bars(dst_end_rows())
+    expected = bars_to_records(resample(bars, 'hour', 1))
+    if order == 'desc':
+        expected.reverse()
+        bars = reverse_bars(bars)
+    streamed = []
+    async for chunk in resample_stream(
+            (compose_bars(bars_to_records(piece)) async for piece in pieces_of(bars, 50)), 'hour', 1, order,
+    ):
+        streamed += bars_to_records(chunk)
+    assert streamed == expected
+    assert len(streamed) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_prices_intraday(monkeypatch):
+    async def fake_select_prices_intraday(args):
+        return await select_price_data(args)
+
+    queries = []
+
+    async def fake_iterate_bars(sql, chunk_rows, database=None):
+        queries.append(sql)
+        async for piece in pieces_of(compose_bars(minute_rows(dt(2020, 10, 1, 14, 0), 60)), 25):
+            yield piece
+
+    monkeypatch.setattr(prices_intraday, 'select_prices_intraday', fake_select_prices_intraday)
+    monkeypatch.setattr(prices_intraday, 'iterate_bars', fake_iterate_bars)
+    response = await stream_prices_intraday(_args('minutes', 15, limit=1, cursor='2020-10-01T14:00:00'), 'ndjson')
+    assert response.media_type == 'application/x-ndjson'
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    lines = body.decode().splitlines()
+    assert len(lines) == 4
+    assert lines[0].startswith('{"dt":"2020-10-01T14:00:00"')
+    assert 'LIMIT    ALL;' in queries[0]
+    assert 'AND dt' not in queries[0]
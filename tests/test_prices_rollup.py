@@ -0,0 +1,50 @@
+from src.prices_rollup import (
+    RETIRED_ROLLUPS,
+    ROLLUPS,
+    create_rollup_view_sql,
+    drop_rollup_view_sql,
+    plan_rollup,
+    refresh_rollup_view_sql,
+)
+
+TABLE = 'fut_cme_clz20_prices_intraday'
+
+
+def test_rollups_divide_each_other():
+    for finer, coarser in zip(ROLLUPS, ROLLUPS[1:]):
+        assert coarser.seconds % finer.seconds == 0
+
+
+def test_plan_rollup():
+    assert plan_rollup(None).suffix == '1h'
+    assert plan_rollup(24 * 60 * 60).suffix == '1h'
+    assert plan_rollup(2 * 60 * 60).suffix == '1h'
+    assert plan_rollup(60 * 60).suffix == '1h'
+    assert plan_rollup(30 * 60).suffix == '15m'
+    assert plan_rollup(20 * 60).suffix == '5m'
+    assert plan_rollup(5 * 60).suffix == '5m'
+    for minutes in (1, 2, 3, 4, 7):
+        assert plan_rollup(minutes * 60) is None
+
+
+def test_create_rollup_view_sql():
+    sql = create_rollup_view_sql('fut_cme', TABLE, ROLLUPS[0])
+    assert f'CREATE MATERIALIZED VIEW IF NOT EXISTS fut_cme.{TABLE}_rollup_5m' in sql
+    assert f'FROM   fut_cme.{TABLE}\n' in sql
+    assert 'open_value' in sql
+    assert f'ON fut_cme.{TABLE}_rollup_5m (dt)' in sql
+
+    sql = create_rollup_view_sql('fut_cme', TABLE, ROLLUPS[1])
+    assert f'FROM   fut_cme.{TABLE}_rollup_5m\n' in sql
+    assert 'open_value' not in sql
+    assert '/ 900)' in sql
+
+
+def test_refresh_rollup_view_sql():
+    sql = refresh_rollup_view_sql('fut_cme', TABLE, ROLLUPS[-1])
+    assert sql == f'REFRESH MATERIALIZED VIEW CONCURRENTLY fut_cme.{TABLE}_rollup_1h;'
+
+
+def test_drop_rollup_view_sql():
+    sql = drop_rollup_view_sql('fut_cme', TABLE, RETIRED_ROLLUPS[0])
+    assert sql == f'DROP MATERIALIZED VIEW IF EXISTS fut_cme.{TABLE}_rollup_1d;'
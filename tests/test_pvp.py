@@ -0,0 +1,85 @@
+from datetime import date as Date
+
+import numpy as np
+import pytest
+
+from src import pvp
+from src.pvp import (
+    PriceProfile,
+    bucket_profile,
+    compose_day_profiles,
+    load_day_profiles,
+    merge_profiles,
+    value_area_bounds,
+)
+
+
+def profile(prices, volume):
+    return PriceProfile(prices=np.array(prices, dtype=np.float64), volume=np.array(volume, dtype=np.int64))
+
+
+def test_merge_profiles_sums_equal_prices():
+    merged = merge_profiles([profile([1.0, 2.0], [10, 20]), profile([2.0, 3.0], [5, 7])])
+    assert merged.prices.tolist() == [1.0, 2.0, 3.0]
+    assert merged.volume.tolist() == [10, 25, 7]
+    assert len(merge_profiles([]).prices) == 0
+
+
+def test_bucket_profile():
+    bucketed = bucket_profile(profile([10.0, 10.5, 12.0, 13.5, 14.0], [1, 2, 3, 4, 5]), buckets=4)
+    assert bucketed.edges.tolist() == [10.0, 11.0, 12.0, 13.0, 14.0]
+    assert bucketed.volume.tolist() == [3, 0, 3, 9]
+    # empty buckets are omitted and the highest price is part of the last bucket
+    assert bucketed.bucket.tolist() == [1, 3, 4]
+    assert bucketed.sum_volume.tolist() == [3, 3, 9]
+    assert bucketed.min_close.tolist() == [10.0, 12.0, 13.5]
+    assert bucketed.max_close.tolist() == [10.5, 12.0, 14.0]
+
+
+def test_bucket_profile_of_a_single_price():
+    bucketed = bucket_profile(profile([10.0], [7]), buckets=3)
+    assert bucketed.bucket.tolist() == [2]
+    assert bucketed.sum_volume.tolist() == [7]
+
+
+def test_value_area_bounds():
+    volume = np.array([1, 5, 2, 10, 8, 1, 3])
+    assert value_area_bounds(volume, 0.5) == (3, 4)
+    assert value_area_bounds(volume, 0.7) == (1, 4)
+    assert value_area_bounds(volume, 1.0) == (0, 6)
+
+
+def test_compose_day_profiles():
+    rows = [
+        {'day': Date(2020, 10, 1), 'close': 1.0, 'volume': 3},
+        {'day': Date(2020, 10, 1), 'close': 2.0, 'volume': 4},
+        {'day': Date(2020, 10, 3), 'close': 1.5, 'volume': None},
+    ]
+    days = [Date(2020, 10, 1), Date(2020, 10, 2), Date(2020, 10, 3)]
+    profiles = compose_day_profiles(rows, days)
+    assert profiles[Date(2020, 10, 1)].prices.tolist() == [1.0, 2.0]
+    assert len(profiles[Date(2020, 10, 2)].prices) == 0
+    assert profiles[Date(2020, 10, 3)].volume.tolist() == [0]
+
+
+@pytest.mark.asyncio
+async def test_load_day_profiles_reads_missing_days_only(fake_connection):
+    pvp.day_profile_cache.clear()
+    con = fake_connection([
+        {'day': Date(2020, 10, 1), 'close': 1.0, 'volume': 3},
+        {'day': Date(2020, 10, 2), 'close': 2.0, 'volume': 4},
+    ])
+    args = (con, 'eqt_usetf', 'eqt_usetf_spy_prices_intraday')
+    profiles = await load_day_profiles(*args, Date(2020, 10, 1), Date(2020, 10, 2), today=Date(2020, 10, 5))
+    assert [p.volume.tolist() for p in profiles] == [[3], [4]]
+    assert "dt >= '2020-10-01' AND dt < '2020-10-03'" in con.queries[0]
+
+    profiles = await load_day_profiles(*args, Date(2020, 10, 2), Date(2020, 10, 2), today=Date(2020, 10, 5))
+    assert [p.volume.tolist() for p in profiles] == [[4]]
+    assert len(con.queries) == 1
+
+    con.rows = []
+    profiles = await load_day_profiles(*args, Date(2020, 10, 1), Date(2020, 10, 3), today=Date(2020, 10, 5))
+    assert [p.volume.tolist() for p in profiles] == [[3], [4], []]
+    assert "dt >= '2020-10-03' AND dt < '2020-10-04'" in con.queries[1]
+    pvp.day_profile_cache.clear()
@@ -0,0 +1,101 @@
+from datetime import date as Date
+from datetime import timedelta
+import math
+
+import numpy as np
+import pytest
+from starlette.exceptions import HTTPException
+
+from src import realized_vol
+from src.const import (
+    deltaChoicesPractical,
+    tteChoices,
+)
+from src.realized_vol import (
+    TRADING_DAYS,
+    EstimatorChoices,
+    realized_volatility,
+    resolve_realized_vol,
+    rolling_mean,
+)
+
+
+def prices(n: int = 60):
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * np.exp(rng.normal(0, 0.002, n))
+    high = np.maximum(open_, close) * 1.005
+    low = np.minimum(open_, close) * 0.995
+    return {'open': open_, 'high': high, 'low': low, 'close': close}
+
+
+def test_rolling_mean():
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0])
+    result = rolling_mean(values, 2)
+    assert math.isnan(result[0])
+    assert result[1] == 1.5
+    assert np.isnan(result[2:4]).all()
+    np.testing.assert_allclose(result[4:], [4.5, 5.5])
+    assert np.isnan(rolling_mean(values[:1], 2)).all()
+
+
+def test_close_to_close_matches_the_sample_standard_deviation():
+    data = prices()
+    result = realized_volatility(data, [10, 21], EstimatorChoices._close_to_close.value)
+    returns = np.log(data['close'][1:] / data['close'][:-1])
+    assert result.shape == (2, 60)
+    assert np.isnan(result[0, :10]).all()
+    assert result[0, 10] == pytest.approx(np.std(returns[:10], ddof=1) * math.sqrt(TRADING_DAYS))
+    assert result[1, -1] == pytest.approx(np.std(returns[-21:], ddof=1) * math.sqrt(TRADING_DAYS))
+
+
+def test_range_estimators():
+    data = prices()
+    parkinson = realized_volatility(data, [10], EstimatorChoices._parkinson.value)
+    log_range = np.log(data['high'][-10:] / data['low'][-10:])
+    assert parkinson[0, -1] == pytest.approx(math.sqrt(np.mean(log_range ** 2) / (4 * math.log(2)) * TRADING_DAYS))
+    garman_klass = realized_volatility(data, [10], EstimatorChoices._garman_klass.value)
+    log_return = np.log(data['close'][-10:] / data['open'][-10:])
+    variance = np.mean(0.5 * log_range ** 2 - (2 * math.log(2) - 1) * log_return ** 2)
+    assert garman_klass[0, -1] == pytest.approx(math.sqrt(variance * TRADING_DAYS))
+
+
+ARGS_DEFAULTS = {
+    'symbol': 'CL',
+    'ust': 'fut',
+    'exchange': None,
+    'windows': [5],
+    'estimator': EstimatorChoices._close_to_close,
+    'tte': tteChoices._1m,
+    'delta': deltaChoicesPractical._d050,
+    'startdate': Date(2020, 1, 20),
+    'enddate': Date(2020, 1, 31),
+    'dminus': 365,
+}
+
+
+@pytest.mark.asyncio
+async def test_resolve_realized_vol_joins_implied_volatility(monkeypatch, args, fake_connection):
+    data = prices(31)
+    dates = [Date(2020, 1, 1) + timedelta(days=k) for k in range(31)]
+    rows = [{'dt': date, **{column: data[column][k] for column in data}} for k, date in enumerate(dates)]
+
+    async def fake_load_series(keys, startdate, enddate, *, database=None):
+        return {key: [(date, 0.3) for date in dates[19:25]] for key in keys}
+
+    monkeypatch.setattr(realized_vol, 'load_series', fake_load_series)
+    content = await resolve_realized_vol(args(), fake_connection(rows))
+    assert content['dates'] == dates[19:]
+    assert content['implied'][:6] == [0.3] * 6
+    assert content['implied'][6] is None
+    expected = realized_volatility(data, [5], 'close_to_close')[0, 19]
+    assert content['realized'][0][0] == pytest.approx(expected)
+    assert content['spread'][0][0] == pytest.approx(0.3 - expected)
+    assert content['spread'][0][6] is None
+
+
+@pytest.mark.asyncio
+async def test_resolve_realized_vol_requires_continuous_futures(args, fake_connection):
+    with pytest.raises(HTTPException) as e:
+        await resolve_realized_vol(args(symbol='spy', ust='eqt'), fake_connection([]))
+    assert e.value.status_code == 400
@@ -4,6 +4,7 @@ from starlette.exceptions import HTTPException
 from src.schema import (
     BaseContract,
     _validate_config,
+    symbol_registry,
     validate_config,
 )
 
@@ -29,3 +30,44 @@ def test__validate_config_fails():
     args = {'ust': 'eqt', 'exchange': 'usetf', 'symbol': 'stop'}
     config = BaseContract(**args)
     assert not _validate_config(config)
+
+
+def test_validate_config_fails_with_valid_combos():
+    args = {'ust': 'fut', 'exchange': 'cme', 'symbol': 'spy'}
+    with pytest.raises(HTTPException) as excinfo:
+        validate_config(args)
+    assert 'eqt/usetf, eqt/usyh' in excinfo.value.detail
+
+
+def test_symbol_registry_pairs():
+    assert symbol_registry.get_pairs('SPY') == (('eqt', 'usetf'), ('eqt', 'usyh'))
+    assert symbol_registry.get_pairs('cl') == (('fut', 'cme'),)
+    assert symbol_registry.get_pairs('stop') == ()
+
+
+def test_symbol_registry_ambiguity():
+    assert symbol_registry.is_ambiguous('spy')
+    assert not symbol_registry.is_ambiguous('cl')
+    assert 'xop' in symbol_registry.ambiguous_symbols
+
+
+def test_symbol_registry_guesses_in_priority_order():
+    assert symbol_registry.guess_exchange('spy') == 'usetf'
+    assert symbol_registry.guess_exchange('Cl') == 'cme'
+    assert symbol_registry.guess_exchange('eurusd') == 'int'
+    assert symbol_registry.guess_exchange('sb') == 'ice'
+    assert symbol_registry.guess_ust('spy') == 'eqt'
+    assert symbol_registry.guess_ust('eurusd') == 'fx'
+    assert symbol_registry.guess_ust('stop') is None
+
+
+def test_symbol_registry_is_frozen():
+    with pytest.raises(TypeError):
+        symbol_registry.pairs_by_symbol['stop'] = ()
+
+
+def test_symbol_registry_ivol_configs():
+    configs = {config.symbol: config for config in symbol_registry.ivol_configs}
+    assert configs['spy'] == ('eqt', 'usetf', 'spy')
+    assert configs['sb'] == ('fut', 'ice', 'sb')
+    assert all(symbol_registry.is_valid(config) for config in symbol_registry.ivol_configs)
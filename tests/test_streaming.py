@@ -0,0 +1,54 @@
+from datetime import datetime as dt
+
+import orjson
+import pytest
+
+from src.streaming import (
+    encode_chunks,
+    encode_csv,
+    encode_ndjson,
+    streaming_response,
+)
+
+COLUMNS = ('dt', 'close', 'volume')
+RECORDS = [
+    {'dt': dt(2020, 10, 1, 14, 0), 'close': 40.25, 'volume': 10},
+    {'dt': dt(2020, 10, 1, 14, 1), 'close': 40.5, 'volume': 20},
+]
+
+
+def test_encode_ndjson():
+    lines = encode_ndjson(RECORDS).splitlines()
+    assert [orjson.loads(line)['volume'] for line in lines] == [10, 20]
+    assert orjson.loads(lines[0])['dt'] == '2020-10-01T14:00:00'
+
+
+def test_encode_csv():
+    assert encode_csv(RECORDS, COLUMNS, header=True).decode() == (
+        'dt,close,volume\n'
+        '2020-10-01T14:00:00,40.25,10\n'
+        '2020-10-01T14:01:00,40.5,20\n'
+    )
+
+
+async def chunks_of(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_encode_chunks():
+    encoded = [chunk async for chunk in encode_chunks(chunks_of(RECORDS[:1], [], RECORDS[1:]), 'csv', COLUMNS)]
+    assert encoded == [
+        b'dt,close,volume\n',
+        b'2020-10-01T14:00:00,40.25,10\n',
+        b'2020-10-01T14:01:00,40.5,20\n',
+    ]
+    encoded = [chunk async for chunk in encode_chunks(chunks_of(), 'ndjson', COLUMNS)]
+    assert encoded == []
+
+
+def test_streaming_response():
+    assert streaming_response(chunks_of(), 'csv', COLUMNS).media_type == 'text/csv'
+    with pytest.raises(ValueError):
+        streaming_response(chunks_of(), 'json', COLUMNS)
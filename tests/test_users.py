@@ -0,0 +1,38 @@
+import pytest
+
+from src import users
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_from_cache():
+    user = users.User(username='cached')
+    users.user_cache.set(user.username, user)
+    token = users.create_access_token(data={'sub': user.username})
+    try:
+        current_user = await users.get_current_user(token)
+    finally:
+        users.user_cache.invalidate(user.username)
+    assert current_user == user
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_from_stateless_token(monkeypatch):
+    monkeypatch.setattr(users.appconfig, 'IVOLAPI_STATELESS_TOKENS', True)
+    user = users.User(username='stateless', roles=users.SUPERUSER_ROLE_STR)
+    token = users.create_access_token(data=users.compose_token_claims(user))
+    current_user = await users.get_current_user(token)
+    assert current_user == user
+    assert user.username not in users.user_cache
+
+
+def test_token_claims_without_stateless_tokens(monkeypatch):
+    monkeypatch.setattr(users.appconfig, 'IVOLAPI_STATELESS_TOKENS', False)
+    user = users.User(username='stateful')
+    assert users.compose_token_claims(user) == {'sub': user.username}
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_off_the_event_loop():
+    hashed = await users.async_get_password_hash('secret')
+    assert await users.async_verify_password('secret', hashed)
+    assert not await users.async_verify_password('wrong', hashed)